@@ -0,0 +1,136 @@
+"""
+Microbenchmark of the loop detector of ReliableLLM.
+
+Feeds the same streams, in token-sized chunks, to the current _LoopDetector
+and to the previous implementation (rebuilding the window at every chunk and
+comparing every pattern length at every check), and reports the time per
+character. Then reports how the time per character of the current
+_LoopDetector scales with max_pattern_length (and so with its window).
+
+    python benchmarks/loop_detector.py
+"""
+
+import random
+import time
+from typing import Optional
+
+from agentswarm.llms.reliable_llm import _LoopDetector
+
+
+class PreviousLoopDetector:
+    def __init__(self, min_repetitions=12, max_pattern_length=256, check_every=16):
+        self.min_repetitions = min_repetitions
+        self.max_pattern_length = max_pattern_length
+        self.check_every = check_every
+        self._window_size = max_pattern_length * (min_repetitions + 1)
+        self._buffer = ""
+        self._since_check = 0
+
+    def feed(self, text: str):
+        self._buffer += text
+        if len(self._buffer) > self._window_size:
+            self._buffer = self._buffer[-self._window_size :]
+        self._since_check += len(text)
+
+    def detect(self) -> Optional[str]:
+        if self._since_check < self.check_every:
+            return None
+        self._since_check = 0
+        s = self._buffer
+        n = len(s)
+        max_p = min(self.max_pattern_length, n // self.min_repetitions)
+        for p in range(1, max_p + 1):
+            unit = s[n - p : n]
+            for r in range(2, self.min_repetitions + 1):
+                if s[n - r * p : n - (r - 1) * p] != unit:
+                    break
+            else:
+                return unit
+        return None
+
+
+WORDS = (
+    "the agent calls a tool with the input and returns its result to the "
+    "caller while the store keeps every value produced by the execution"
+).split()
+
+
+def prose(rng: random.Random, chars: int) -> str:
+    words = []
+    length = 0
+    while length < chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def table(rng: random.Random, chars: int) -> str:
+    # Near-repetitive output (e.g. a markdown table): many candidate lengths
+    rows = []
+    length = 0
+    while length < chars:
+        row = f"| {rng.randint(0, 9)} | value | value | {rng.randint(0, 9)} |\n"
+        rows.append(row)
+        length += len(row)
+    return "".join(rows)
+
+
+def chunks(text: str, size: int = 4):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def run(detector_class, streams, **kwargs) -> float:
+    """Returns the seconds per character fed to the detectors."""
+    chars = 0
+    start = time.perf_counter()
+    for stream in streams:
+        detector = detector_class(**kwargs)
+        for chunk in stream:
+            chars += len(chunk)
+            detector.feed(chunk)
+            if detector.detect() is not None:
+                break
+    return (time.perf_counter() - start) / chars
+
+
+def main():
+    rng = random.Random(0)
+    workloads = {
+        "prose": [chunks(prose(rng, 20_000)) for _ in range(20)],
+        "table": [chunks(table(rng, 20_000)) for _ in range(20)],
+        "loop": [chunks(prose(rng, 5_000) + "again and " * 200) for _ in range(20)],
+    }
+    print(f"{'workload':<10}{'previous':>14}{'current':>14}{'speedup':>10}")
+    for name, streams in workloads.items():
+        previous = min(run(PreviousLoopDetector, streams) for _ in range(3))
+        current = min(run(_LoopDetector, streams) for _ in range(3))
+        print(
+            f"{name:<10}"
+            f"{previous * 1e9:>11.0f} ns"
+            f"{current * 1e9:>11.0f} ns"
+            f"{previous / current:>9.1f}x"
+        )
+
+    # Streams longer than the largest window
+    workloads = {
+        "prose": [chunks(prose(rng, 200_000)) for _ in range(2)],
+        "table": [chunks(table(rng, 200_000)) for _ in range(2)],
+    }
+    print()
+    print(f"{'max_pattern_length':<20}{'window':>10}", end="")
+    print("".join(f"{name:>14}" for name in workloads))
+    for max_pattern_length in (256, 1024, 4096, 8192):
+        window = _LoopDetector(max_pattern_length=max_pattern_length)._window_size
+        print(f"{max_pattern_length:<20}{window:>10}", end="")
+        for streams in workloads.values():
+            current = min(
+                run(_LoopDetector, streams, max_pattern_length=max_pattern_length)
+                for _ in range(3)
+            )
+            print(f"{current * 1e9:>11.0f} ns", end="")
+        print()
+
+
+if __name__ == "__main__":
+    main()
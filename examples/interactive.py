@@ -1,16 +1,16 @@
 import asyncio
 import os
-from typing import List
-import uuid
-from agentswarm.agents import ReActAgent, BaseAgent, MapReduceAgent
-from agentswarm.datamodels import Message, Context, LocalStore
-from agentswarm.llms import LLM, GeminiLLM
-from agentswarm.utils.tracing import LocalTracing
-from print_utils import Colors, get_user_input, print_message, print_separator
-
 import textwrap
+import uuid
+from typing import List
 
 from dotenv import load_dotenv
+from print_utils import Colors, get_user_input, print_message, print_separator
+
+from agentswarm.agents import BaseAgent, MapReduceAgent, ReActAgent
+from agentswarm.datamodels import Context, LocalStore, Message
+from agentswarm.llms import LLM, default_llm_provider
+from agentswarm.utils.tracing import LocalTracing
 
 load_dotenv()
 
@@ -22,7 +22,7 @@ class MasterAgent(ReActAgent):
         super().__init__(100, 1)
 
     def get_llm(self, user_id: str) -> LLM:
-        return GeminiLLM(api_key=os.getenv("GEMINI_API_KEY"))
+        return default_llm_provider.gemini()
 
     def id(self) -> str:
         return "master"
@@ -43,6 +43,9 @@ async def main():
     print(f"{Colors.BOLD}{Colors.CYAN}{'=' * 80}{Colors.END}\n")
 
     master_agent = MasterAgent()
+    # Open the connections before the first request
+    default_llm_provider.gemini()
+    await default_llm_provider.warm_up()
 
     tracing = LocalTracing()
     conversation = []
@@ -66,7 +69,7 @@ async def main():
             trace_id=trace_id,
             messages=conversation,
             store=LocalStore(),
-            default_llm=GeminiLLM(api_key=os.getenv("GEMINI_API_KEY")),
+            default_llm=default_llm_provider.gemini(),
             tracing=tracing,
         )
 
@@ -5,20 +5,23 @@ import uuid
 from pydantic import BaseModel, Field
 from agentswarm.agents import ReActAgent, BaseAgent
 from agentswarm.datamodels import Message, Context, LocalStore, CompletionResponse
-from agentswarm.llms import LLM, GeminiLLM
+from agentswarm.llms import LLM, default_llm_provider
 from agentswarm.utils.tracing import LocalTracing
 from print_utils import Colors, print_message, print_separator
-from google.genai import Client
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-client = Client(
-    vertexai=True,
-    project=os.getenv("VERTEX_PROJECT"),
-    location=os.getenv("VERTEX_LOCATION"),
-)
+
+def vertex_llm(model: str = "gemini-3.1-flash-lite") -> LLM:
+    # The LLMs (and their client) are shared by all the agents and requests
+    return default_llm_provider.gemini(
+        model=model,
+        vertexai=True,
+        project=os.getenv("VERTEX_PROJECT"),
+        location=os.getenv("VERTEX_LOCATION"),
+    )
 
 
 class MockCompletionInput(BaseModel):
@@ -45,7 +48,7 @@ class CompletionTestMasterAgent(ReActAgent):
         super().__init__(max_iterations=10, max_concurrent_agents=5)
 
     def get_llm(self, user_id: str) -> LLM:
-        return GeminiLLM(client=client, model="gemini-2.5-flash-lite")
+        return vertex_llm("gemini-2.5-flash-lite")
 
     def id(self) -> str:
         return "completion_test_master"
@@ -75,7 +78,7 @@ async def run_test(prompt: str, scenario_name: str):
         messages=messages,
         store=store,
         tracing=tracing,
-        default_llm=GeminiLLM(client=client),
+        default_llm=vertex_llm(),
     )
 
     try:
@@ -1,27 +1,30 @@
 import asyncio
 import os
-from typing import List
-import uuid
-from agentswarm.agents import ReActAgent, BaseAgent, MapReduceAgent
-from agentswarm.datamodels import Message, Context, LocalStore
-from agentswarm.llms import LLM, GeminiLLM
-from agentswarm.utils.tracing import LocalTracing
-from print_utils import Colors, get_user_input, print_message, print_separator
-from google.genai import Client
-from basic_agents.scraper_agent import ScraperAgent
-
 import textwrap
 import time
+import uuid
+from typing import List
 
+from basic_agents.scraper_agent import ScraperAgent
 from dotenv import load_dotenv
+from print_utils import Colors, get_user_input, print_message, print_separator
+
+from agentswarm.agents import BaseAgent, MapReduceAgent, ReActAgent
+from agentswarm.datamodels import Context, LocalStore, Message
+from agentswarm.llms import LLM, default_llm_provider
+from agentswarm.utils.tracing import LocalTracing
 
 load_dotenv()
 
-client = Client(
-    vertexai=True,
-    project=os.getenv("VERTEX_PROJECT"),
-    location=os.getenv("VERTEX_LOCATION"),
-)
+
+def vertex_llm(model: str = "gemini-3.1-flash-lite") -> LLM:
+    # The LLMs (and their client) are shared by all the agents and requests
+    return default_llm_provider.gemini(
+        model=model,
+        vertexai=True,
+        project=os.getenv("VERTEX_PROJECT"),
+        location=os.getenv("VERTEX_LOCATION"),
+    )
 
 
 class MasterAgent(ReActAgent):
@@ -29,7 +32,7 @@ class MasterAgent(ReActAgent):
         super().__init__(100, 5)
 
     def get_llm(self, user_id: str) -> LLM:
-        return GeminiLLM(client=client)
+        return vertex_llm()
 
     def id(self) -> str:
         return "master"
@@ -80,7 +83,7 @@ async def main():
         messages=conversation,
         store=store,
         tracing=tracing,
-        default_llm=GeminiLLM(client=client, model="gemini-3.1-flash-lite"),
+        default_llm=vertex_llm("gemini-3.1-flash-lite"),
     )
     tracing.trace_agent(context, master_agent.id(), {"task": prompt})
 
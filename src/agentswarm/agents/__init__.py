@@ -1,16 +1,36 @@
-from .react_agent import ReActAgent
-from .map_reduce_agent import MapReduceAgent, MapReduceInput
-from .gathering_agent import GatheringAgent, GatheringAgentInput
-from .merge_agent import MergeAgent, MergeAgentInput
-from .transformer_agent import TransformerAgent, TransformerAgentInput
-from .thinking_agent import ThinkingAgent, ThinkingInput
 from .base_agent import BaseAgent
-from .remote_agent import RemoteAgent, RemoteExecutionMode
+from .context_compactor import ContextCompactor, TokenBudgetCompactor
+from .gathering_agent import GatheringAgent, GatheringAgentInput
 from .http_remote_agent import HttpRemoteAgent
+from .map_reduce_agent import MapReduceAgent, MapReduceInput
 from .mcp_agent import MCPBaseAgent, MCPToolAgent
+from .merge_agent import MergeAgent, MergeAgentInput
+from .react_agent import ReActAgent
+from .react_events import (
+    FinalAnswerEvent,
+    IterationStartEvent,
+    ReActEvent,
+    TextDeltaEvent,
+    ThoughtEvent,
+    ToolCallEvent,
+    ToolResultEvent,
+    UsageEvent,
+)
+from .remote_agent import RemoteAgent, RemoteExecutionMode
+from .thinking_agent import ThinkingAgent, ThinkingInput
+from .tool_registry import CompiledTools, ToolRegistry
+from .transformer_agent import TransformerAgent, TransformerAgentInput
 
 __all__ = [
     "ReActAgent",
+    "ReActEvent",
+    "IterationStartEvent",
+    "ToolCallEvent",
+    "ToolResultEvent",
+    "ThoughtEvent",
+    "TextDeltaEvent",
+    "UsageEvent",
+    "FinalAnswerEvent",
     "MapReduceAgent",
     "MapReduceInput",
     "GatheringAgent",
@@ -22,6 +42,10 @@ __all__ = [
     "ThinkingAgent",
     "ThinkingInput",
     "BaseAgent",
+    "ToolRegistry",
+    "CompiledTools",
+    "ContextCompactor",
+    "TokenBudgetCompactor",
     "MCPBaseAgent",
     "MCPToolAgent",
     "RemoteAgent",
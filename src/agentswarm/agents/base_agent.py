@@ -1,9 +1,9 @@
 from abc import abstractmethod
-from typing import TypeVar, Generic, get_args
+from typing import Generic, Optional, TypeVar, get_args
 
 from pydantic import BaseModel
-from ..datamodels import Context
 
+from ..datamodels import CachePolicy, Context
 
 InputType = TypeVar('InputType', bound=BaseModel)
 OutputType = TypeVar('OutputType', bound=BaseModel)
@@ -23,6 +23,14 @@ class BaseAgent(Generic[InputType, OutputType]):
     async def execute(self, user_id: str, context: Context, input: InputType = None) -> OutputType:
         pass
 
+    def cache_policy(self, user_id: str) -> Optional[CachePolicy]:
+        """
+        Returns the policy used to memoize the results of the agent in the
+        result cache of the context, or None (default) to never cache them.
+        Override it only for agents whose result depends solely on their input.
+        """
+        return None
+
     def _get_generic_type(self, index: int):
         """
         Obtains the concrete type of the generic at the specified index (0 for InputType, 1 for OutputType).
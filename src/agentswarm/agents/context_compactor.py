@@ -0,0 +1,143 @@
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional, Sequence
+
+from ..datamodels import Context, Message
+from ..llms import TokenCounter
+from ..llms.tokens import DEFAULT_TOKEN_COUNTER
+
+
+class ContextCompactor(ABC):
+    """
+    The ContextCompactor class defines a compaction stage of the messages sent to
+    the LLM by a ReActAgent, applied before every iteration.
+    """
+
+    @abstractmethod
+    def compact(
+        self, messages: Sequence[Message], pinned: int, context: Context
+    ) -> Sequence[Message]:
+        """
+        Returns the messages to send to the LLM (the given sequence itself
+        when nothing needs to be compacted).
+
+        Args:
+            messages: The full history of the loop.
+            pinned: The number of leading messages (system prompts and the
+                initial request) that must be sent unchanged.
+            context: The context of the ReActAgent execution.
+        """
+        raise NotImplementedError
+
+
+class TokenBudgetCompactor(ContextCompactor):
+    """
+    Keeps the prompt of long ReAct runs within a token budget.
+
+    As long as the history fits the budget it is sent unchanged. Otherwise, the
+    pinned messages and the most recent ones are kept as they are, while older
+    messages are compacted in three steps, until the budget is met:
+
+      1. repeated messages (e.g. "Agent X executed successfully.") are deduplicated,
+         keeping the most recent occurrence;
+      2. long messages (e.g. large tool results) are moved to the store, and
+         replaced by a short preview and the store key they can be read back from;
+      3. the oldest messages are dropped.
+
+    Token counts are estimated by a TokenCounter, and memoized per message.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 32000,
+        keep_recent: int = 10,
+        max_message_chars: int = 2000,
+        preview_chars: int = 200,
+        token_counter: Optional[TokenCounter] = None,
+    ):
+        """
+        Args:
+            max_tokens: The token budget of the prompt.
+            keep_recent: Number of most recent messages never compacted.
+            max_message_chars: Messages longer than this are moved to the store.
+            preview_chars: Length of the preview left in place of a stored message.
+            token_counter: The counter used to estimate the token count of the
+                messages. Defaults to a CharTokenCounter.
+        """
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.max_message_chars = max_message_chars
+        self.preview_chars = preview_chars
+        self.token_counter = token_counter or DEFAULT_TOKEN_COUNTER
+
+    def _tokens(self, message: Message) -> int:
+        return self.token_counter.count_message(message)
+
+    def compact(
+        self, messages: Sequence[Message], pinned: int, context: Context
+    ) -> Sequence[Message]:
+        total = self.token_counter.count_messages(messages)
+        if total <= self.max_tokens:
+            # Sent as is: a MessageLog snapshot stays an O(1) view
+            return messages
+
+        head = list(messages[:pinned])
+        body_end = max(pinned, len(messages) - self.keep_recent)
+        body = list(messages[pinned:body_end])
+        recent = list(messages[body_end:])
+        budget = self.max_tokens - sum(
+            self._tokens(message) for message in head + recent
+        )
+
+        # 1. Deduplicate, keeping the most recent occurrence
+        seen = set()
+        deduped = []
+        for message in reversed(body):
+            key = (message.type, str(message.content))
+            if key in seen:
+                continue
+            seen.add(key)
+            deduped.append(message)
+        body = deduped[::-1]
+
+        # 2. Move the long messages to the store
+        if sum(self._tokens(message) for message in body) > budget:
+            body = [self._collapse(message, context) for message in body]
+
+        # 3. Drop the oldest messages
+        body_tokens = [self._tokens(message) for message in body]
+        remaining = sum(body_tokens)
+        dropped = 0
+        while body and remaining > budget:
+            body.pop(0)
+            remaining -= body_tokens.pop(0)
+            dropped += 1
+        if dropped > 0:
+            body.insert(
+                0,
+                Message(
+                    type="user",
+                    content=f"{dropped} earlier messages were omitted to fit the context window.",
+                ),
+            )
+
+        return head + body + recent
+
+    def _collapse(self, message: Message, context: Context) -> Message:
+        content = str(message.content)
+        if len(content) <= self.max_message_chars:
+            return message
+        # The collapsed message is memoized, so that the content is stored once
+        # even if the message is compacted again on the next iterations.
+        compacted = message._memo("_compacted")
+        if compacted is None:
+            key = f"compacted_{uuid.uuid4()}"
+            context.store.set(key, content)
+            compacted = message._memoize(
+                "_compacted",
+                Message(
+                    type=message.type,
+                    content=f"{content[: self.preview_chars]}... [truncated, the full content is stored in the store with key {key}]",
+                ),
+            )
+        return compacted
@@ -33,14 +33,21 @@ class HttpRemoteAgent(RemoteAgent[InputType, OutputType]):
     def get_remote_agent_id(self) -> str:
         return self.remote_agent_id
 
+    def _payload_timeout(self, payload: dict) -> float:
+        # The serialized context carries the time left before its deadline
+        remaining = (payload.get("context") or {}).get("remaining_time")
+        if remaining is None:
+            return self.timeout
+        return min(self.timeout, remaining)
+
     async def _call_remote_sync(self, payload: dict) -> dict:
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        async with httpx.AsyncClient(timeout=self._payload_timeout(payload)) as client:
             response = await client.post(f"{self.base_url}/execute", json=payload)
             response.raise_for_status()
             return response.json()
 
     async def _call_remote_async_init(self, payload: dict) -> RemoteExecutionHandler:
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        async with httpx.AsyncClient(timeout=self._payload_timeout(payload)) as client:
             response = await client.post(f"{self.base_url}/execute/async", json=payload)
             response.raise_for_status()
             data = response.json()
@@ -61,8 +68,11 @@ class HttpRemoteAgent(RemoteAgent[InputType, OutputType]):
 
         async with httpx.AsyncClient(timeout=self.timeout) as client:
             for _ in range(max_retries):
+                if context.remaining_time() == 0:
+                    raise TimeoutError("Remote execution exceeded the context deadline")
                 response = await client.get(
-                    f"{self.base_url}/execute/status/{handler.handler_id}"
+                    f"{self.base_url}/execute/status/{handler.handler_id}",
+                    timeout=context.bound_timeout(self.timeout),
                 )
                 response.raise_for_status()
                 data = response.json()
@@ -78,7 +88,7 @@ class HttpRemoteAgent(RemoteAgent[InputType, OutputType]):
                 elif data["status"] == "failed":
                     raise RuntimeError(f"Remote execution failed: {data.get('error')}")
 
-                await asyncio.sleep(interval)
+                await asyncio.sleep(context.bound_timeout(interval))
                 # Exponential backoff?
                 interval = min(interval * 1.5, 10.0)
 
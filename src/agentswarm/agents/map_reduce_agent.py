@@ -1,12 +1,13 @@
-import os
 from typing import List
 
 from pydantic import BaseModel, Field
-from ..llms import LLM, GeminiLLM
+
+from ..datamodels import Context, KeyStoreResponse, Message
+from ..llms import LLM, default_llm_provider
 from .base_agent import BaseAgent
-from ..datamodels import Context, Message, KeyStoreResponse
 from .react_agent import ReActAgent
 
+
 class MapReduceInput(BaseModel):
     task: str = Field(description="The task to solve, as a string")
 
@@ -14,10 +15,12 @@ class MapReduceAgent(ReActAgent[MapReduceInput, KeyStoreResponse]):
     def __init__(self, max_iterations: int = 100, agents: List[BaseAgent] = []):
         super().__init__(max_iterations)
         self.agents = agents
+        self._sub_agent = None
 
     def get_llm(self, user_id: str) -> LLM:
         # TODO: Better LLM consiguration
-        return GeminiLLM(api_key=os.getenv("GEMINI_API_KEY"))
+        # All the nodes of the recursion tree share the same LLM (and client)
+        return default_llm_provider.gemini()
 
     def id(self) -> str:
         return "map-reduce"
@@ -52,7 +55,12 @@ class MapReduceAgent(ReActAgent[MapReduceInput, KeyStoreResponse]):
 
     def available_agents(self, user_id: str) -> List[BaseAgent]:
         # IMPORTANT: Return a NEW instance of MapReduceAgent instead of self.
-        return [MapReduceAgent(max_iterations=self.max_iterations, agents=self.agents)] + self.agents
+        # The instance is created once and reused by all the iterations and calls.
+        if self._sub_agent is None:
+            self._sub_agent = MapReduceAgent(
+                max_iterations=self.max_iterations, agents=self.agents
+            )
+        return [self._sub_agent] + self.agents
 
     def generate_messages_context(self, user_id: str, context: Context, input: MapReduceInput = None) -> List[Message]:
         msgs = super().generate_messages_context(user_id, context, input)
@@ -1,22 +1,41 @@
 import asyncio
-from typing import List, Optional, Any, Dict
 from abc import abstractmethod
 from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
-from mcp.types import Tool 
+from mcp.types import Tool
 
+from ..datamodels import CachePolicy, Context
 from .base_agent import BaseAgent
-from ..datamodels import Context
+
+
+def _is_read_only(tool: Tool) -> bool:
+    annotations = getattr(tool, "annotations", None)
+    if annotations is None:
+        return False
+    # The attribute is named readOnlyHint or read_only_hint depending on the mcp version
+    hint = getattr(annotations, "read_only_hint", None)
+    if hint is None:
+        hint = getattr(annotations, "readOnlyHint", None)
+    return bool(hint)
+
 
 class MCPToolAgent(BaseAgent[dict, Any]):
     """
     An agent that wraps a specific tool from an MCP server.
     """
-    def __init__(self, session: ClientSession, tool: Tool):
+
+    def __init__(
+        self,
+        session: ClientSession,
+        tool: Tool,
+        cache_policy: Optional[CachePolicy] = None,
+    ):
         self._session = session
         self._tool = tool
+        self._cache_policy = cache_policy
 
     def id(self) -> str:
         return self._tool.name
@@ -24,6 +43,9 @@ class MCPToolAgent(BaseAgent[dict, Any]):
     def description(self, user_id: str) -> str:
         return self._tool.description or f"Tool {self._tool.name} from MCP server"
 
+    def cache_policy(self, user_id: str) -> Optional[CachePolicy]:
+        return self._cache_policy
+
     def input_parameters(self) -> dict:
         # MCP tools define inputSchema in a way compatible with JSON Schema
         schema = self._tool.inputSchema
@@ -42,8 +64,11 @@ class MCPToolAgent(BaseAgent[dict, Any]):
         if input is None:
             input = {}
         
-        # Call the tool on the MCP server
-        result = await self._session.call_tool(self._tool.name, arguments=input)
+        # Call the tool on the MCP server, within the deadline of the context
+        result = await asyncio.wait_for(
+            self._session.call_tool(self._tool.name, arguments=input),
+            timeout=context.remaining_time(),
+        )
         
         # Process result.content which is a list of TextContent | ImageContent | EmbeddedResource
         # For simplicity, we return the raw list or a simplified text representation
@@ -83,10 +108,15 @@ class MCPBaseAgent:
                 yield self
                 self._session = None
 
-    async def get_agents(self) -> List[MCPToolAgent]:
+    async def get_agents(
+        self, read_only_cache_policy: Optional[CachePolicy] = None
+    ) -> List[MCPToolAgent]:
         """
         Discovers tools on the connected MCP server and returns them as a list of MCPToolAgent.
         Must be called within the 'connect' context.
+
+        The results of the tools annotated as read-only by the server are
+        memoized with read_only_cache_policy, if provided.
         """
         if not self._session:
             raise RuntimeError("MCP session is not active. Use 'async with agent.connect():'")
@@ -94,6 +124,7 @@ class MCPBaseAgent:
         response = await self._session.list_tools()
         agents = []
         for tool in response.tools:
-            agents.append(MCPToolAgent(self._session, tool))
+            cache_policy = read_only_cache_policy if _is_read_only(tool) else None
+            agents.append(MCPToolAgent(self._session, tool, cache_policy=cache_policy))
         
         return agents
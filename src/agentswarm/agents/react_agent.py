@@ -1,24 +1,44 @@
-from abc import abstractmethod
-import traceback
 import asyncio
-from typing import List, TypeVar
+import warnings
+from abc import abstractmethod
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple, TypeVar
 
 from pydantic import BaseModel
-from .base_agent import BaseAgent
-from ..llms import LLM, LLMFunction
-from .gathering_agent import GatheringAgent
-from .merge_agent import MergeAgent
-from .transformer_agent import TransformerAgent
-from .thinking_agent import ThinkingAgent
+
 from ..datamodels import (
-    Message,
+    CompletionResponse,
     Context,
+    Feedback,
+    FeedbackSystem,
     KeyStoreResponse,
+    Message,
+    MessageLog,
+    Scheduler,
+    StrResponse,
     ThoughtResponse,
     VoidResponse,
-    StrResponse,
-    CompletionResponse,
 )
+from ..llms import LLM, LLMFunction, LLMFunctionExecution
+from ..llms.llm import FUNCTION_CALL_FEEDBACK_SOURCE, TEXT_FEEDBACK_SOURCE
+from .base_agent import BaseAgent
+from .context_compactor import ContextCompactor
+from .gathering_agent import GatheringAgent
+from .merge_agent import MergeAgent
+from .react_events import (
+    FinalAnswerEvent,
+    IterationStartEvent,
+    ReActEvent,
+    TextDeltaEvent,
+    ThoughtEvent,
+    ToolCallEvent,
+    ToolResultEvent,
+    UsageEvent,
+)
+from .thinking_agent import ThinkingAgent
+from .tool_registry import CompiledTools, ToolRegistry
+from .transformer_agent import TransformerAgent
 
 InputType = TypeVar("InputType", bound=BaseModel)
 OutputType = TypeVar("OutputType", bound=BaseModel)
@@ -26,9 +46,29 @@ OutputType = TypeVar("OutputType", bound=BaseModel)
 
 class ReActAgent(BaseAgent[InputType, OutputType]):
 
-    def __init__(self, max_iterations: int = 100, max_concurrent_agents: int = 5):
+    def __init__(
+        self,
+        max_iterations: int = 100,
+        max_concurrent_agents: int = 5,
+        stream_tool_calls: bool = False,
+        deadline_reserve: float = 5.0,
+    ):
+        """
+        Args:
+            max_iterations: Maximum number of iterations of the loop.
+            max_concurrent_agents: Maximum number of agents executed in parallel
+                in a single iteration.
+            stream_tool_calls: Stream the LLM response and dispatch each function
+                call as soon as it is decoded, overlapping the first tool
+                executions with the rest of the generation.
+            deadline_reserve: When the context has a deadline, seconds reserved
+                at the end of the budget to produce a best-effort answer.
+        """
         self.max_iterations = max_iterations
         self.max_concurrent_agents = max_concurrent_agents
+        self.stream_tool_calls = stream_tool_calls
+        self.deadline_reserve = deadline_reserve
+        self._tool_registry = ToolRegistry()
 
     @abstractmethod
     def get_llm(self, user_id: str) -> LLM:
@@ -61,6 +101,14 @@ class ReActAgent(BaseAgent[InputType, OutputType]):
             MergeAgent(),
         ]
 
+    def get_context_compactor(self, user_id: str) -> Optional[ContextCompactor]:
+        """
+        Returns the compactor applied to the messages before every LLM call,
+        to bound the prompt growth of long runs (e.g. a TokenBudgetCompactor).
+        By default, no compaction is applied.
+        """
+        return None
+
     @abstractmethod
     def available_agents(self, user_id: str) -> List[BaseAgent]:
         """
@@ -83,54 +131,98 @@ class ReActAgent(BaseAgent[InputType, OutputType]):
         """
         pass
 
+    def get_tools(self, user_id: str) -> CompiledTools:
+        """
+        Returns the compiled tools of the available agents: the function
+        declarations for the LLM and the index used to dispatch the calls.
+        The declarations are compiled once per user and agent set, and reused
+        on the following iterations.
+        """
+        return self._tool_registry.compile(user_id, self.available_agents(user_id))
+
     def generate_function_calls(self, user_id: str) -> List[LLMFunction]:
-        functions = []
-        for agent in self.available_agents(user_id):
-            try:
-                functions.append(
-                    LLMFunction(
-                        name=agent.id(),
-                        description=agent.description(user_id),
-                        parameters=agent.input_parameters(),
-                    )
-                )
-            except Exception as e:
-                print(f"Error generating function call for agent {agent.id()}: {e}")
-                print(traceback.format_exc())
-        return functions
+        """
+        Returns the function declarations sent to the LLM. By default, the
+        declarations of the available agents.
+        """
+        return self._current_tools(user_id).functions
+
+    def _current_tools(self, user_id: str) -> CompiledTools:
+        """
+        Returns the tools compiled for the running iteration of this agent, or
+        compiles them if called outside of an execution.
+        """
+        current = _iteration_tools.get()
+        if current is not None and current[0] is self and current[1] == user_id:
+            return current[2]
+        return self.get_tools(user_id)
+
+    def invalidate_tools(self, user_id: Optional[str] = None):
+        """
+        Drops the cached function declarations of the given user (or of all the
+        users), forcing their regeneration on the next iteration.
+        Call it when the description or the parameters of an agent change.
+        """
+        self._tool_registry.invalidate(user_id)
 
     async def agent_execution(
         self, user_id: str, context: Context, function: LLMFunction
     ):
-        agent = next(
-            (
-                agent
-                for agent in self.available_agents(user_id)
-                if agent.id() == function.name
-            ),
-            None,
-        )
+        tools = self._current_tools(user_id)
+        agent = tools.agent(function.name)
         if agent is None:
             raise Exception(f"Agent {function.name} not found")
 
-        input_type = agent._get_generic_type(0)
-        if input_type and isinstance(function.arguments, dict):
-            validated_input = input_type(**function.arguments)
+        validated_input = tools.validate_input(function.name, function.arguments)
 
-            # Create a new context for the agent to support tracing hierarchy
-            new_context = context.copy_for_execution()
+        # Create a new context for the agent to support tracing hierarchy
+        new_context = context.copy_for_execution()
 
-            # Trace the agent execution
-            context.tracing.trace_agent(new_context, agent.id(), function.arguments)
+        # Trace the agent execution
+        context.tracing.trace_agent(new_context, agent.id(), function.arguments)
 
-            try:
-                result = await agent.execute(user_id, new_context, validated_input)
+        # Reuse the memoized result of an identical execution, if any
+        cache_policy = (
+            agent.cache_policy(user_id) if context.result_cache is not None else None
+        )
+        cache_key = None
+        if cache_policy is not None:
+            cache_key = cache_policy.key(
+                agent.id(), validated_input, user_id, context.trace_id
+            )
+            hit, result = await context.result_cache.aget(cache_key)
+            if hit:
+                context.tracing.trace_agent_cache_hit(new_context, agent.id())
                 context.tracing.trace_agent_result(new_context, agent.id(), result)
                 return result
+
+        # Nested orchestrators are not gated by the tool lane of the scheduler:
+        # they spend their time waiting for their own tools, and holding a slot
+        # while their children wait for one could deadlock the tree.
+        slot = (
+            nullcontext()
+            if isinstance(agent, ReActAgent)
+            else new_context.slot(Scheduler.TOOL)
+        )
+
+        try:
+            async with slot:
+                result = await agent.execute(user_id, new_context, validated_input)
+            context.tracing.trace_agent_result(new_context, agent.id(), result)
+        except asyncio.CancelledError:
+            context.tracing.trace_agent_cancelled(new_context, agent.id())
+            raise
+        except Exception as e:
+            context.tracing.trace_agent_error(new_context, agent.id(), e)
+            raise e
+
+        if cache_key is not None:
+            try:
+                await context.result_cache.aset(cache_key, result, ttl=cache_policy.ttl)
             except Exception as e:
-                context.tracing.trace_agent_error(new_context, agent.id(), e)
-                raise e
-        raise Exception(f"Invalid arguments for agent {function.name}")
+                # A failing cache must not fail the execution
+                print(f"Error caching the result of agent {agent.id()}: {e}")
+        return result
 
     def generate_messages_context(
         self, user_id: str, context: Context, input: InputType = None
@@ -150,7 +242,16 @@ class ReActAgent(BaseAgent[InputType, OutputType]):
     async def gather_with_concurrency(self, n, *tasks):
         """
         Runs tasks with a concurrency limit of n.
+
+        Deprecated: the function calls are executed by the tool dispatcher,
+        which enforces max_concurrent_agents. Kept for the subclasses calling it.
         """
+        warnings.warn(
+            "ReActAgent.gather_with_concurrency() is deprecated and no longer "
+            "used by execute()",
+            DeprecationWarning,
+            stacklevel=2,
+        )
         semaphore = asyncio.Semaphore(n)
 
         async def sem_task(task):
@@ -162,14 +263,76 @@ class ReActAgent(BaseAgent[InputType, OutputType]):
     async def execute(
         self, user_id: str, context: Context, input: InputType = None
     ) -> OutputType:
+        messages = None
+        async for event in self.execute_stream(
+            user_id, context, input, stream_text=False
+        ):
+            if isinstance(event, FinalAnswerEvent):
+                messages = event.messages
+        return messages
+
+    async def execute_stream(
+        self,
+        user_id: str,
+        context: Context,
+        input: InputType = None,
+        stream_text: bool = True,
+    ) -> AsyncIterator[ReActEvent]:
+        """
+        Executes the agent, yielding the events of the loop as they happen: the
+        iteration starts, the tool calls and their results, the thoughts, the
+        text streamed by the LLM and the usage of each call. The last event is
+        a FinalAnswerEvent, with the messages execute() would return.
 
-        current_context = self.generate_messages_context(user_id, context, input)
+        The events are queued as they happen, so a slow consumer does not slow
+        the execution down. Closing the iteration early cancels the execution.
+
+        Args:
+            stream_text: Stream the text of the LLM as TextDeltaEvents (the LLM
+                is then always called with a feedback system).
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        task = asyncio.ensure_future(
+            self._run(user_id, context, input, queue.put_nowait, stream_text)
+        )
+        task.add_done_callback(lambda _: queue.put_nowait(_END_OF_EVENTS))
+        try:
+            while True:
+                event = await queue.get()
+                if event is _END_OF_EVENTS:
+                    break
+                yield event
+            messages = task.result()
+        finally:
+            if not task.done():
+                await _cancel_tasks([task])
+        yield FinalAnswerEvent(messages)
+
+    async def _run(
+        self,
+        user_id: str,
+        context: Context,
+        input: InputType,
+        emit: Callable[[ReActEvent], None],
+        stream_text: bool,
+    ) -> List[Message]:
+        # Set in the task of this execution only: the tool tasks inherit it,
+        # nested ReActAgents set their own.
+        _emit_event.set(emit)
+
+        # The history is append-only: every iteration reads an O(1) snapshot
+        # of the log instead of a new copy of the whole list.
+        history = MessageLog(self.generate_messages_context(user_id, context, input))
+        # The initial messages (system prompts and request) are never compacted
+        pinned = len(history)
+        compactor = self.get_context_compactor(user_id)
         iteration = 0
 
         while iteration < self.max_iterations:
 
             # Create an iteration step ID
             iteration_step_id = f"{context.step_id}_iter_{iteration}"
+            current_context = history.snapshot()
 
             # Trace the iteration start
             iter_context = context.copy_for_iteration(
@@ -177,38 +340,94 @@ class ReActAgent(BaseAgent[InputType, OutputType]):
             )
 
             context.tracing.trace_loop_step(iter_context, f"Iteration {iteration}")
+            emit(IterationStartEvent(iteration))
 
             tmp_context = current_context
+            if compactor is not None:
+                tmp_context = compactor.compact(current_context, pinned, context)
+
+            # Compile (or reuse) the tools once for the whole iteration: the
+            # function calls are dispatched with this iteration's agents.
+            tools = self.get_tools(user_id)
+            _iteration_tools.set((self, user_id, tools))
+            functions = self.generate_function_calls(user_id)
+
+            feedback = (
+                _TextEvents(iter_context.feedback, emit)
+                if stream_text
+                else iter_context.feedback
+            )
 
-            response = await self.get_llm(user_id).generate(
-                tmp_context,
-                functions=self.generate_function_calls(user_id),
-                feedback=iter_context.feedback,
+            async def execute_tool(function_call: LLMFunctionExecution) -> Message:
+                # Each tool runs in its own task: bind it to this iteration,
+                # whichever task (e.g. a streaming LLM) started it.
+                _emit_event.set(emit)
+                _iteration_tools.set((self, user_id, tools))
+                emit(ToolCallEvent(function_call))
+                message = await self.execute_and_handle_result(
+                    user_id, iter_context, function_call, context
+                )
+                emit(ToolResultEvent(function_call, message))
+                return message
+
+            # The dispatcher executes the function calls with a concurrency limit.
+            # In streaming mode it is also the feedback of the LLM, so that each
+            # function call starts as soon as it is streamed.
+            dispatcher = _ToolDispatcher(
+                execute_tool, self.max_concurrent_agents, feedback
             )
+
+            # Stop working when there is no time left before the deadline
+            if context.remaining_time(self.deadline_reserve) == 0:
+                return await self.best_effort_answer(user_id, iter_context, tmp_context)
+
+            llm = self.get_llm(user_id)
+            # Fail fast on prompts that the LLM would reject
+            llm.check_prompt_size(tmp_context, functions)
+
+            async def generate():
+                async with iter_context.slot(Scheduler.LLM):
+                    return await llm.generate(
+                        tmp_context,
+                        functions=functions,
+                        feedback=(dispatcher if self.stream_tool_calls else feedback),
+                    )
+
+            try:
+                response = await asyncio.wait_for(
+                    generate(), timeout=context.remaining_time(self.deadline_reserve)
+                )
+            except BaseException as e:
+                await dispatcher.cancel()
+                if (
+                    isinstance(e, Exception)
+                    and context.remaining_time(self.deadline_reserve) == 0
+                ):
+                    # The deadline expired during the generation
+                    return await self.best_effort_answer(
+                        user_id, iter_context, tmp_context
+                    )
+                raise
             iter_context.add_usage(response.usage)
+            emit(UsageEvent(response.usage))
 
             if response.function_calls is None or len(response.function_calls) == 0:
+                await dispatcher.cancel()
                 return [Message(type="assistant", content=response.text)]
 
             has_execution_tool = False
             output = []
-
-            # Prepare tasks for parallel execution
-            tasks = []
+            thinking_agent_id = self.get_thinking_agent().id()
 
             for function_call in response.function_calls:
-                if function_call.name != self.get_thinking_agent().id():
+                if function_call.name != thinking_agent_id:
                     has_execution_tool = True
 
-                # We wrap the execution in a task, capturing the necessary context
-                task = self.execute_and_handle_result(
-                    user_id, iter_context, function_call, context
-                )
-                tasks.append(task)
-
-            # Execute all tasks in parallel with concurrency limit
-            results = await self.gather_with_concurrency(
-                self.max_concurrent_agents, *tasks
+            # Execute all the function calls in parallel (reusing the ones
+            # already started while streaming)
+            results = await dispatcher.gather(
+                response.function_calls,
+                timeout=context.remaining_time(self.deadline_reserve),
             )
 
             # Flatten results into output list
@@ -222,11 +441,43 @@ class ReActAgent(BaseAgent[InputType, OutputType]):
                 output.append(Message(type="assistant", content=response.text))
                 return output
 
-            current_context = current_context + output
+            history.extend(output)
             iteration += 1
 
         raise Exception("Max iterations reached")
 
+    async def best_effort_answer(
+        self, user_id: str, context: Context, messages: List[Message]
+    ) -> List[Message]:
+        """
+        Called when the deadline of the context expires before the loop has
+        completed. Asks the LLM for a final answer based on the information
+        gathered so far (without tools), within the reserved time.
+        Override it to customize the answer returned on deadline expiration.
+        """
+        fallback = [
+            Message(
+                type="assistant",
+                content="I could not complete the task within the time limit.",
+            )
+        ]
+        remaining = context.remaining_time()
+        if not remaining:
+            return fallback
+
+        prompt = list(messages) + [Message(type="user", content=DEADLINE_PROMPT)]
+        try:
+            async with context.slot(Scheduler.LLM):
+                response = await asyncio.wait_for(
+                    self.get_llm(user_id).generate(prompt), timeout=remaining
+                )
+        except Exception:
+            return fallback
+        context.add_usage(response.usage)
+        if not response.text:
+            return fallback
+        return [Message(type="assistant", content=response.text)]
+
     async def execute_and_handle_result(
         self,
         user_id: str,
@@ -244,6 +495,9 @@ class ReActAgent(BaseAgent[InputType, OutputType]):
                 return result
             elif isinstance(result, ThoughtResponse):
                 context.thoughts.append(result.thought)
+                emit = _emit_event.get()
+                if emit is not None:
+                    emit(ThoughtEvent(result.thought))
                 return Message(type="assistant", content=f"Thought: {result.thought}")
             elif isinstance(result, VoidResponse) or result is None:
                 return Message(
@@ -273,6 +527,188 @@ class ReActAgent(BaseAgent[InputType, OutputType]):
             )
 
 
+async def _cancel_tasks(tasks):
+    """
+    Cancels the given tasks, and waits for their cancellation to complete.
+    """
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except (asyncio.CancelledError, Exception):
+            pass
+
+
+# Marks the end of the execution in the event queue of execute_stream()
+_END_OF_EVENTS = object()
+
+# The event emitter of the ReActAgent execution running in the current task
+_emit_event: ContextVar[Optional[Callable[[ReActEvent], None]]] = ContextVar(
+    "_emit_event", default=None
+)
+
+# The agent, user and compiled tools of the ReAct iteration running in the
+# current task, used to dispatch its function calls
+_iteration_tools: ContextVar[Optional[Tuple["ReActAgent", str, CompiledTools]]] = (
+    ContextVar("_iteration_tools", default=None)
+)
+
+
+class _TextEvents(FeedbackSystem):
+    """
+    A FeedbackSystem proxy emitting the text chunks streamed by the LLM as
+    TextDeltaEvents, and forwarding every event to the inner feedback system.
+    """
+
+    def __init__(
+        self, inner: Optional[FeedbackSystem], emit: Callable[[ReActEvent], None]
+    ):
+        self._inner = inner
+        self._emit = emit
+
+    def push(self, feedback: Feedback):
+        if feedback.source == TEXT_FEEDBACK_SOURCE and isinstance(
+            feedback.payload, str
+        ):
+            self._emit(TextDeltaEvent(feedback.payload))
+        if self._inner is not None:
+            self._inner.push(feedback)
+
+    def subscribe(self, callback: Callable[[Feedback], None]):
+        if self._inner is not None:
+            self._inner.subscribe(callback)
+
+    def to_dict(self) -> dict:
+        raise NotImplementedError("_TextEvents is an internal, non-serializable proxy.")
+
+    @classmethod
+    def recreate(cls, config: dict) -> "_TextEvents":
+        raise NotImplementedError("_TextEvents is an internal, non-serializable proxy.")
+
+
+class _ToolDispatcher(FeedbackSystem):
+    """
+    Executes the function calls of a single ReAct iteration, with a concurrency
+    limit.
+
+    It is also a FeedbackSystem proxy: when used as the feedback of a streaming
+    LLM, every function call pushed by the LLM is started immediately, while all
+    the other events are forwarded to the inner feedback system.
+    When the generation completes, gather() matches the final function calls
+    with the ones already started, and starts the missing ones. The first
+    completion returned by a call cancels all its siblings. Started calls
+    that are not part of the final response (e.g. streamed by an attempt that
+    was later retried) are cancelled.
+    """
+
+    def __init__(
+        self,
+        execute: Callable[[LLMFunctionExecution], Awaitable[Message]],
+        max_concurrency: int,
+        inner: Optional[FeedbackSystem] = None,
+    ):
+        self._execute = execute
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inner = inner
+        self._started: List[tuple[LLMFunctionExecution, asyncio.Task]] = []
+
+    def push(self, feedback: Feedback):
+        if feedback.source == FUNCTION_CALL_FEEDBACK_SOURCE and isinstance(
+            feedback.payload, LLMFunctionExecution
+        ):
+            self._started.append((feedback.payload, self._start(feedback.payload)))
+        if self._inner is not None:
+            self._inner.push(feedback)
+
+    def _start(self, function_call: LLMFunctionExecution) -> asyncio.Task:
+        async def run():
+            async with self._semaphore:
+                return await self._execute(function_call)
+
+        return asyncio.ensure_future(run())
+
+    async def gather(
+        self,
+        function_calls: List[LLMFunctionExecution],
+        timeout: Optional[float] = None,
+    ) -> List[Optional[Message]]:
+        """
+        Waits for the results of the given function calls, in order.
+
+        As soon as one of them returns a completion (or fails with an unexpected
+        error), the others are cancelled (with their nested agents) and their
+        result is None. The calls still running after timeout seconds are
+        cancelled too, and reported as such.
+        """
+        tasks = []
+        for function_call in function_calls:
+            task = None
+            for idx, (started_call, started_task) in enumerate(self._started):
+                if started_call == function_call:
+                    task = started_task
+                    del self._started[idx]
+                    break
+            tasks.append(task if task is not None else self._start(function_call))
+        await self.cancel()
+
+        loop = asyncio.get_event_loop()
+        end = loop.time() + timeout if timeout is not None else None
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=max(0, end - loop.time()) if end is not None else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    break
+                for task in done:
+                    # Unexpected errors are fatal for the whole iteration
+                    result = task.result()
+                    if result is not None and result.type == "completion":
+                        return [result if t is task else None for t in tasks]
+        finally:
+            await _cancel_tasks(pending)
+        return [
+            (
+                Message(
+                    type="user",
+                    content=f"Agent {function_call.name} was cancelled: the time limit was reached.",
+                )
+                if task in pending
+                else task.result()
+            )
+            for function_call, task in zip(function_calls, tasks)
+        ]
+
+    async def cancel(self):
+        """
+        Cancels the started function calls not claimed by gather().
+        """
+        started, self._started = self._started, []
+        await _cancel_tasks([task for _, task in started])
+
+    def subscribe(self, callback: Callable[[Feedback], None]):
+        if self._inner is not None:
+            self._inner.subscribe(callback)
+
+    def to_dict(self) -> dict:
+        raise NotImplementedError(
+            "_ToolDispatcher is an internal, non-serializable proxy."
+        )
+
+    @classmethod
+    def recreate(cls, config: dict) -> "_ToolDispatcher":
+        raise NotImplementedError(
+            "_ToolDispatcher is an internal, non-serializable proxy."
+        )
+
+
+DEADLINE_PROMPT = """The time available for this task has run out and no more tools can be used.
+Answer now, with the information gathered so far. If it is not enough, say what is missing."""
+
 REACT_SYS_PROMPT = """
 You are an advanced AI agent capable of using multiple tools to solve complex tasks.
 
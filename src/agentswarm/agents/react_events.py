@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from typing import List, Union
+
+from ..datamodels import Message
+from ..llms import LLMFunctionExecution, LLMUsage
+
+
+@dataclass(slots=True)
+class IterationStartEvent:
+    """An iteration of the ReAct loop starts."""
+
+    iteration: int
+
+
+@dataclass(slots=True)
+class ToolCallEvent:
+    """The execution of a function call (an agent) starts."""
+
+    function_call: LLMFunctionExecution
+
+
+@dataclass(slots=True)
+class ToolResultEvent:
+    """The execution of a function call completed, with the given message."""
+
+    function_call: LLMFunctionExecution
+    message: Message
+
+
+@dataclass(slots=True)
+class ThoughtEvent:
+    """The thinking agent explained the plan."""
+
+    thought: str
+
+
+@dataclass(slots=True)
+class TextDeltaEvent:
+    """
+    A chunk of the text streamed by the LLM. The text of the last iteration is
+    the final answer.
+    """
+
+    text: str
+
+
+@dataclass(slots=True)
+class UsageEvent:
+    """The usage of an LLM call of the loop."""
+
+    usage: LLMUsage
+
+
+@dataclass(slots=True)
+class FinalAnswerEvent:
+    """The result of the execution, always the last event."""
+
+    messages: List[Message]
+
+
+ReActEvent = Union[
+    IterationStartEvent,
+    ToolCallEvent,
+    ToolResultEvent,
+    ThoughtEvent,
+    TextDeltaEvent,
+    UsageEvent,
+    FinalAnswerEvent,
+]
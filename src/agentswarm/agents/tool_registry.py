@@ -0,0 +1,139 @@
+import traceback
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter
+
+from ..llms import LLMFunction
+from .base_agent import BaseAgent
+
+
+class CompiledTools:
+    """
+    The tools of a single ReAct iteration: the LLMFunction declarations to send
+    to the LLM, and an id -> agent index used to dispatch the function calls
+    returned by the LLM.
+
+    The index is built from the agents returned by available_agents() for this
+    iteration, so the calls always reach the current agent instances.
+    """
+
+    def __init__(
+        self,
+        functions: List[LLMFunction],
+        agents: List[BaseAgent],
+        adapters: Optional[Dict[type, TypeAdapter]] = None,
+    ):
+        self.functions = functions
+        self._agents: Dict[str, BaseAgent] = {}
+        for agent in agents:
+            self._agents.setdefault(agent.id(), agent)
+        self._adapters = adapters if adapters is not None else {}
+
+    def agent(self, name: str) -> Optional[BaseAgent]:
+        """
+        Returns the agent with the given id, or None if it is not available.
+        """
+        return self._agents.get(name)
+
+    def input_adapter(self, name: str) -> Optional[TypeAdapter]:
+        """
+        Returns the TypeAdapter validating the input of the given agent, or None
+        if the agent does not declare an input type.
+        The adapter is built once per input type and reused by the following
+        calls.
+        """
+        input_type = self._agents[name]._get_generic_type(0)
+        if input_type is None:
+            return None
+        adapter = self._adapters.get(input_type)
+        if adapter is None:
+            adapter = self._adapters[input_type] = TypeAdapter(input_type)
+        return adapter
+
+    def validate_input(self, name: str, arguments: Any) -> Any:
+        """
+        Validates the arguments generated by the LLM against the input type of
+        the given agent.
+        """
+        adapter = self.input_adapter(name)
+        if adapter is None or not isinstance(arguments, dict):
+            raise Exception(f"Invalid arguments for agent {name}")
+        return adapter.validate_python(arguments)
+
+
+class ToolRegistry:
+    """
+    Compiles the agents available to a ReActAgent into the list of LLMFunction
+    declarations sent to the LLM, and caches the result.
+
+    Generating a declaration calls description() and input_parameters() on
+    every agent, and the latter regenerates a pydantic JSON schema each time.
+    The declarations are cached per (user_id, agent set), where the agent set
+    is the ordered list of agent ids, so that every ReAct iteration gets back
+    the very same list. The input TypeAdapters are cached per input type.
+
+    Only the declarations and the adapters are cached: the agent instances are
+    never kept, and the id -> agent index is rebuilt on every compile() from
+    the agents passed in (e.g. an MCP agent recreated after a reconnection).
+
+    Call invalidate() when the description or the parameters of an agent
+    change at runtime without its id changing.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._functions: OrderedDict[Tuple[str, Tuple[str, ...]], List[LLMFunction]] = (
+            OrderedDict()
+        )
+        self._adapters: Dict[type, TypeAdapter] = {}
+
+    def compile(self, user_id: str, agents: List[BaseAgent]) -> CompiledTools:
+        """
+        Returns the tools of the given agents, generating their declarations
+        only if this (user_id, agent set) has not been seen before.
+        """
+        return CompiledTools(self.functions(user_id, agents), agents, self._adapters)
+
+    def functions(self, user_id: str, agents: List[BaseAgent]) -> List[LLMFunction]:
+        """
+        Returns the LLMFunction declarations for the given agents.
+        """
+        key = (user_id, tuple(agent.id() for agent in agents))
+        functions = self._functions.get(key)
+        if functions is not None:
+            self._functions.move_to_end(key)
+            return functions
+
+        functions = self._compile(user_id, agents)
+        self._functions[key] = functions
+        if len(self._functions) > self.max_entries:
+            self._functions.popitem(last=False)
+        return functions
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """
+        Drops the cached declarations of the given user, or of every user if
+        user_id is None.
+        """
+        if user_id is None:
+            self._functions.clear()
+            return
+        for key in [key for key in self._functions if key[0] == user_id]:
+            del self._functions[key]
+
+    def _compile(self, user_id: str, agents: List[BaseAgent]) -> List[LLMFunction]:
+        functions = []
+        for agent in agents:
+            try:
+                functions.append(
+                    LLMFunction(
+                        name=agent.id(),
+                        description=agent.description(user_id),
+                        parameters=agent.input_parameters(),
+                    )
+                )
+            except Exception as e:
+                print(f"Error generating function call for agent {agent.id()}: {e}")
+                print(traceback.format_exc())
+        return functions
@@ -1,10 +1,13 @@
+import asyncio
 import os
 import uuid
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
-from .base_agent import BaseAgent
-from ..datamodels import Message, Context, KeyStoreResponse
+
+from ..datamodels import Context, KeyStoreResponse, Message, Scheduler
 from ..llms import GeminiLLM
+from .base_agent import BaseAgent
 
 
 class TransformerAgentInput(BaseModel):
@@ -22,6 +25,21 @@ YOU CAN NOT USE PYTHON OR ANY OTHER PROGRAMMING LANGUAGE TO SPECIFY THE COMMAND.
 
 
 class TransformerAgent(BaseAgent[TransformerAgentInput, KeyStoreResponse]):
+    def __init__(
+        self, chunk_chars: Optional[int] = None, max_concurrent_chunks: int = 8
+    ):
+        """
+        Args:
+            chunk_chars: When set, values longer than this are split into chunks
+                (on line boundaries), transformed independently with a single
+                LLM batch, and joined back. Use it for bulk transformations that
+                apply to each part of the data (e.g. extraction, filtering).
+            max_concurrent_chunks: Maximum number of chunks transformed at the
+                same time, when the LLM sends the batch requests concurrently.
+        """
+        self.chunk_chars = chunk_chars
+        self.max_concurrent_chunks = max_concurrent_chunks
+
     def id(self) -> str:
         return "transformer-agent"
 
@@ -31,32 +49,86 @@ I'm able to transform an information from the store into a new information in th
 I can be used to apply complex llm-based task to the stored data, in order to optimize the general context.
         """
 
-    async def execute(
-        self, user_id: str, context: Context, input: TransformerAgentInput
-    ) -> KeyStoreResponse:
-        if not context.store.has(input.key):
-            raise ValueError(f"Key {input.key} not found in store")
-
-        value = context.store.get(input.key)
+    def _messages(self, value: str, cmd: str) -> List[Message]:
         all = [Message(type="user", content=f"{value}")]
 
         all.append(
             Message(
                 type="user",
-                content=f"Filter the previous data using this command:\n{input.cmd}\n. The ouput should be a new data, not a prompt or a python code. If not specified, you can optimize the output for your internal use.",
+                content=f"Filter the previous data using this command:\n{cmd}\n. The ouput should be a new data, not a prompt or a python code. If not specified, you can optimize the output for your internal use.",
             )
         )
+        return all
+
+    async def execute(
+        self, user_id: str, context: Context, input: TransformerAgentInput
+    ) -> KeyStoreResponse:
+        if not context.store.has(input.key):
+            raise ValueError(f"Key {input.key} not found in store")
+
+        value = context.store.get(input.key)
 
         llm = context.default_llm
         if llm is None:
             raise ValueError("Default LLM not set")
-        response = await llm.generate(all)
-        context.add_usage(response.usage)
+
+        chunks = _split(f"{value}", self.chunk_chars) if self.chunk_chars else None
+        if chunks is not None and len(chunks) > 1:
+            requests = [self._messages(chunk, input.cmd) for chunk in chunks]
+            for request in requests:
+                llm.check_prompt_size(request)
+            # Each request of the batch holds its own slot, as it is sent
+            responses = await asyncio.wait_for(
+                llm.generate_batch(
+                    requests,
+                    max_concurrency=self.max_concurrent_chunks,
+                    slot=lambda: context.slot(Scheduler.LLM),
+                ),
+                timeout=context.remaining_time(),
+            )
+            for response in responses:
+                context.add_usage(response.usage)
+            text = "\n".join(response.text for response in responses)
+        else:
+            all = self._messages(value, input.cmd)
+            llm.check_prompt_size(all)
+            async with context.slot(Scheduler.LLM):
+                response = await asyncio.wait_for(
+                    llm.generate(all), timeout=context.remaining_time()
+                )
+            context.add_usage(response.usage)
+            text = response.text
 
         new_key = f"transformer_{uuid.uuid4()}"
-        context.store.set(new_key, response.text)
+        context.store.set(new_key, text)
 
         return KeyStoreResponse(
             key=new_key,
             description=f"Transformed information from key {input.key} with command {input.cmd}",
         )
+
+
+def _split(text: str, chunk_chars: int) -> List[str]:
+    """
+    Splits the text into chunks of at most chunk_chars characters, on line
+    boundaries when possible.
+    """
+    chunks = []
+    current = []
+    size = 0
+    for line in text.splitlines(keepends=True):
+        # Lines longer than a chunk are split in place
+        while len(line) > chunk_chars:
+            if current:
+                chunks.append("".join(current))
+                current, size = [], 0
+            chunks.append(line[:chunk_chars])
+            line = line[chunk_chars:]
+        if size + len(line) > chunk_chars and current:
+            chunks.append("".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line)
+    if current:
+        chunks.append("".join(current))
+    return chunks
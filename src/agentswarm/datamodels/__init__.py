@@ -1,20 +1,30 @@
 from .context import Context
+from .feedback import Feedback, FeedbackSystem
+from .local_feedback import LocalFeedbackSystem
+from .local_store import LocalStore
 from .message import Message
+from .message_log import MessageLog, MessageLogView
 from .responses import (
+    CompletionResponse,
     KeyStoreResponse,
-    VoidResponse,
-    ThoughtResponse,
     StrResponse,
-    CompletionResponse,
+    ThoughtResponse,
+    VoidResponse,
+)
+from .result_cache import (
+    CachePolicy,
+    DiskResultCache,
+    MemoryResultCache,
+    ResultCache,
 )
+from .scheduler import Scheduler
 from .store import Store
-from .local_store import LocalStore
-from .feedback import Feedback, FeedbackSystem
-from .local_feedback import LocalFeedbackSystem
 
 __all__ = [
     "Context",
     "Message",
+    "MessageLog",
+    "MessageLogView",
     "StrResponse",
     "KeyStoreResponse",
     "VoidResponse",
@@ -24,4 +34,9 @@ __all__ = [
     "Feedback",
     "FeedbackSystem",
     "LocalFeedbackSystem",
+    "Scheduler",
+    "CachePolicy",
+    "ResultCache",
+    "MemoryResultCache",
+    "DiskResultCache",
 ]
@@ -1,16 +1,23 @@
 from __future__ import annotations
-from pydantic import BaseModel, ConfigDict
+
+import time
 import uuid
-from typing import List, Optional, TYPE_CHECKING
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, List, Optional, Sequence
+
+from pydantic import BaseModel, ConfigDict
 
-from .message import Message
 from ..llms.usage import LLMUsage
-from .store import Store
 from .feedback import Feedback, FeedbackSystem
+from .message import Message
+from .result_cache import ResultCache
+from .scheduler import Scheduler
+from .store import Store
 
 if TYPE_CHECKING:
-    from ..utils.tracing import Tracing
     from ..llms.llm import LLM
+    from ..llms.tokens import TokenCounter
+    from ..utils.tracing import Tracing
 
 
 class Context:
@@ -25,7 +32,8 @@ class Context:
     step_id: str
     # The parent_step_id is the unique identifier of the parent step, that originally creates this step
     parent_step_id: Optional[str]
-    # The list of the messages of the current context
+    # The list of the messages of the current context.
+    # Iteration contexts receive a read-only MessageLogView of the loop history.
     messages: List[Message]
     # Reference to the current store
     store: Store
@@ -39,6 +47,14 @@ class Context:
     tracing: Tracing
     # Reference to the feedback system
     feedback: Optional[FeedbackSystem]
+    # Reference to the scheduler, shared by the whole execution tree
+    scheduler: Optional[Scheduler]
+    # Depth of the current execution in the agents tree (0 for the root)
+    depth: int
+    # Wall-clock deadline of the whole execution, as a time.monotonic() value
+    deadline: Optional[float]
+    # Cache of the results of the agents that opt in, see BaseAgent.cache_policy()
+    result_cache: Optional[ResultCache]
 
     def __init__(
         self,
@@ -52,6 +68,10 @@ class Context:
         parent_step_id: str = None,
         default_llm: Optional[LLM] = None,
         usage: Optional[list[LLMUsage]] = None,
+        scheduler: Optional[Scheduler] = None,
+        depth: int = 0,
+        deadline: Optional[float] = None,
+        result_cache: Optional[ResultCache] = None,
     ):
         self.trace_id = trace_id
         self.step_id = step_id if step_id else str(uuid.uuid4())
@@ -63,6 +83,10 @@ class Context:
         self.tracing = tracing
         self.feedback = feedback
         self.usage = usage if usage is not None else []
+        self.scheduler = scheduler
+        self.depth = depth
+        self.deadline = deadline
+        self.result_cache = result_cache
 
     def copy_for_execution(self):
         """
@@ -70,7 +94,7 @@ class Context:
         The new context will have a cleaned messages list and thoughts, and will have a new step_id.
         The parent_step_id of the new context will be the current step_id, in order to trace the execution hierarchy.
 
-        The store and the default_llm will remain the same.
+        The store, the default_llm, the scheduler, the deadline and the result cache will remain the same, and the depth is increased by one.
         """
         new_context = Context(
             trace_id=self.trace_id,
@@ -82,16 +106,22 @@ class Context:
             tracing=self.tracing,
             feedback=self.feedback,
             usage=self.usage,
+            scheduler=self.scheduler,
+            depth=self.depth + 1,
+            deadline=self.deadline,
+            result_cache=self.result_cache,
         )
         return new_context
 
-    def copy_for_iteration(self, step_id: str, messages: List[Message]):
+    def copy_for_iteration(self, step_id: str, messages: Sequence[Message]):
         """
         Copy the current context for a new iteration with the specified step_id and messages.
-        The new context will have the same messages and thoughts.
+        The messages are not copied: pass a MessageLogView snapshot to share the
+        loop history between iterations at no cost.
+        The new context will have the same thoughts.
         The parent_step_id of the new context will be the current step_id, in order to trace the iteration hierarchy.
 
-        The store and the default_llm will remain the same.
+        The store, the default_llm, the scheduler, the depth, the deadline and the result cache will remain the same.
         """
         iter_context = Context(
             trace_id=self.trace_id,
@@ -104,6 +134,10 @@ class Context:
             tracing=self.tracing,
             feedback=self.feedback,
             usage=self.usage,
+            scheduler=self.scheduler,
+            depth=self.depth,
+            deadline=self.deadline,
+            result_cache=self.result_cache,
         )
         return iter_context
 
@@ -113,6 +147,48 @@ class Context:
         """
         self.usage.append(usage)
 
+    def slot(self, lane: str):
+        """
+        Returns an async context manager holding a slot of the given scheduler
+        lane (e.g. Scheduler.LLM), with the depth of the context as priority.
+        Without a scheduler, the returned context manager does nothing.
+        """
+        if self.scheduler is None:
+            return nullcontext()
+        return self.scheduler.slot(lane, priority=self.depth)
+
+    def remaining_time(self, reserve: float = 0.0) -> Optional[float]:
+        """
+        Returns the seconds left before the deadline, minus the given reserve
+        (never negative), or None if the context has no deadline.
+        """
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic() - reserve)
+
+    def bound_timeout(self, timeout: Optional[float]) -> Optional[float]:
+        """
+        Returns the given timeout, reduced to the time left before the deadline.
+        """
+        remaining = self.remaining_time()
+        if remaining is None:
+            return timeout
+        if timeout is None:
+            return remaining
+        return min(timeout, remaining)
+
+    def token_count(self, counter: Optional[TokenCounter] = None) -> int:
+        """
+        Returns the estimated number of tokens of the messages of the context.
+        Counts are cached on the messages, and message log views use the running
+        totals of their log, so repeated calls only count the new messages.
+        """
+        if counter is None:
+            from ..llms.tokens import DEFAULT_TOKEN_COUNTER
+
+            counter = DEFAULT_TOKEN_COUNTER
+        return counter.count_messages(self.messages)
+
     def to_dict(self) -> dict:
         """
         Serializes the context to a dictionary.
@@ -129,16 +205,30 @@ class Context:
             "usage": [u.model_dump() for u in self.usage],
             "tracing": serialize_component(self.tracing),
             "feedback": serialize_component(self.feedback),
+            "depth": self.depth,
+            # The deadline is a local clock value: send the time left instead
+            "remaining_time": self.remaining_time(),
         }
 
     @classmethod
-    def from_dict(cls, data: dict, default_llm: Optional[LLM] = None) -> "Context":
+    def from_dict(
+        cls,
+        data: dict,
+        default_llm: Optional[LLM] = None,
+        scheduler: Optional[Scheduler] = None,
+        result_cache: Optional[ResultCache] = None,
+    ) -> "Context":
         """
         Deserializes the context from a dictionary.
+        The scheduler and the result cache are local to a process: they are not serialized, and can be provided here.
         """
         from ..utils.serialization import deserialize_component
         from ..utils.tracing import Tracing
 
+        remaining_time = data.get("remaining_time")
+        deadline = (
+            time.monotonic() + remaining_time if remaining_time is not None else None
+        )
         messages = [Message.model_validate(m) for m in data.get("messages", [])]
         usage = [LLMUsage.model_validate(u) for u in data.get("usage", [])]
 
@@ -158,6 +248,10 @@ class Context:
             parent_step_id=data.get("parent_step_id"),
             usage=usage,
             default_llm=default_llm,
+            scheduler=scheduler,
+            depth=data.get("depth", 0),
+            deadline=deadline,
+            result_cache=result_cache,
         )
 
     def merge(
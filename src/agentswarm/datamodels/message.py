@@ -1,6 +1,18 @@
-from typing import Literal, Any, Optional
+from __future__ import annotations
+
+import weakref
+from typing import Any, Dict, Literal, Tuple
+
 from pydantic import BaseModel, ConfigDict, Field
 
+# (type, content, key, value): a value derived from a message, with the type
+# and the content it was computed from, and the key of the computation
+_Memo = Tuple[str, Any, Any, Any]
+
+# id(message) -> {memo name -> memo}. The memos are kept out of the message
+# (a pydantic private attribute would take part in ==), and dropped with it.
+_memos: Dict[int, Dict[str, _Memo]] = {}
+
 
 class Message(BaseModel):
     type: Literal["user", "assistant", "system", "execution", "completion"] = Field(
@@ -9,3 +21,33 @@ class Message(BaseModel):
     content: Any = Field(alias="c")
 
     model_config = ConfigDict(populate_by_name=True)
+
+    def _memo(self, name: str, key: Any = None) -> Any:
+        """
+        Returns the value memoized under the given name (e.g. a token count or
+        a provider conversion), or None if it was computed with another key, or
+        from another type or content (e.g. after an assignment).
+        The content is compared by identity: replace it rather than mutating
+        it in place. Copies of the message do not share its memos.
+        """
+        memo = _memos.get(id(self), {}).get(name)
+        if (
+            memo is not None
+            and memo[1] is self.content
+            and memo[0] == self.type
+            and memo[2] == key
+        ):
+            return memo[3]
+        return None
+
+    def _memoize(self, name: str, value: Any, key: Any = None) -> Any:
+        """
+        Memoizes a value derived from the current type and content of the
+        message under the given name, and returns it.
+        """
+        memos = _memos.get(id(self))
+        if memos is None:
+            memos = _memos[id(self)] = {}
+            weakref.finalize(self, _memos.pop, id(self), None)
+        memos[name] = (self.type, self.content, key, value)
+        return value
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from collections.abc import Sequence
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Union, overload
+
+from .message import Message
+
+if TYPE_CHECKING:
+    from ..llms.tokens import TokenCounter
+
+
+class MessageLog:
+    """
+    The MessageLog class is an append-only list of messages, whose snapshots are
+    cheap, read-only views sharing the same underlying list.
+
+    Since messages are only ever appended, the first N messages never change, and
+    a snapshot only needs to remember its length: taking a snapshot is O(1) and
+    no copy of the history is ever made, no matter how many snapshots are alive.
+
+    The log also keeps running token totals: the token count of any prefix (and
+    so of any snapshot) is known in O(1), and only new messages are counted.
+    """
+
+    def __init__(self, messages: Iterable[Message] = ()):
+        self._messages: List[Message] = list(messages)
+        # Cumulative token counts of the messages, by counter name
+        self._token_totals: Dict[str, List[int]] = {}
+
+    def append(self, message: Message):
+        """
+        Appends a message to the log.
+        """
+        self._messages.append(message)
+
+    def extend(self, messages: Iterable[Message]):
+        """
+        Appends the given messages to the log.
+        """
+        self._messages.extend(messages)
+
+    def snapshot(self) -> "MessageLogView":
+        """
+        Returns a read-only view of the messages currently in the log.
+        Messages appended later are not visible in the view.
+        """
+        return MessageLogView(self, len(self._messages))
+
+    def token_count(self, counter: TokenCounter, length: int = None) -> int:
+        """
+        Returns the estimated number of tokens of the first length messages
+        (all the messages if length is None).
+        """
+        totals = self._token_totals.setdefault(counter.name, [0])
+        for message in self._messages[len(totals) - 1 :]:
+            totals.append(totals[-1] + counter.count_message(message))
+        return totals[len(self._messages) if length is None else length]
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+
+class MessageLogView(Sequence):
+    """
+    A read-only, fixed-length view of the first messages of a MessageLog.
+    It can be used wherever a list of messages is read (iteration, indexing,
+    slicing, len()), without materializing a copy.
+    """
+
+    __slots__ = ("_log", "_length")
+
+    def __init__(self, log: MessageLog, length: int):
+        self._log = log
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> Message: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Message]: ...
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self._log._messages[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("MessageLogView index out of range")
+        return self._log._messages[index]
+
+    def __iter__(self) -> Iterator[Message]:
+        return islice(self._log._messages, self._length)
+
+    def token_count(self, counter: TokenCounter) -> int:
+        """
+        Returns the estimated number of tokens of the messages in the view.
+        """
+        return self._log.token_count(counter, self._length)
+
+    def __add__(self, other: Iterable[Message]) -> List[Message]:
+        return list(self) + list(other)
+
+    def __repr__(self) -> str:
+        return f"MessageLogView(length={self._length})"
@@ -0,0 +1,284 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from ..utils.serialization import get_class_path, load_class
+
+
+class CachePolicy(BaseModel):
+    """
+    The CachePolicy class defines how the results of an agent are memoized.
+    Agents opt in by returning a CachePolicy from BaseAgent.cache_policy().
+
+    WARNING: a cache hit skips the execution of the agent, with its side effects
+    (messages, store updates, usage). Only agents whose result depends solely on
+    their input should be cached.
+    """
+
+    # Seconds a result stays valid (None: until evicted)
+    ttl: Optional[float] = Field(default=None)
+    # Whether the results are private to each user
+    per_user: bool = Field(default=True)
+    # Whether the results are private to each trace (e.g. when they depend on the store)
+    per_trace: bool = Field(default=False)
+
+    def key(self, agent_id: str, input: Any, user_id: str, trace_id: str) -> str:
+        """
+        Returns the cache key of an execution: a hash of the agent id, the
+        canonical JSON of the input and, depending on the policy, the user and
+        the trace.
+        """
+        if isinstance(input, BaseModel):
+            input = input.model_dump(mode="json")
+        payload = {
+            "agent": agent_id,
+            "input": input,
+            "user": user_id if self.per_user else None,
+            "trace": trace_id if self.per_trace else None,
+        }
+        canonical = json.dumps(
+            payload, sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultCache(ABC):
+    """
+    The ResultCache class defines the storage of the memoized agent results.
+    A ResultCache is shared through the Context, and it is inherited by all the
+    contexts copied from it: share the same instance between traces to reuse the
+    results across them.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Returns (True, result) if a valid result is cached for the given key,
+        (False, None) otherwise.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        Caches the result for the given key, for ttl seconds (None: until evicted).
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self):
+        """
+        Drops all the cached results.
+        """
+        raise NotImplementedError
+
+    async def aget(self, key: str) -> Tuple[bool, Any]:
+        """
+        The asynchronous version of get(), used by the agents. By default it
+        calls get() directly: caches doing blocking I/O override it to keep the
+        event loop free.
+        """
+        return self.get(key)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None):
+        """
+        The asynchronous version of set(), used by the agents.
+        """
+        self.set(key, value, ttl)
+
+
+class MemoryResultCache(ResultCache):
+    """
+    Keeps the results in memory, evicting the least recently used ones.
+    Cached results are shared, not copied: they must not be mutated.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        # key -> (expiration as a time.monotonic() value, result)
+        self._entries: OrderedDict[str, Tuple[Optional[float], Any]] = OrderedDict()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Share of max_entries freed by an eviction, so that the directory is scanned
+# once every max_entries * _EVICTION_HEADROOM new entries rather than on each
+_EVICTION_HEADROOM = 0.1
+
+
+class DiskResultCache(ResultCache):
+    """
+    Keeps the results on disk, one JSON file per key, so that they survive the
+    process. When there are more than max_entries files, the least recently used
+    ones are deleted, down to 90% of max_entries.
+
+    The number of files is counted once, then tracked as entries are written
+    and removed: the directory is only scanned again by the evictions. Files
+    written by other processes sharing the directory are noticed at the next
+    eviction.
+
+    The file I/O and the JSON (de)serialization run in a worker thread when
+    called through aget() and aset(), as the agents do.
+
+    Results must be pydantic models, lists of pydantic models or JSON values.
+    """
+
+    def __init__(
+        self, path: str = "./.agentswarm_cache", max_entries: Optional[int] = 10000
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        # Number of entries on disk, counted on the first write
+        self._count: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _file(self, key: str) -> str:
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        file = self._file(key)
+        try:
+            with open(file, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return False, None
+        expires_at = entry.get("expires_at")
+        if expires_at is not None and expires_at <= time.time():
+            self._discard(file)
+            return False, None
+        try:
+            value = _decode(entry["value"])
+        except Exception:
+            # Stale entry of a class that no longer loads or validates
+            self._discard(file)
+            return False, None
+        # The modification time tracks the last use, for the eviction
+        try:
+            os.utime(file)
+        except OSError:
+            pass
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        entry = {
+            "expires_at": time.time() + ttl if ttl is not None else None,
+            "value": _encode(value),
+        }
+        os.makedirs(self.path, exist_ok=True)
+        file = self._file(key)
+        existed = os.path.exists(file)
+        # Write then rename, so that readers never see a partial file
+        tmp = f"{file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, file)
+        with self._lock:
+            if self._count is None:
+                self._count = len(self._entries())
+            elif not existed:
+                self._count += 1
+            if self.max_entries is not None and self._count > self.max_entries:
+                self._evict()
+
+    async def aget(self, key: str) -> Tuple[bool, Any]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None):
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    def clear(self):
+        with self._lock:
+            for name in self._entries():
+                self._remove(os.path.join(self.path, name))
+            self._count = 0
+
+    def _entries(self) -> list:
+        try:
+            return [name for name in os.listdir(self.path) if name.endswith(".json")]
+        except OSError:
+            return []
+
+    def _evict(self):
+        # Called with the lock held, when the count exceeds max_entries
+        names = self._entries()
+        self._count = len(names)
+        if self._count <= self.max_entries:
+            return
+        target = int(self.max_entries * (1 - _EVICTION_HEADROOM))
+        files = [os.path.join(self.path, name) for name in names]
+        files.sort(key=lambda file: _mtime(file))
+        for file in files[: len(files) - target]:
+            if self._remove(file):
+                self._count -= 1
+
+    def _discard(self, file: str):
+        if self._remove(file):
+            with self._lock:
+                if self._count is not None:
+                    self._count = max(0, self._count - 1)
+
+    @staticmethod
+    def _remove(file: str) -> bool:
+        try:
+            os.remove(file)
+            return True
+        except OSError:
+            return False
+
+
+def _mtime(file: str) -> float:
+    try:
+        return os.path.getmtime(file)
+    except OSError:
+        return 0.0
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return {
+            "__class__": get_class_path(value.__class__),
+            "value": value.model_dump(mode="json"),
+        }
+    if isinstance(value, (list, tuple)):
+        return {"__list__": [_encode(item) for item in value]}
+    # Raises a TypeError for values that are not JSON serializable
+    json.dumps(value)
+    return {"__json__": value}
+
+
+def _decode(data: Any) -> Any:
+    if "__class__" in data:
+        return load_class(data["__class__"]).model_validate(data["value"])
+    if "__list__" in data:
+        return [_decode(item) for item in data["__list__"]]
+    return data["__json__"]
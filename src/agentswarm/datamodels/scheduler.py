@@ -0,0 +1,115 @@
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+
+class _PriorityLimiter:
+    """
+    A semaphore whose waiters are served by priority (lowest value first), and in
+    FIFO order within the same priority.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    async def acquire(self, priority: int):
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_event_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been granted right before the cancellation
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < self.limit:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # Cancelled while waiting
+                continue
+            self.in_flight += 1
+            future.set_result(None)
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+
+class Scheduler:
+    """
+    The Scheduler caps the number of in-flight LLM requests and tool executions
+    across a whole execution tree (or the whole process), whatever the nesting
+    of the agents.
+
+    Each kind of work has its own lane with its own limit. Waiters are served by
+    priority, lowest first: the agents use their depth in the execution tree as
+    priority, so that the parents finishing their reduce step are not starved by
+    the fan-out of the leaves.
+
+    A Scheduler is shared through the Context, and it is inherited by all the
+    contexts copied from it.
+    """
+
+    # Lane of the LLM requests
+    LLM = "llm"
+    # Lane of the tool (agent) executions
+    TOOL = "tool"
+
+    def __init__(
+        self,
+        max_llm_requests: Optional[int] = 8,
+        max_tool_executions: Optional[int] = None,
+    ):
+        """
+        Args:
+            max_llm_requests: Maximum number of in-flight LLM requests.
+                None disables the limit.
+            max_tool_executions: Maximum number of in-flight tool executions.
+                None disables the limit.
+        """
+        self._lanes: Dict[str, _PriorityLimiter] = {}
+        if max_llm_requests is not None:
+            self._lanes[self.LLM] = _PriorityLimiter(max_llm_requests)
+        if max_tool_executions is not None:
+            self._lanes[self.TOOL] = _PriorityLimiter(max_tool_executions)
+
+    @asynccontextmanager
+    async def slot(self, lane: str, priority: int = 0) -> AsyncIterator[None]:
+        """
+        Holds a slot of the given lane for the duration of the context manager.
+        Lanes without a limit are not gated.
+        """
+        limiter = self._lanes.get(lane)
+        if limiter is None:
+            yield
+            return
+        await limiter.acquire(priority)
+        try:
+            yield
+        finally:
+            limiter.release()
+
+    def in_flight(self, lane: str) -> int:
+        """
+        Returns the number of slots of the given lane currently held.
+        """
+        limiter = self._lanes.get(lane)
+        return limiter.in_flight if limiter is not None else 0
+
+    def waiting(self, lane: str) -> int:
+        """
+        Returns the number of waiters of the given lane.
+        """
+        limiter = self._lanes.get(lane)
+        return limiter.waiting if limiter is not None else 0
@@ -1,6 +1,21 @@
-from .llm import LLM, LLMFunction, LLMFunctionExecution, LLMOutput
+from .cached_llm import CachedLLM
+from .failover_llm import CircuitBreaker, FailoverLLM
 from .gemini import GeminiLLM
-from .reliable_llm import ReliableLLM
+from .llm import (
+    LLM,
+    FunctionCallDelta,
+    LLMDelta,
+    LLMFunction,
+    LLMFunctionExecution,
+    LLMOutput,
+    TextDelta,
+    UsageDelta,
+)
+from .provider import LLMProvider, default_llm_provider
+from .rate_limited_llm import RateLimitedLLM, RateLimiter
+from .reliable_llm import ReliableLLM, StreamLatencies
+from .retry_policy import RetryPolicy
+from .tokens import CharTokenCounter, TokenCounter
 from .usage import LLMUsage
 
 __all__ = [
@@ -9,6 +24,21 @@ __all__ = [
     "LLMUsage",
     "LLMFunctionExecution",
     "LLMOutput",
+    "LLMDelta",
+    "TextDelta",
+    "FunctionCallDelta",
+    "UsageDelta",
     "GeminiLLM",
     "ReliableLLM",
+    "StreamLatencies",
+    "CachedLLM",
+    "RateLimitedLLM",
+    "RateLimiter",
+    "FailoverLLM",
+    "CircuitBreaker",
+    "RetryPolicy",
+    "LLMProvider",
+    "default_llm_provider",
+    "TokenCounter",
+    "CharTokenCounter",
 ]
@@ -0,0 +1,340 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..datamodels.feedback import Feedback, FeedbackSystem
+from ..datamodels.message import Message
+from ..utils.serialization import get_class_path
+from .llm import (
+    FUNCTION_CALL_FEEDBACK_SOURCE,
+    LLM,
+    TEXT_FEEDBACK_SOURCE,
+    LLMFunction,
+    LLMOutput,
+)
+from .tokens import TokenCounter
+from .usage import LLMUsage
+
+
+def _model_name(llm: LLM) -> str:
+    # Wrappers (e.g. ReliableLLM) expose the wrapped LLM as .llm
+    while not hasattr(llm, "model") and hasattr(llm, "llm"):
+        llm = llm.llm
+    return getattr(llm, "model", None) or get_class_path(llm.__class__)
+
+
+class _SQLiteTier:
+    """
+    The persistent tier of the CachedLLM: one row per response, in a SQLite
+    database. The connection is shared by the worker threads behind a lock.
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int]):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL, last_used REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._connection.execute(
+                "UPDATE responses SET last_used = ? WHERE key = ?", (now, key)
+            )
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[float]):
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            if self.max_entries is not None:
+                # Evict the least recently used responses
+                self._connection.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                    "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+
+class _FanOut(FeedbackSystem):
+    """
+    The feedback system of a coalesced request: forwards the events pushed by
+    the wrapped LLM to the feedback systems of the callers waiting for it.
+    A caller attached late first receives the events already pushed.
+    """
+
+    def __init__(self):
+        self._events: List[Feedback] = []
+        self._targets: List[FeedbackSystem] = []
+
+    def attach(self, feedback: FeedbackSystem):
+        for event in self._events:
+            feedback.push(event)
+        self._targets.append(feedback)
+
+    def detach(self, feedback: FeedbackSystem):
+        self._targets = [target for target in self._targets if target is not feedback]
+
+    def push(self, feedback: Feedback):
+        self._events.append(feedback)
+        for target in self._targets:
+            target.push(feedback)
+
+    def subscribe(self, callback: Callable[[Feedback], None]):
+        raise NotImplementedError("_FanOut is an internal, non-serializable proxy.")
+
+    def to_dict(self) -> dict:
+        raise NotImplementedError("_FanOut is an internal, non-serializable proxy.")
+
+    @classmethod
+    def recreate(cls, config: dict) -> "_FanOut":
+        raise NotImplementedError("_FanOut is an internal, non-serializable proxy.")
+
+
+class CachedLLM(LLM):
+    """
+    A wrapper around an LLM that caches its responses.
+
+    Responses are keyed on a hash of the canonical JSON of the request: the
+    model, the messages, the functions and the temperature. They are kept in an
+    in-memory LRU tier and, if a path is given, in a persistent SQLite tier that
+    survives the process (e.g. to replay or retry traces).
+
+    Identical requests in flight at the same time are coalesced: the wrapped
+    LLM is called once and all the callers share its response. What it streams
+    is forwarded to the feedback systems of all the callers still waiting for
+    it (a caller joining late first gets what was already streamed), and a
+    cancelled caller stops receiving it.
+
+    On a hit, the response is pushed to the feedback system at once (the text
+    as a single chunk, then the function calls), and its usage is reported with
+    zero tokens, since no tokens were spent. Failed requests are never cached.
+    """
+
+    def __init__(
+        self,
+        llm: LLM,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        path: Optional[str] = None,
+        max_persistent_entries: Optional[int] = 100000,
+        model: Optional[str] = None,
+    ):
+        """
+        Args:
+            llm: The LLM to wrap.
+            max_entries: Maximum number of responses of the in-memory tier.
+            ttl: Seconds a response stays valid (None: until evicted).
+            path: Path of the SQLite database of the persistent tier
+                (None: memory only).
+            max_persistent_entries: Maximum number of responses of the
+                persistent tier (None: unbounded).
+            model: Name of the model in the cache key. Defaults to the model of
+                the wrapped LLM.
+        """
+        self.llm = llm
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.model = model or _model_name(llm)
+        self._memory: OrderedDict[str, Tuple[Optional[float], LLMOutput]] = (
+            OrderedDict()
+        )
+        self._persistent = (
+            _SQLiteTier(path, max_persistent_entries) if path is not None else None
+        )
+        self._in_flight: Dict[str, Tuple[asyncio.Future, Optional[_FanOut]]] = {}
+        self._waiters: Dict[str, int] = {}
+
+    @property
+    def max_input_tokens(self) -> Optional[int]:
+        return self.llm.max_input_tokens
+
+    def token_counter(self) -> TokenCounter:
+        return self.llm.token_counter()
+
+    async def warm_up(self):
+        await self.llm.warm_up()
+
+    def cache_key(
+        self,
+        messages: List[Message],
+        functions: Optional[List[LLMFunction]],
+        temperature: float,
+    ) -> str:
+        """
+        Returns the cache key of a request.
+        """
+        payload = {
+            "model": self.model,
+            "temperature": temperature,
+            "messages": [[message.type, message.content] for message in messages],
+            "functions": (
+                [function.model_dump() for function in functions]
+                if functions is not None
+                else None
+            ),
+        }
+        canonical = json.dumps(
+            payload, sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    async def generate(
+        self,
+        messages: List[Message],
+        functions: List[LLMFunction] = None,
+        feedback: Optional[FeedbackSystem] = None,
+        temperature: float = 0.0,
+    ) -> LLMOutput:
+        key = self.cache_key(messages, functions, temperature)
+
+        output = await self._get(key)
+        if output is not None:
+            return self._replay(output, feedback)
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            # An identical request is in flight: share its response
+            future, fan_out = in_flight
+            output = await self._wait(key, future, fan_out, feedback)
+            # A streamed response was already forwarded through the fan-out
+            return self._replay(output, feedback if fan_out is None else None)
+
+        # The call is streamed only if its first caller asked for it (e.g. the
+        # wrapped LLM may skip its context caching when streaming)
+        fan_out = _FanOut() if feedback is not None else None
+        future = asyncio.ensure_future(
+            self._call(key, messages, functions, fan_out, temperature)
+        )
+        self._in_flight[key] = (future, fan_out)
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return await self._wait(key, future, fan_out, feedback)
+
+    def _forget(self, key: str, future: asyncio.Future):
+        # A newer call for the same key may have replaced this one
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None and in_flight[0] is future:
+            del self._in_flight[key]
+
+    async def _wait(
+        self,
+        key: str,
+        future: asyncio.Future,
+        fan_out: Optional[_FanOut],
+        feedback: Optional[FeedbackSystem],
+    ) -> LLMOutput:
+        if fan_out is not None and feedback is not None:
+            fan_out.attach(feedback)
+        # The request is cancelled only when all its callers are cancelled
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if self._waiters[key] == 1 and not future.done():
+                # Identical requests arriving from now on start a new call,
+                # rather than sharing the one being cancelled
+                self._forget(key, future)
+                future.cancel()
+            raise
+        finally:
+            if fan_out is not None and feedback is not None:
+                fan_out.detach(feedback)
+            self._waiters[key] -= 1
+            if self._waiters[key] == 0:
+                del self._waiters[key]
+
+    async def _call(
+        self,
+        key: str,
+        messages: List[Message],
+        functions: Optional[List[LLMFunction]],
+        feedback: Optional[FeedbackSystem],
+        temperature: float,
+    ) -> LLMOutput:
+        output = await self.llm.generate(messages, functions, feedback, temperature)
+        await self._set(key, output)
+        return output
+
+    async def _get(self, key: str) -> Optional[LLMOutput]:
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, output = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._memory.move_to_end(key)
+                return output
+            del self._memory[key]
+
+        if self._persistent is None:
+            return None
+        value = await asyncio.to_thread(self._persistent.get, key)
+        if value is None:
+            return None
+        output = LLMOutput.model_validate_json(value)
+        self._remember(key, output)
+        return output
+
+    async def _set(self, key: str, output: LLMOutput):
+        self._remember(key, output)
+        if self._persistent is not None:
+            await asyncio.to_thread(
+                self._persistent.set, key, output.model_dump_json(), self.ttl
+            )
+
+    def _remember(self, key: str, output: LLMOutput):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        self._memory[key] = (expires_at, output)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _replay(
+        self, output: LLMOutput, feedback: Optional[FeedbackSystem]
+    ) -> LLMOutput:
+        if feedback is not None:
+            if output.text:
+                feedback.push(
+                    Feedback(source=TEXT_FEEDBACK_SOURCE, payload=output.text)
+                )
+            for function_call in output.function_calls:
+                feedback.push(
+                    Feedback(
+                        source=FUNCTION_CALL_FEEDBACK_SOURCE, payload=function_call
+                    )
+                )
+        # No tokens were spent for this response
+        return output.model_copy(update={"usage": LLMUsage(model=output.usage.model)})
+
+    def clear(self):
+        """
+        Drops all the cached responses, from both tiers.
+        """
+        self._memory.clear()
+        if self._persistent is not None:
+            self._persistent.clear()
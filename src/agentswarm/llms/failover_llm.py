@@ -0,0 +1,292 @@
+import logging
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, List, Optional
+
+from ..datamodels.feedback import Feedback, FeedbackSystem
+from ..datamodels.message import Message
+from ..utils.exceptions import LLMUnavailableError
+from .llm import LLM, LLMDelta, LLMFunction, LLMOutput
+from .retry_policy import RetryPolicy
+from .tokens import TokenCounter
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Tracks the health of a backend from the outcome of its recent requests.
+
+      - **closed**: requests are allowed. When the failure rate of the last
+        ``window`` requests reaches ``failure_threshold`` (with at least
+        ``min_requests`` of them), the breaker opens.
+      - **open**: requests are rejected immediately, for ``open_duration``
+        seconds. Then the breaker becomes half-open.
+      - **half-open**: a single probe request is allowed. Its success closes the
+        breaker, its failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: float = 0.5,
+        window: int = 20,
+        min_requests: int = 5,
+        open_duration: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.min_requests = min_requests
+        self.open_duration = open_duration
+        self._clock = clock
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if (
+            self._state == self.OPEN
+            and self._clock() >= self._opened_at + self.open_duration
+        ):
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """
+        Returns whether a request can be sent to the backend. In the half-open
+        state, the first caller gets the probe.
+        """
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        if self._state == self.HALF_OPEN:
+            self._state = self.CLOSED
+            self._outcomes.clear()
+            self._probing = False
+            return
+        self._outcomes.append(True)
+
+    def record_failure(self):
+        if self._state == self.HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(False)
+        failures = self._outcomes.count(False)
+        if (
+            len(self._outcomes) >= self.min_requests
+            and failures / len(self._outcomes) >= self.failure_threshold
+        ):
+            self._open()
+
+    def release(self):
+        """
+        Releases the probe of a request that ended without an outcome
+        (e.g. cancelled by the caller).
+        """
+        self._probing = False
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+        self._probing = False
+
+
+class _PushTracker(FeedbackSystem):
+    """
+    A FeedbackSystem proxy forwarding every event to the inner feedback system,
+    and recording whether the backend has pushed anything.
+    """
+
+    def __init__(self, inner: FeedbackSystem):
+        self._inner = inner
+        self.pushed = False
+
+    def push(self, feedback: Feedback):
+        self.pushed = True
+        self._inner.push(feedback)
+
+    def subscribe(self, callback: Callable[[Feedback], None]):
+        self._inner.subscribe(callback)
+
+    def to_dict(self) -> dict:
+        raise NotImplementedError(
+            "_PushTracker is an internal, non-serializable proxy."
+        )
+
+    @classmethod
+    def recreate(cls, config: dict) -> "_PushTracker":
+        raise NotImplementedError(
+            "_PushTracker is an internal, non-serializable proxy."
+        )
+
+
+class FailoverLLM(LLM):
+    """
+    An LLM that sends each request to the first healthy backend of an ordered
+    list (e.g. other models or regions), and fails over to the next one when a
+    backend fails.
+
+    Each backend has a CircuitBreaker: a backend with a high recent failure rate
+    (errors and timeouts) is skipped immediately, instead of paying the
+    timeouts and the retries of every request, and it is probed again after a
+    while.
+
+    Errors are sorted by a RetryPolicy. Only the transient and rate-limited
+    ones are backend failures: they count towards the breaker and fail over.
+    A permanent error (e.g. an invalid request) would fail on every backend
+    too: it is raised at once, without affecting the breaker.
+
+    Wrap the backends with ReliableLLM (with few retries) for the inactivity
+    timeouts and the loop detection: their failures are reported to the breaker.
+
+    A request is never failed over once the failed backend has produced output
+    (text or function calls pushed to the feedback, or streamed deltas): it
+    cannot be taken back, and the next backend would duplicate it.
+    """
+
+    def __init__(
+        self,
+        backends: List[LLM],
+        failure_threshold: float = 0.5,
+        window: int = 20,
+        min_requests: int = 5,
+        open_duration: float = 30.0,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        """
+        Args:
+            backends: The LLMs to use, by order of preference.
+            failure_threshold: Failure rate opening the circuit of a backend.
+            window: Number of recent requests used to compute the failure rate.
+            min_requests: Minimum number of recent requests to open the circuit.
+            open_duration: Seconds a backend is skipped once its circuit is open.
+            retry_policy: Classifies the errors of the backends. Defaults to a
+                RetryPolicy().
+        """
+        if not backends:
+            raise ValueError("At least one backend must be provided")
+        self.backends = backends
+        self.breakers = [
+            CircuitBreaker(
+                failure_threshold=failure_threshold,
+                window=window,
+                min_requests=min_requests,
+                open_duration=open_duration,
+            )
+            for _ in backends
+        ]
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+
+    @property
+    def max_input_tokens(self) -> Optional[int]:
+        # A request must fit every backend it can fail over to
+        limits = [
+            backend.max_input_tokens
+            for backend in self.backends
+            if backend.max_input_tokens is not None
+        ]
+        return min(limits) if limits else None
+
+    def token_counter(self) -> TokenCounter:
+        return self.backends[0].token_counter()
+
+    async def warm_up(self):
+        for backend in self.backends:
+            await backend.warm_up()
+
+    async def generate(
+        self,
+        messages: List[Message],
+        functions: List[LLMFunction] = None,
+        feedback: Optional[FeedbackSystem] = None,
+        temperature: float = 0.0,
+    ) -> LLMOutput:
+        last_exception = None
+        for index, (backend, breaker) in enumerate(zip(self.backends, self.breakers)):
+            if not breaker.allow_request():
+                continue
+            tracker = _PushTracker(feedback) if feedback is not None else None
+            try:
+                output = await backend.generate(
+                    messages, functions, tracker, temperature
+                )
+            except Exception as e:
+                if not self._record_failure(breaker, e):
+                    raise
+                # The text and function calls already pushed cannot be taken back
+                if tracker is not None and tracker.pushed:
+                    raise
+                last_exception = e
+                logger.warning(f"LLM backend {index} failed, failing over: {e}")
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            breaker.record_success()
+            return output
+
+        if last_exception is not None:
+            raise last_exception
+        raise LLMUnavailableError(
+            "All the LLM backends are unavailable (circuits open)"
+        )
+
+    async def stream(
+        self,
+        messages: List[Message],
+        functions: List[LLMFunction] = None,
+        temperature: float = 0.0,
+    ) -> AsyncIterator[LLMDelta]:
+        last_exception = None
+        for index, (backend, breaker) in enumerate(zip(self.backends, self.breakers)):
+            if not breaker.allow_request():
+                continue
+            streamed = False
+            try:
+                async for delta in backend.stream(messages, functions, temperature):
+                    streamed = True
+                    yield delta
+            except Exception as e:
+                if not self._record_failure(breaker, e):
+                    raise
+                # The deltas already yielded cannot be taken back
+                if streamed:
+                    raise
+                last_exception = e
+                logger.warning(f"LLM backend {index} failed, failing over: {e}")
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+            breaker.record_success()
+            return
+
+        if last_exception is not None:
+            raise last_exception
+        raise LLMUnavailableError(
+            "All the LLM backends are unavailable (circuits open)"
+        )
+
+    def _record_failure(self, breaker: CircuitBreaker, error: Exception) -> bool:
+        """
+        Records the error of a backend on its breaker, and returns whether it
+        is a backend failure (worth failing over) rather than a permanent error.
+        """
+        if self.retry_policy.classify(error) == RetryPolicy.PERMANENT:
+            breaker.release()
+            return False
+        breaker.record_failure()
+        return True
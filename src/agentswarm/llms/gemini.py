@@ -1,14 +1,380 @@
-from typing import List, Any, Optional
+import asyncio
+import hashlib
+import json
 import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, nullcontext
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from google.genai import Client, errors, types
+
+from ..datamodels.feedback import FeedbackSystem
 from ..datamodels.message import Message
-from .llm import LLM, LLMFunction, LLMFunctionExecution, LLMOutput, LLMUsage
-from ..datamodels.feedback import Feedback, FeedbackSystem
-from google.genai import Client, types
+from ..utils.exceptions import LLMBatchError
+from .llm import (
+    LLM,
+    FunctionCallDelta,
+    LLMDelta,
+    LLMFunction,
+    LLMFunctionExecution,
+    LLMOutput,
+    LLMUsage,
+    TextDelta,
+    UsageDelta,
+)
+from .tokens import TokenCounter
 
 logging.getLogger("google_genai._api_client").setLevel(logging.WARNING)
 logging.getLogger("google_genai.models").setLevel(logging.WARNING)
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
+logger = logging.getLogger(__name__)
+
+# The safety settings never change: they are built once for all the requests
+_SAFETY_SETTINGS = [
+    types.SafetySetting(category="HARM_CATEGORY_HATE_SPEECH", threshold="OFF"),
+    types.SafetySetting(category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="OFF"),
+    types.SafetySetting(category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="OFF"),
+    types.SafetySetting(category="HARM_CATEGORY_HARASSMENT", threshold="OFF"),
+]
+
+# States of a finished batch job
+_BATCH_TERMINAL_STATES = {
+    types.JobState.JOB_STATE_SUCCEEDED,
+    types.JobState.JOB_STATE_FAILED,
+    types.JobState.JOB_STATE_CANCELLED,
+    types.JobState.JOB_STATE_EXPIRED,
+    types.JobState.JOB_STATE_PARTIALLY_SUCCEEDED,
+}
+
+# Format name of the messages converted to types.Content
+_CONTENT_FORMAT = "gemini"
+
+
+class _RequestBuilder:
+    """
+    Builds the pieces of the Gemini requests, reusing the immutable ones across
+    calls:
+
+      - each Message is converted to a types.Content once, and the conversion
+        is memoized on the message itself, so that a growing ReAct history
+        only converts its new messages;
+      - the types.Tool declarations are cached per function set fingerprint,
+        with a fast path for the very same list (the ReActAgent sends the same
+        list object at every iteration);
+      - the GenerateContentConfig is cached per (temperature, function set,
+        system instruction).
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._last_functions: Optional[List[LLMFunction]] = None
+        self._last_tools: Tuple[Optional[str], Optional[List[types.Tool]]] = (
+            None,
+            None,
+        )
+        self._tools: OrderedDict[str, List[types.Tool]] = OrderedDict()
+        self._configs: OrderedDict[Tuple, types.GenerateContentConfig] = OrderedDict()
+
+    def contents(
+        self, messages: List[Message]
+    ) -> Tuple[List[types.Content], Optional[List[str]]]:
+        """
+        Returns the contents and the system instruction of the given messages.
+        """
+        contents = []
+        sys_instruct = []
+        for message in messages:
+            if message.type != "system":
+                contents.append(self._content(message))
+            else:
+                sys_instruct.append(message.content)
+        if len(sys_instruct) == 0:
+            sys_instruct = None
+        return contents, sys_instruct
+
+    def _content(self, message: Message) -> types.Content:
+        content = message._memo("_converted", _CONTENT_FORMAT)
+        if content is None:
+            role = "model" if message.type == "assistant" else message.type
+            content = message._memoize(
+                "_converted",
+                types.Content(role=role, parts=[types.Part(text=message.content)]),
+                _CONTENT_FORMAT,
+            )
+        return content
+
+    def tools(
+        self, functions: Optional[List[LLMFunction]]
+    ) -> Tuple[Optional[str], Optional[List[types.Tool]]]:
+        """
+        Returns the fingerprint of the given functions and their declarations.
+        """
+        if functions is None:
+            return None, None
+        if functions is self._last_functions:
+            return self._last_tools
+
+        function_declarations = [
+            {
+                "name": fn.name,
+                "description": fn.description,
+                "parameters": fn.parameters,
+            }
+            for fn in functions
+        ]
+        fingerprint = hashlib.sha256(
+            json.dumps(function_declarations, sort_keys=True, default=str).encode(
+                "utf-8"
+            )
+        ).hexdigest()
+        tools = self._tools.get(fingerprint)
+        if tools is None:
+            tools = [types.Tool(function_declarations=function_declarations)]
+            self._remember(self._tools, fingerprint, tools)
+        else:
+            self._tools.move_to_end(fingerprint)
+
+        self._last_functions = functions
+        self._last_tools = (fingerprint, tools)
+        return self._last_tools
+
+    def config(
+        self,
+        temperature: float,
+        functions: Optional[List[LLMFunction]],
+        system_instruction: Optional[List[str]],
+    ) -> types.GenerateContentConfig:
+        """
+        Returns the GenerateContentConfig of a request.
+        """
+        fingerprint, tools = self.tools(functions)
+        key = (
+            temperature,
+            fingerprint,
+            tuple(system_instruction) if system_instruction is not None else None,
+        )
+        config = self._configs.get(key)
+        if config is not None:
+            self._configs.move_to_end(key)
+            return config
+        config = types.GenerateContentConfig(
+            temperature=temperature,
+            tools=tools,
+            system_instruction=system_instruction,
+            safety_settings=_SAFETY_SETTINGS,
+        )
+        self._remember(self._configs, key, config)
+        return config
+
+    def cached_config(
+        self, temperature: float, cached_content: str
+    ) -> types.GenerateContentConfig:
+        """
+        Returns the GenerateContentConfig of a request whose system instruction
+        and tools are read from the given cached content.
+        """
+        key = (temperature, "cached_content", cached_content)
+        config = self._configs.get(key)
+        if config is not None:
+            self._configs.move_to_end(key)
+            return config
+        config = types.GenerateContentConfig(
+            temperature=temperature,
+            cached_content=cached_content,
+            safety_settings=_SAFETY_SETTINGS,
+        )
+        self._remember(self._configs, key, config)
+        return config
+
+    def _remember(self, cache: OrderedDict, key: Any, value: Any):
+        cache[key] = value
+        if len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+
+class _CachedPrefix:
+    def __init__(self, name: str, expires_at: float):
+        self.name = name
+        # Local expiration, as a time.monotonic() value
+        self.expires_at = expires_at
+
+
+class _PrefixCache:
+    """
+    Keeps the stable prefix of the requests (the system instruction and the
+    tool declarations) in Gemini cached contents, so that it is not billed and
+    processed in full at every request.
+
+    A cached content is created lazily, the first time a prefix is seen, and is
+    shared by all the requests with the same prefix (e.g. all the iterations of
+    a ReActAgent and its sibling agents). Its TTL is extended when it gets close
+    to expiration. Prefixes estimated below min_tokens are not cached, since the
+    API rejects them. When the API fails, the requests fall back to sending the
+    prefix, and the creation is retried after retry_after seconds.
+
+    At most max_entries prefixes are tracked, the least recently used ones
+    being forgotten (their cached contents are left to expire on the server).
+    """
+
+    def __init__(
+        self,
+        client: Client,
+        model: str,
+        requests: _RequestBuilder,
+        token_counter: TokenCounter,
+        ttl: float,
+        refresh_margin: float,
+        min_tokens: int,
+        retry_after: float = 60.0,
+        max_entries: int = 128,
+    ):
+        self.client = client
+        self.model = model
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.min_tokens = min_tokens
+        self.retry_after = retry_after
+        self.max_entries = max_entries
+        self._requests = requests
+        self._token_counter = token_counter
+        self._entries: OrderedDict[Tuple, _CachedPrefix] = OrderedDict()
+        # The creation locks, with their number of users, dropped once unused
+        self._locks: Dict[Tuple, Tuple[asyncio.Lock, int]] = {}
+        self._failed_until: OrderedDict[Tuple, float] = OrderedDict()
+        self._too_small: OrderedDict[Tuple, None] = OrderedDict()
+
+    async def get(
+        self,
+        system_instruction: Optional[List[str]],
+        functions: Optional[List[LLMFunction]],
+    ) -> Optional[str]:
+        """
+        Returns the name of the cached content of the given prefix, or None if
+        the prefix is not cached.
+        """
+        if system_instruction is None and not functions:
+            return None
+        fingerprint, tools = self._requests.tools(functions)
+        key = (tuple(system_instruction or ()), fingerprint)
+
+        entry = self._entries.get(key)
+        if (
+            entry is not None
+            and entry.expires_at - time.monotonic() > self.refresh_margin
+        ):
+            self._entries.move_to_end(key)
+            return entry.name
+        if key in self._too_small:
+            self._too_small.move_to_end(key)
+            return None
+        failed_until = self._failed_until.get(key)
+        if failed_until is not None:
+            if failed_until > time.monotonic():
+                return None
+            del self._failed_until[key]
+        if (
+            entry is None
+            and self._estimate(system_instruction, functions) < self.min_tokens
+        ):
+            self._remember(self._too_small, key, None)
+            return None
+
+        # Concurrent requests with the same prefix wait for a single creation
+        async with self._lock(key):
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is not None and entry.expires_at - now > self.refresh_margin:
+                return entry.name
+            try:
+                if entry is not None and entry.expires_at > now:
+                    await self.client.aio.caches.update(
+                        name=entry.name,
+                        config=types.UpdateCachedContentConfig(ttl=self._ttl()),
+                    )
+                    entry = _CachedPrefix(entry.name, now + self.ttl)
+                else:
+                    cached = await self.client.aio.caches.create(
+                        model=self.model,
+                        config=types.CreateCachedContentConfig(
+                            system_instruction=system_instruction,
+                            tools=tools,
+                            ttl=self._ttl(),
+                        ),
+                    )
+                    entry = _CachedPrefix(cached.name, now + self.ttl)
+            except Exception as e:
+                logger.warning(f"Context caching failed, sending the full prompt: {e}")
+                self._entries.pop(key, None)
+                self._remember(self._failed_until, key, now + self.retry_after)
+                return None
+            self._remember(self._entries, key, entry)
+            return entry.name
+
+    def invalidate(self, name: str):
+        """
+        Forgets the given cached content (e.g. when the server no longer has it).
+        """
+        for key in [key for key, entry in self._entries.items() if entry.name == name]:
+            del self._entries[key]
+
+    async def clear(self):
+        """
+        Deletes all the cached contents created so far.
+        """
+        entries = list(self._entries.values())
+        self._entries.clear()
+        for entry in entries:
+            try:
+                await self.client.aio.caches.delete(name=entry.name)
+            except Exception as e:
+                logger.warning(f"Failed to delete the cached content {entry.name}: {e}")
+
+    def _ttl(self) -> str:
+        return f"{int(self.ttl)}s"
+
+    @asynccontextmanager
+    async def _lock(self, key: Tuple):
+        lock, users = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+    def _remember(self, cache: OrderedDict, key: Any, value: Any):
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    def _estimate(
+        self,
+        system_instruction: Optional[List[str]],
+        functions: Optional[List[LLMFunction]],
+    ) -> int:
+        text = "\n".join(str(instruction) for instruction in system_instruction or [])
+        return self._token_counter.count_text(
+            text
+        ) + self._token_counter.count_functions(functions)
+
 
 class GeminiLLM(LLM):
 
@@ -17,11 +383,51 @@ class GeminiLLM(LLM):
         api_key: str = None,
         model: str = "gemini-3.1-flash-lite",
         client: Client = None,
+        max_input_tokens: Optional[int] = None,
+        context_cache: bool = False,
+        context_cache_ttl: float = 3600.0,
+        context_cache_refresh: float = 300.0,
+        context_cache_min_tokens: int = 1024,
+        batch_api: bool = False,
+        batch_poll_interval: float = 30.0,
     ):
+        """
+        Args:
+            api_key: The Gemini API key (or provide a client).
+            model: The model to use.
+            client: A google.genai Client (or provide an api_key).
+            max_input_tokens: Maximum number of prompt tokens accepted by the model.
+            context_cache: Keep the system instruction and the tool declarations
+                of the requests in Gemini cached contents.
+            context_cache_ttl: TTL of the cached contents, in seconds.
+            context_cache_refresh: The TTL of a cached content is extended when
+                it expires in less than this many seconds.
+            context_cache_min_tokens: Prefixes estimated below this many tokens
+                are not cached.
+            batch_api: Submit generate_batch() requests as Gemini batch jobs.
+            batch_poll_interval: Seconds between two checks of a batch job.
+        """
         if api_key is None and client is None:
             raise ValueError("api_key or client must be provided")
         self.client = client if client is not None else Client(api_key=api_key)
         self.model = model
+        self.max_input_tokens = max_input_tokens
+        self.batch_api = batch_api
+        self.batch_poll_interval = batch_poll_interval
+        self._requests = _RequestBuilder()
+        self._prefix_cache = (
+            _PrefixCache(
+                self.client,
+                model,
+                self._requests,
+                self.token_counter(),
+                ttl=context_cache_ttl,
+                refresh_margin=context_cache_refresh,
+                min_tokens=context_cache_min_tokens,
+            )
+            if context_cache
+            else None
+        )
 
     async def generate(
         self,
@@ -30,144 +436,230 @@ class GeminiLLM(LLM):
         feedback: Optional[FeedbackSystem] = None,
         temperature: float = 0.0,
     ) -> LLMOutput:
-        contents = []
-        sys_instruct = []
-        for message in messages:
-            if message.type != "system":
-                role = "model" if message.type == "assistant" else message.type
-                contents.append(
-                    types.Content(role=role, parts=[types.Part(text=message.content)])
-                )
-            else:
-                sys_instruct.append(message.content)
-        if len(sys_instruct) == 0:
-            sys_instruct = None
+        if feedback is not None:
+            # The output is streamed to the feedback system
+            return await super().generate(messages, functions, feedback, temperature)
 
-        function_declarations = []
-        if functions is not None:
-            for fn in functions:
-                function_declarations.append(
-                    {
-                        "name": fn.name,
-                        "description": fn.description,
-                        "parameters": fn.parameters,
-                    }
-                )
-            tools = [types.Tool(function_declarations=function_declarations)]
-        else:
-            tools = None
+        contents, system_instruction = self._requests.contents(messages)
+        cached_config = await self._cached_config(
+            system_instruction, functions, temperature
+        )
+        if cached_config is not None:
+            try:
+                return await self._generate(contents, cached_config)
+            except errors.ClientError as e:
+                if not self._cache_rejected(e, cached_config):
+                    raise
 
-        config = types.GenerateContentConfig(
-            temperature=temperature,
-            tools=tools,
-            system_instruction=sys_instruct,
-            safety_settings=[
-                types.SafetySetting(
-                    category="HARM_CATEGORY_HATE_SPEECH", threshold="OFF"
-                ),
-                types.SafetySetting(
-                    category="HARM_CATEGORY_DANGEROUS_CONTENT", threshold="OFF"
-                ),
-                types.SafetySetting(
-                    category="HARM_CATEGORY_SEXUALLY_EXPLICIT", threshold="OFF"
-                ),
-                types.SafetySetting(
-                    category="HARM_CATEGORY_HARASSMENT", threshold="OFF"
-                ),
-            ],
+        config = self._requests.config(temperature, functions, system_instruction)
+        return await self._generate(contents, config)
+
+    async def stream(
+        self,
+        messages: List[Message],
+        functions: List[LLMFunction] = None,
+        temperature: float = 0.0,
+    ) -> AsyncIterator[LLMDelta]:
+        contents, system_instruction = self._requests.contents(messages)
+        cached_config = await self._cached_config(
+            system_instruction, functions, temperature
         )
+        if cached_config is not None:
+            streamed = False
+            try:
+                async for delta in self._stream(contents, cached_config):
+                    streamed = True
+                    yield delta
+                return
+            except errors.ClientError as e:
+                if streamed or not self._cache_rejected(e, cached_config):
+                    raise
+
+        config = self._requests.config(temperature, functions, system_instruction)
+        async for delta in self._stream(contents, config):
+            yield delta
+
+    async def _cached_config(
+        self,
+        system_instruction: Optional[List[str]],
+        functions: Optional[List[LLMFunction]],
+        temperature: float,
+    ) -> Optional[types.GenerateContentConfig]:
+        """
+        Returns the config of a request reading its prefix from a cached
+        content, or None if the prefix is not cached.
+        """
+        if self._prefix_cache is None:
+            return None
+        cached_content = await self._prefix_cache.get(system_instruction, functions)
+        if cached_content is None:
+            return None
+        return self._requests.cached_config(temperature, cached_content)
+
+    def _cache_rejected(
+        self, error: errors.ClientError, config: types.GenerateContentConfig
+    ) -> bool:
+        """
+        Returns whether a request failed because of its cached content (e.g.
+        expired or deleted on the server), in which case it is retried with the
+        full prompt. Other client errors (e.g. an invalid argument) are not.
+        """
+        if error.code not in (400, 403, 404):
+            return False
+        # e.g. "CachedContent not found" or "Cache content 123 is expired"
+        message = "".join(f"{error.message or ''}".lower().split()).replace("_", "")
+        if "cachedcontent" not in message and "cachecontent" not in message:
+            return False
+        logger.warning(f"Request with cached content failed: {error}")
+        self._prefix_cache.invalidate(config.cached_content)
+        return True
+
+    async def generate_batch(
+        self,
+        requests: List[List[Message]],
+        functions: List[LLMFunction] = None,
+        temperature: float = 0.0,
+        max_concurrency: int = 8,
+        slot: Optional[Callable[[], AsyncContextManager]] = None,
+    ) -> List[LLMOutput]:
+        """
+        With batch_api enabled, submits the requests as a single Gemini batch
+        job (at a lower cost, but with a latency of minutes to hours) and waits
+        for its completion. Otherwise, and with Vertex AI clients (whose batch
+        jobs read their requests from Cloud Storage or BigQuery), the requests
+        are sent concurrently.
+
+        When some requests of a batch job fail, an LLMBatchError is raised,
+        with the outputs of the requests that succeeded and the errors of the
+        others.
+
+        A batch job holds the slot only while it is submitted: it does not
+        load the model endpoint while it waits for its completion.
+        """
+        if not self.batch_api or self.client.vertexai or len(requests) == 0:
+            return await super().generate_batch(
+                requests, functions, temperature, max_concurrency, slot
+            )
+
+        inlined_requests = []
+        for messages in requests:
+            contents, system_instruction = self._requests.contents(messages)
+            inlined_requests.append(
+                types.InlinedRequest(
+                    contents=contents,
+                    config=self._requests.config(
+                        temperature, functions, system_instruction
+                    ),
+                )
+            )
 
-        if feedback:
-            text_parts = []
-            output_function_calls = []
-            usage = None
-            async for chunk in await self.client.aio.models.generate_content_stream(
-                model=self.model, config=config, contents=contents
+        async with slot() if slot is not None else nullcontext():
+            job = await self.client.aio.batches.create(
+                model=self.model, src=inlined_requests
+            )
+        try:
+            while job.state not in _BATCH_TERMINAL_STATES:
+                await asyncio.sleep(self.batch_poll_interval)
+                job = await self.client.aio.batches.get(name=job.name)
+        except asyncio.CancelledError:
+            try:
+                await self.client.aio.batches.cancel(name=job.name)
+            except Exception as e:
+                logger.warning(f"Failed to cancel the batch job {job.name}: {e}")
+            raise
+
+        # A partially succeeded (or even failed) job may hold some responses
+        responses = (job.dest.inlined_responses if job.dest is not None else None) or []
+        if not responses and job.state != types.JobState.JOB_STATE_SUCCEEDED:
+            raise Exception(
+                f"Batch job {job.name} ended with state {job.state}: {job.error}"
+            )
+
+        outputs: List[Optional[LLMOutput]] = [None] * len(requests)
+        failures: Dict[int, Exception] = {}
+        for index in range(len(requests)):
+            response = responses[index] if index < len(responses) else None
+            if (
+                response is None
+                or response.error is not None
+                or response.response is None
             ):
-                if (
-                    chunk.candidates
-                    and chunk.candidates[0].content
-                    and chunk.candidates[0].content.parts
-                ):
-                    for part in chunk.candidates[0].content.parts:
-                        if part.text:
-                            text_parts.append(part.text)
-                            feedback.push(Feedback(payload=part.text, source="llm"))
-                        if part.function_call:
-                            args = part.function_call.args
-                            if args is not None and not isinstance(args, dict):
-                                try:
-                                    args = dict(args)
-                                except Exception:
-                                    pass
-                            output_function_calls.append(
-                                LLMFunctionExecution(
-                                    name=part.function_call.name, arguments=args
-                                )
-                            )
-                if chunk.usage_metadata:
-                    usg = chunk.usage_metadata
-                    usage = LLMUsage(
-                        model=self.model,
-                        prompt_token_count=(
-                            usg.prompt_token_count
-                            if usg.prompt_token_count is not None
-                            else 0
-                        ),
-                        thoughts_token_count=(
-                            usg.thoughts_token_count
-                            if usg.thoughts_token_count is not None
-                            else 0
-                        ),
-                        tool_use_prompt_token_count=(
-                            usg.tool_use_prompt_token_count
-                            if usg.tool_use_prompt_token_count is not None
-                            else 0
-                        ),
-                        candidates_token_count=(
-                            usg.candidates_token_count
-                            if usg.candidates_token_count is not None
-                            else 0
-                        ),
-                        total_token_count=(
-                            usg.total_token_count
-                            if usg.total_token_count is not None
-                            else 0
-                        ),
-                    )
-            return LLMOutput(
-                text="".join(text_parts),
-                function_calls=output_function_calls,
-                usage=usage,
+                error = response.error if response is not None else "no response"
+                failures[index] = Exception(
+                    f"Batch job {job.name} request {index} failed: {error}"
+                )
+                continue
+            outputs[index] = self._output(response.response)
+        if failures:
+            raise LLMBatchError(
+                f"{len(failures)} of the {len(requests)} requests of the batch job "
+                f"{job.name} failed (state {job.state})",
+                outputs,
+                failures,
             )
+        return outputs
+
+    async def warm_up(self):
+        """
+        Opens the connection of the client (TLS handshake included) and checks
+        that the model exists, with a lightweight metadata request.
+        """
+        await self.client.aio.models.get(model=self.model)
+
+    async def clear_context_cache(self):
+        """
+        Deletes the cached contents created by this LLM.
+        """
+        if self._prefix_cache is not None:
+            await self._prefix_cache.clear()
 
+    async def _generate(
+        self,
+        contents: List[types.Content],
+        config: types.GenerateContentConfig,
+    ) -> LLMOutput:
         response = await self.client.aio.models.generate_content(
             model=self.model, config=config, contents=contents
         )
+        return self._output(response)
 
-        usg = response.usage_metadata
-        usage = LLMUsage(
-            model=self.model,
-            prompt_token_count=(
-                usg.prompt_token_count if usg.prompt_token_count is not None else 0
-            ),
-            thoughts_token_count=(
-                usg.thoughts_token_count if usg.thoughts_token_count is not None else 0
-            ),
-            tool_use_prompt_token_count=(
-                usg.tool_use_prompt_token_count
-                if usg.tool_use_prompt_token_count is not None
-                else 0
-            ),
-            candidates_token_count=(
-                usg.candidates_token_count
-                if usg.candidates_token_count is not None
-                else 0
-            ),
-            total_token_count=(
-                usg.total_token_count if usg.total_token_count is not None else 0
-            ),
-        )
+    async def _stream(
+        self,
+        contents: List[types.Content],
+        config: types.GenerateContentConfig,
+    ) -> AsyncIterator[LLMDelta]:
+        usage = None
+        async for chunk in await self.client.aio.models.generate_content_stream(
+            model=self.model, config=config, contents=contents
+        ):
+            if (
+                chunk.candidates
+                and chunk.candidates[0].content
+                and chunk.candidates[0].content.parts
+            ):
+                for part in chunk.candidates[0].content.parts:
+                    if part.text:
+                        yield TextDelta(part.text)
+                    if part.function_call:
+                        # Function calls are streamed whole, so they can be
+                        # dispatched before the end of the generation.
+                        yield FunctionCallDelta(self._function_call(part.function_call))
+            if chunk.usage_metadata:
+                usage = self._usage(chunk.usage_metadata)
+        yield UsageDelta(usage if usage is not None else LLMUsage(model=self.model))
+
+    @staticmethod
+    def _function_call(function_call: types.FunctionCall) -> LLMFunctionExecution:
+        args = function_call.args
+        if args is not None and not isinstance(args, dict):
+            try:
+                args = dict(args)
+            except Exception:
+                pass
+        return LLMFunctionExecution(name=function_call.name, arguments=args)
+
+    def _output(self, response: types.GenerateContentResponse) -> LLMOutput:
+        usage = self._usage(response.usage_metadata)
 
         output_function_calls = []
         text_parts = []
@@ -180,18 +672,29 @@ class GeminiLLM(LLM):
                 if part.text:
                     text_parts.append(part.text)
                 if part.function_call:
-                    args = part.function_call.args
-                    if args is not None and not isinstance(args, dict):
-                        try:
-                            args = dict(args)
-                        except Exception:
-                            pass
                     output_function_calls.append(
-                        LLMFunctionExecution(
-                            name=part.function_call.name, arguments=args
-                        )
+                        self._function_call(part.function_call)
                     )
 
         return LLMOutput(
             text="".join(text_parts), function_calls=output_function_calls, usage=usage
         )
+
+    def _usage(self, usg: Any) -> LLMUsage:
+        if usg is None:
+            return LLMUsage(model=self.model)
+
+        def count(value: Optional[int]) -> int:
+            return value if value is not None else 0
+
+        return LLMUsage(
+            model=self.model,
+            prompt_token_count=count(usg.prompt_token_count),
+            thoughts_token_count=count(usg.thoughts_token_count),
+            tool_use_prompt_token_count=count(usg.tool_use_prompt_token_count),
+            candidates_token_count=count(usg.candidates_token_count),
+            total_token_count=count(usg.total_token_count),
+            cached_content_token_count=count(
+                getattr(usg, "cached_content_token_count", None)
+            ),
+        )
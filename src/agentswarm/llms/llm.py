@@ -1,8 +1,29 @@
 from __future__ import annotations
-from typing import List, Any, Optional
+
+import asyncio
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    List,
+    Optional,
+    Union,
+)
+
 from pydantic import BaseModel, Field
+
+from ..datamodels.feedback import Feedback, FeedbackSystem
 from ..datamodels.message import Message
-from ..datamodels.feedback import FeedbackSystem
+from .tokens import DEFAULT_TOKEN_COUNTER, TokenCounter
+
+# Feedback source of the text chunks streamed by an LLM
+TEXT_FEEDBACK_SOURCE = "llm"
+# Feedback source of the function calls streamed by an LLM. The payload is the
+# LLMFunctionExecution, pushed as soon as it is fully decoded from the stream.
+FUNCTION_CALL_FEEDBACK_SOURCE = "llm_function_call"
 
 
 class LLMFunction(BaseModel):
@@ -27,7 +48,121 @@ class LLMOutput(BaseModel):
     usage: LLMUsage = Field(description="The usage of the LLM")
 
 
+@dataclass(slots=True)
+class TextDelta:
+    """A chunk of the text of a streamed output."""
+
+    text: str
+
+
+@dataclass(slots=True)
+class FunctionCallDelta:
+    """A function call of a streamed output, complete."""
+
+    function_call: LLMFunctionExecution
+
+
+@dataclass(slots=True)
+class UsageDelta:
+    """The usage of a streamed output, yielded last."""
+
+    usage: LLMUsage
+
+
+LLMDelta = Union[TextDelta, FunctionCallDelta, UsageDelta]
+
+
+class _DeltaFeedback(FeedbackSystem):
+    """
+    Bridges the feedback of a generate-only LLM to a stream of deltas: the text
+    chunks and the function calls pushed by the LLM are queued as deltas.
+    """
+
+    def __init__(self, queue: asyncio.Queue):
+        self._queue = queue
+        self.streamed_text = False
+        self.streamed_function_calls = False
+
+    def push(self, feedback: Feedback):
+        if feedback.source == TEXT_FEEDBACK_SOURCE and isinstance(
+            feedback.payload, str
+        ):
+            self.streamed_text = True
+            self._queue.put_nowait(TextDelta(feedback.payload))
+        elif feedback.source == FUNCTION_CALL_FEEDBACK_SOURCE:
+            self.streamed_function_calls = True
+            self._queue.put_nowait(FunctionCallDelta(feedback.payload))
+
+    def subscribe(self, callback: Callable[[Feedback], None]):
+        raise NotImplementedError("_DeltaFeedback is an internal bridge.")
+
+    def to_dict(self) -> dict:
+        raise NotImplementedError("_DeltaFeedback is an internal bridge.")
+
+    @classmethod
+    def recreate(cls, config: dict) -> "_DeltaFeedback":
+        raise NotImplementedError("_DeltaFeedback is an internal bridge.")
+
+
+# Marks the end of the generation in the queue of a _DeltaFeedback
+_END_OF_STREAM = object()
+
+
 class LLM:
+    """
+    The LLM class defines the interface of the language models.
+
+    Implementations override stream() (the output as an async iterator of
+    deltas), generate() (the whole output, with the chunks pushed to an
+    optional feedback system), or both. Each one has a default implementation
+    built on top of the other.
+    """
+
+    # Maximum number of prompt tokens accepted by the model (None if unknown)
+    max_input_tokens: Optional[int] = None
+
+    def token_counter(self) -> TokenCounter:
+        """
+        Returns the counter used to estimate the prompt size before a request.
+        """
+        return DEFAULT_TOKEN_COUNTER
+
+    def count_tokens(
+        self, messages: List[Message], functions: List[LLMFunction] = None
+    ) -> int:
+        """
+        Returns the estimated number of prompt tokens of a request.
+        """
+        counter = self.token_counter()
+        return counter.count_messages(messages) + counter.count_functions(functions)
+
+    def check_prompt_size(
+        self, messages: List[Message], functions: List[LLMFunction] = None
+    ) -> Optional[int]:
+        """
+        Estimates the prompt size of a request and raises LLMContextLimitError if
+        it exceeds max_input_tokens, so that oversized requests fail fast
+        instead of being sent. Returns the estimated number of tokens, or None
+        if the LLM has no input limit (nothing is counted then).
+        """
+        from ..utils.exceptions import LLMContextLimitError
+
+        if self.max_input_tokens is None:
+            return None
+        tokens = self.count_tokens(messages, functions)
+        if tokens > self.max_input_tokens:
+            raise LLMContextLimitError(
+                f"Prompt of ~{tokens} tokens exceeds the limit of {self.max_input_tokens} tokens"
+            )
+        return tokens
+
+    async def warm_up(self):
+        """
+        Prepares the LLM for the first requests (e.g. opens its connections).
+        Optional: the default implementation does nothing.
+        """
+        pass
+
     async def generate(
         self,
         messages: List[Message],
@@ -35,4 +170,126 @@ class LLM:
         feedback: Optional[FeedbackSystem] = None,
         temperature: float = 0.0,
     ) -> LLMOutput:
-        pass
+        """
+        Generates the output of a request. The text chunks and the function
+        calls are pushed to the feedback system as they are streamed.
+
+        The default implementation collects the deltas of stream().
+        """
+        if type(self).stream is LLM.stream:
+            raise NotImplementedError(
+                f"{self.__class__.__name__} must implement generate() or stream()"
+            )
+        text_parts = []
+        function_calls = []
+        usage = None
+        async for delta in self.stream(messages, functions, temperature):
+            if isinstance(delta, TextDelta):
+                text_parts.append(delta.text)
+                if feedback is not None:
+                    feedback.push(
+                        Feedback(source=TEXT_FEEDBACK_SOURCE, payload=delta.text)
+                    )
+            elif isinstance(delta, FunctionCallDelta):
+                function_calls.append(delta.function_call)
+                if feedback is not None:
+                    feedback.push(
+                        Feedback(
+                            source=FUNCTION_CALL_FEEDBACK_SOURCE,
+                            payload=delta.function_call,
+                        )
+                    )
+            else:
+                usage = delta.usage
+        return LLMOutput(
+            text="".join(text_parts),
+            function_calls=function_calls,
+            usage=(
+                usage if usage is not None else LLMUsage(model=self.__class__.__name__)
+            ),
+        )
+
+    async def stream(
+        self,
+        messages: List[Message],
+        functions: List[LLMFunction] = None,
+        temperature: float = 0.0,
+    ) -> AsyncIterator[LLMDelta]:
+        """
+        Streams the output of a request: TextDelta and FunctionCallDelta as
+        they are generated, then a single UsageDelta. The generation proceeds
+        as the deltas are consumed, and it is cancelled if the iteration stops
+        early.
+
+        The default implementation runs generate() with a feedback system
+        bridging its chunks: they are queued as they are pushed, so the
+        consumer does not slow the generation down. The output that was not
+        streamed (e.g. by backends that don't stream) is yielded at the end.
+        """
+        if type(self).generate is LLM.generate:
+            raise NotImplementedError(
+                f"{self.__class__.__name__} must implement generate() or stream()"
+            )
+        queue: asyncio.Queue = asyncio.Queue()
+        bridge = _DeltaFeedback(queue)
+        task = asyncio.ensure_future(
+            self.generate(messages, functions, bridge, temperature)
+        )
+        task.add_done_callback(lambda _: queue.put_nowait(_END_OF_STREAM))
+        try:
+            while True:
+                delta = await queue.get()
+                if delta is _END_OF_STREAM:
+                    break
+                yield delta
+            output = task.result()
+        finally:
+            if not task.done():
+                task.cancel()
+                # Wait for the generation to wind down (e.g. close its connection)
+                await asyncio.gather(task, return_exceptions=True)
+
+        if output.text and not bridge.streamed_text:
+            yield TextDelta(output.text)
+        if not bridge.streamed_function_calls:
+            for function_call in output.function_calls:
+                yield FunctionCallDelta(function_call)
+        yield UsageDelta(output.usage)
+
+    async def generate_batch(
+        self,
+        requests: List[List[Message]],
+        functions: List[LLMFunction] = None,
+        temperature: float = 0.0,
+        max_concurrency: int = 8,
+        slot: Optional[Callable[[], AsyncContextManager]] = None,
+    ) -> List[LLMOutput]:
+        """
+        Generates the responses of many independent requests (one list of
+        messages each), in the same order. Meant for bulk jobs, where the
+        throughput and the cost matter more than the latency.
+
+        The default implementation sends the requests concurrently, at most
+        max_concurrency at a time. If a request fails, the others are cancelled
+        and the error is raised.
+
+        slot, when given, is entered around each request actually sent to the
+        provider (e.g. lambda: context.slot(Scheduler.LLM)), so that a batch
+        counts as many in-flight requests as it really sends.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def generate(messages: List[Message]) -> LLMOutput:
+            async with semaphore:
+                async with slot() if slot is not None else nullcontext():
+                    return await self.generate(
+                        messages, functions=functions, temperature=temperature
+                    )
+
+        tasks = [asyncio.ensure_future(generate(messages)) for messages in requests]
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,125 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from google.genai import Client
+
+from .gemini import GeminiLLM
+from .llm import LLM
+
+logger = logging.getLogger(__name__)
+
+
+def _fingerprint(config: Dict[str, Any]) -> str:
+    # Credentials are only kept hashed in the keys
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMProvider:
+    """
+    The LLMProvider hands out shared LLM instances, keyed by their
+    configuration, instead of building a new LLM (and a new client, with its
+    connection pool and TLS handshakes) at every request.
+
+    Clients are shared by credentials, and LLMs by credentials, model and
+    options: all the agents asking for the same configuration get the very same
+    instance, with its warm connections and its caches.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Client] = {}
+        self._llms: Dict[Hashable, LLM] = {}
+        # LLMs may be requested from several threads (e.g. remote handlers)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], LLM]) -> LLM:
+        """
+        Returns the LLM registered with the given key, creating it with the
+        factory the first time.
+        """
+        with self._lock:
+            llm = self._llms.get(key)
+            if llm is None:
+                llm = factory()
+                self._llms[key] = llm
+            return llm
+
+    def gemini(
+        self,
+        model: str = "gemini-3.1-flash-lite",
+        api_key: Optional[str] = None,
+        vertexai: bool = False,
+        project: Optional[str] = None,
+        location: Optional[str] = None,
+        **options,
+    ) -> GeminiLLM:
+        """
+        Returns the shared GeminiLLM of the given model and options.
+        Without credentials, the api key is read from the GEMINI_API_KEY
+        environment variable (unless vertexai is set).
+        """
+        if api_key is None and not vertexai:
+            api_key = os.getenv("GEMINI_API_KEY")
+        credentials = {
+            "api_key": api_key,
+            "vertexai": vertexai,
+            "project": project,
+            "location": location,
+        }
+        client_key = _fingerprint(credentials)
+        key = ("gemini", client_key, model, _fingerprint(options))
+        return self.get(
+            key,
+            lambda: GeminiLLM(
+                model=model, client=self._client(client_key, credentials), **options
+            ),
+        )
+
+    def _client(self, key: str, credentials: Dict[str, Any]) -> Client:
+        # Called with the lock held
+        client = self._clients.get(key)
+        if client is None:
+            if credentials["vertexai"]:
+                client = Client(
+                    vertexai=True,
+                    project=credentials["project"],
+                    location=credentials["location"],
+                )
+            else:
+                if credentials["api_key"] is None:
+                    raise ValueError("api_key must be provided")
+                client = Client(api_key=credentials["api_key"])
+            self._clients[key] = client
+        return client
+
+    async def warm_up(self):
+        """
+        Warms up all the LLMs handed out so far (e.g. opens their connections),
+        so that the first requests don't pay for it. Call it at startup, after
+        requesting the LLMs. Failures are logged, not raised.
+        """
+        with self._lock:
+            llms = list(self._llms.values())
+        results = await asyncio.gather(
+            *(llm.warm_up() for llm in llms), return_exceptions=True
+        )
+        for llm, result in zip(llms, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Warm up of {llm.__class__.__name__} failed: {result}")
+
+    def clear(self):
+        """
+        Forgets all the shared clients and LLMs.
+        """
+        with self._lock:
+            self._clients.clear()
+            self._llms.clear()
+
+
+# The provider shared by the whole process
+default_llm_provider = LLMProvider()
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Callable, List, Optional
+
+from ..datamodels.feedback import FeedbackSystem
+from ..datamodels.message import Message
+from .llm import LLM, LLMDelta, LLMFunction, LLMOutput, UsageDelta
+from .retry_policy import RetryPolicy
+from .tokens import TokenCounter
+
+logger = logging.getLogger(__name__)
+
+
+class _TokenBucket:
+    """
+    A token bucket holding up to capacity units, refilled continuously at
+    capacity units per minute. The level can go negative when more units than
+    estimated were spent: the following callers wait for the debt to be repaid.
+    """
+
+    def __init__(self, capacity: float, clock: Callable[[], float]):
+        self.capacity = capacity
+        self._rate = capacity / 60.0
+        self._clock = clock
+        self._level = capacity
+        self._updated = clock()
+
+    @property
+    def level(self) -> float:
+        now = self._clock()
+        self._level = min(
+            self.capacity, self._level + (now - self._updated) * self._rate
+        )
+        self._updated = now
+        return self._level
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Returns the seconds to wait before amount units are available.
+        Amounts larger than the capacity only wait for a full bucket.
+        """
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self._rate)
+
+    def consume(self, amount: float):
+        self._level = self.level - amount
+
+    def drain(self):
+        self._level = min(self.level, 0.0)
+
+
+class RateLimiter:
+    """
+    The RateLimiter enforces requests-per-minute and tokens-per-minute budgets,
+    with two token buckets. Share the same RateLimiter between all the
+    RateLimitedLLMs of a model to enforce its quota across all of them.
+
+    Callers are served in FIFO order: a large request waiting for its tokens is
+    not overtaken by the smaller ones queued after it.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            requests_per_minute: Maximum number of requests per minute (None: unlimited).
+            tokens_per_minute: Maximum number of tokens per minute (None: unlimited).
+        """
+        self.requests = (
+            _TokenBucket(requests_per_minute, clock) if requests_per_minute else None
+        )
+        self.tokens = (
+            _TokenBucket(tokens_per_minute, clock) if tokens_per_minute else None
+        )
+        self._lock = asyncio.Lock()
+
+    def wait_time(self, tokens: int) -> float:
+        """
+        Returns the seconds to wait before a request of the given (estimated)
+        number of tokens fits the budgets.
+        """
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens))
+        return wait
+
+    async def acquire(self, tokens: int):
+        """
+        Waits, in FIFO order, until a request of the given (estimated) number of
+        tokens fits the budgets, then consumes them.
+        """
+        async with self._lock:
+            while True:
+                wait = self.wait_time(tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.requests is not None:
+                self.requests.consume(1)
+            if self.tokens is not None:
+                self.tokens.consume(tokens)
+
+    def reconcile(self, estimated: int, actual: int):
+        """
+        Corrects the tokens budget with the actual count of a request, once known.
+        """
+        if self.tokens is not None:
+            self.tokens.consume(actual - estimated)
+
+    def drain(self):
+        """
+        Empties the budgets, e.g. when the provider reports that the quota is
+        exceeded anyway: the queued callers wait for a refill.
+        """
+        if self.requests is not None:
+            self.requests.drain()
+        if self.tokens is not None:
+            self.tokens.drain()
+
+
+class RateLimitedLLM(LLM):
+    """
+    A wrapper around an LLM that keeps its requests within the quotas of the
+    provider, instead of failing them with rate limit errors (HTTP 429) and
+    retrying them blindly.
+
+    Before a request, the number of prompt tokens is estimated with the token
+    counter of the LLM (plus expected_output_tokens), and the caller waits in
+    FIFO order until the request fits the requests-per-minute and
+    tokens-per-minute budgets. Once the response is received, the estimate is
+    reconciled with the actual LLMUsage.
+
+    Wrap it with ReliableLLM only if the time spent waiting for the budget is
+    shorter than the inactivity timeout: otherwise, make it the outer wrapper.
+    """
+
+    def __init__(
+        self,
+        llm: LLM,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        expected_output_tokens: int = 0,
+        limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+    ):
+        """
+        Args:
+            llm: The LLM to wrap.
+            requests_per_minute: Maximum number of requests per minute.
+            tokens_per_minute: Maximum number of tokens per minute.
+            expected_output_tokens: Tokens reserved for the output of each
+                request, until the actual usage is known.
+            limiter: A RateLimiter shared with other LLMs using the same quota.
+                When provided, the budgets above are ignored.
+            retry_policy: Tells the rate limit errors of the provider from the
+                others. Defaults to a RetryPolicy().
+        """
+        self.llm = llm
+        self.expected_output_tokens = expected_output_tokens
+        self.limiter = (
+            limiter
+            if limiter is not None
+            else RateLimiter(requests_per_minute, tokens_per_minute)
+        )
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+
+    @property
+    def max_input_tokens(self) -> Optional[int]:
+        return self.llm.max_input_tokens
+
+    def token_counter(self) -> TokenCounter:
+        return self.llm.token_counter()
+
+    async def warm_up(self):
+        await self.llm.warm_up()
+
+    async def generate(
+        self,
+        messages: List[Message],
+        functions: List[LLMFunction] = None,
+        feedback: Optional[FeedbackSystem] = None,
+        temperature: float = 0.0,
+    ) -> LLMOutput:
+        estimated = self.count_tokens(messages, functions) + self.expected_output_tokens
+        await self.limiter.acquire(estimated)
+        try:
+            output = await self.llm.generate(messages, functions, feedback, temperature)
+        except Exception as e:
+            self._on_error(e)
+            raise
+        if output.usage is not None and output.usage.total_token_count:
+            self.limiter.reconcile(estimated, output.usage.total_token_count)
+        return output
+
+    async def stream(
+        self,
+        messages: List[Message],
+        functions: List[LLMFunction] = None,
+        temperature: float = 0.0,
+    ) -> AsyncIterator[LLMDelta]:
+        estimated = self.count_tokens(messages, functions) + self.expected_output_tokens
+        await self.limiter.acquire(estimated)
+        try:
+            async for delta in self.llm.stream(messages, functions, temperature):
+                if isinstance(delta, UsageDelta) and delta.usage.total_token_count:
+                    self.limiter.reconcile(estimated, delta.usage.total_token_count)
+                yield delta
+        except Exception as e:
+            self._on_error(e)
+            raise
+
+    def _on_error(self, error: Exception):
+        """
+        Pauses the requests when the provider rejected one with a rate limit
+        error: the actual quota is lower than the budgets.
+        """
+        if self.retry_policy.classify(error) == RetryPolicy.RATE_LIMITED:
+            logger.warning(
+                "Rate limit exceeded on the provider side, pausing the requests"
+            )
+            self.limiter.drain()
@@ -1,13 +1,26 @@
 import asyncio
 import logging
-from typing import Callable, List, Optional
-from .llm import LLM, LLMFunction, LLMOutput
-from ..datamodels.message import Message
+import time
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
 from ..datamodels.feedback import Feedback, FeedbackSystem
+from ..datamodels.message import Message
 from ..utils.exceptions import LLMLoopError, LLMOutputLimitError
+from .llm import (
+    FUNCTION_CALL_FEEDBACK_SOURCE,
+    LLM,
+    TEXT_FEEDBACK_SOURCE,
+    LLMFunction,
+    LLMOutput,
+)
+from .retry_policy import RetryPolicy
+from .tokens import TokenCounter
 
 logger = logging.getLogger(__name__)
 
+CONTINUATION_PROMPT = """Your previous response was interrupted. Continue it exactly from where it stopped: do not repeat any of it and do not add any preamble."""
+
 
 class _LoopDetector:
     """
@@ -18,8 +31,22 @@ class _LoopDetector:
     repeated consecutively at least ``min_repetitions`` times. This catches the
     classic failure mode where an LLM gets stuck re-emitting the same word,
     line, or phrase indefinitely, regardless of how fast the tokens arrive.
+
+    The work per character is kept small, since it runs on the event loop for
+    every streamed token. The window is kept in blocks of about
+    ``_BLOCK_SIZE`` characters, so that a check never copies the whole window:
+    the candidate pattern lengths are found by scanning the last
+    ``max_pattern_length`` characters for the previous occurrences of the tail
+    (see :meth:`_search`), and a candidate is verified on a tail doubling in
+    length, which stops at the first mismatch. Outside of actual repetitions,
+    a check costs O(max_pattern_length) in C string operations, whatever
+    ``min_repetitions``: the cost per character grows with
+    ``max_pattern_length / check_every``, not with the window.
     """
 
+    # Minimum length of the blocks holding the window
+    _BLOCK_SIZE = 4096
+
     def __init__(
         self,
         min_repetitions: int = 12,
@@ -33,32 +60,176 @@ class _LoopDetector:
         self.check_every = max(1, check_every)
         # The window only needs to hold the longest detectable repetition.
         self._window_size = max_pattern_length * (min_repetitions + 1)
-        self._buffer = ""
+        # A loop of any length p covers at least (min_repetitions - 1) * p
+        # characters before its last unit, so the tail of this length always
+        # occurs again p characters earlier.
+        self._probe_length = min(16, min_repetitions - 1)
+        # The longer units guarantee a longer repeated tail, which rules out
+        # most of the near-repetitions (e.g. the rows of a table).
+        self._long_period = -(-64 // (min_repetitions - 1))
+        self._long_probe_length = (min_repetitions - 1) * self._long_period
+        self._blocks: Deque[str] = deque()
+        self._length = 0
+        self._pending: List[str] = []
+        self._pending_length = 0
         self._since_check = 0
 
     def feed(self, text: str):
-        self._buffer += text
-        if len(self._buffer) > self._window_size:
-            self._buffer = self._buffer[-self._window_size :]
-        self._since_check += len(text)
+        length = len(text)
+        self._pending.append(text)
+        self._pending_length += length
+        self._since_check += length
+        # Bounds the memory when detect() is not called.
+        if self._pending_length > self._window_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending = []
+        self._pending_length = 0
+        # Small blocks are merged, so that a tail spans few blocks
+        if self._blocks and len(self._blocks[-1]) < self._BLOCK_SIZE:
+            self._blocks[-1] += text
+        else:
+            self._blocks.append(text)
+        self._length += len(text)
+        while self._length - len(self._blocks[0]) >= self._window_size:
+            self._length -= len(self._blocks.popleft())
+
+    def _tail(self, size: int) -> str:
+        """Return the last ``size`` characters of the window."""
+        last = self._blocks[-1]
+        if len(last) >= size:
+            return last[len(last) - size :]
+        parts = []
+        length = 0
+        for block in reversed(self._blocks):
+            parts.append(block)
+            length += len(block)
+            if length >= size:
+                break
+        tail = "".join(reversed(parts))
+        return tail[max(0, len(tail) - size) :]
 
     def detect(self) -> Optional[str]:
         """Return the repeating unit if a loop is detected, else ``None``."""
         if self._since_check < self.check_every:
             return None
         self._since_check = 0
-
-        s = self._buffer
+        self._flush()
+
+        r = self.min_repetitions
+        max_p = min(self.max_pattern_length, self._length // r)
+        short = min(self._long_period - 1, max_p)
+        s = self._tail(self._long_probe_length + max_p)
+        unit = None
+        if short > 0:
+            unit = self._search(s, self._probe_length, 1, short)
+        if unit is None and max_p > short:
+            unit = self._search(s, self._long_probe_length, short + 1, max_p)
+        return unit
+
+    def _search(self, s: str, m: int, min_p: int, max_p: int) -> Optional[str]:
+        """
+        Return the shortest repeating unit of min_p to max_p characters at the
+        end of s (the tail of the window), if any. Its length is the distance
+        to a previous occurrence of the last m characters, which are repeated
+        by any loop of these lengths.
+        """
         n = len(s)
-        max_p = min(self.max_pattern_length, n // self.min_repetitions)
-        for p in range(1, max_p + 1):
-            unit = s[n - p : n]
-            for r in range(2, self.min_repetitions + 1):
-                if s[n - r * p : n - (r - 1) * p] != unit:
+        probe = s[n - m :]
+        # The occurrences are found from the right, so the shortest unit is
+        # checked first.
+        lowest = n - m - max_p
+        end = n - min_p
+        while True:
+            start = s.rfind(probe, lowest, end)
+            if start < 0:
+                return None
+            p = n - m - start
+            end = start + m - 1
+            # The last k units are equal iff the tail of k * p characters has
+            # period p. It is checked for growing k, up to r, as most
+            # candidates fail within the last few units.
+            r = self.min_repetitions
+            k = 2
+            while True:
+                tail = s[n - k * p :] if k * p <= n else self._tail(k * p)
+                if tail[: (k - 1) * p] != tail[p:]:
                     break
-            else:
-                return unit
-        return None
+                if k == r:
+                    return tail[(k - 1) * p :]
+                k = min(2 * k, r)
+
+
+class _LatencyStats:
+    """
+    Keeps the most recent latency samples (e.g. the time-to-first-token of the
+    requests) and their percentiles.
+    """
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def add(self, sample: float):
+        self._samples.append(sample)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Return the p-th percentile (0 < p <= 1) of the samples, or ``None``."""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(p * len(ordered))) - 1))
+        return ordered[index]
+
+
+class StreamLatencies:
+    """
+    The recent stream latencies of a model: the time-to-first-token of the
+    requests and the gaps between their chunks. ReliableLLM derives its
+    adaptive inactivity timeouts (and its hedging delay) from them.
+
+    Share the same StreamLatencies between all the ReliableLLMs of a model, so
+    that they learn from each other's requests.
+    """
+
+    def __init__(self, window: int = 200, gap_window: int = 2000):
+        self.ttft = _LatencyStats(window)
+        self.gaps = _LatencyStats(gap_window)
+
+
+class _Partial:
+    """
+    The output salvaged from the aborted attempts of a request: a text prefix
+    that the next attempt is asked to continue.
+    """
+
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        # Streamed by the current attempt
+        self.text = ""
+        self.function_calls = 0
+
+
+class _HedgeRace:
+    """
+    Shared by the guards of the concurrent attempts of a hedged request: the
+    first attempt producing a token wins, and only the winner forwards its
+    stream to the caller's feedback system.
+    """
+
+    def __init__(self):
+        self.winner: Optional["_StreamGuard"] = None
+
+    def claim(self, guard: "_StreamGuard") -> bool:
+        if self.winner is None:
+            self.winner = guard
+        return self.winner is guard
 
 
 class _StreamGuard(FeedbackSystem):
@@ -69,12 +240,16 @@ class _StreamGuard(FeedbackSystem):
     It transparently forwards every event to an optional inner feedback system
     while providing three protections to :class:`ReliableLLM`:
 
-      - ``last_activity`` tracking for the inactivity (idle) timeout,
+      - ``last_activity`` tracking for the inactivity (idle) timeout, with the
+        gaps between chunks recorded in the optional ``gaps`` stats,
       - repetition-loop detection via :class:`_LoopDetector`,
       - an optional hard cap on the total number of emitted characters.
 
     When a loop or the output cap is hit, ``abort_exception`` is populated and
     ``abort_event`` is set so the watchdog can cancel the generation promptly.
+
+    The guards of the concurrent attempts of a hedged request share a
+    :class:`_HedgeRace`: only the first one producing a token forwards events.
     """
 
     def __init__(
@@ -83,26 +258,55 @@ class _StreamGuard(FeedbackSystem):
         clock: Callable[[], float],
         detector: Optional[_LoopDetector] = None,
         max_output_chars: Optional[int] = None,
+        race: Optional[_HedgeRace] = None,
+        gaps: Optional[_LatencyStats] = None,
+        record: bool = False,
     ):
         self._inner = inner
         self._clock = clock
         self._detector = detector
         self._max_output_chars = max_output_chars
-        self.last_activity = clock()
+        self._race = race
+        self._gaps = gaps
+        self.started = clock()
+        self.last_activity = self.started
+        self.first_activity: Optional[float] = None
         self.total_chars = 0
+        self.total_events = 0
+        # The streamed text and function calls, kept for a continuation
+        self.text_parts: Optional[List[str]] = [] if record else None
+        self.function_calls = 0
         self.abort_exception: Optional[Exception] = None
         self.abort_event = asyncio.Event()
 
     def push(self, feedback: Feedback):
-        # Any token produced by the LLM counts as liveness.
-        if feedback.source == "llm":
-            self.last_activity = self._clock()
+        # The stream of a hedged attempt that lost the race is dropped.
+        if self._race is not None and not self._race.claim(self):
+            return
+        if self.first_activity is None:
+            self.first_activity = self._clock()
+        # Any token (or function call) produced by the LLM counts as liveness.
+        if feedback.source == TEXT_FEEDBACK_SOURCE:
+            self._activity()
             payload = feedback.payload
             if isinstance(payload, str) and payload:
+                if self.text_parts is not None:
+                    self.text_parts.append(payload)
                 self._inspect(payload)
+        elif feedback.source == FUNCTION_CALL_FEEDBACK_SOURCE:
+            self._activity()
+            self.function_calls += 1
         if self._inner is not None:
             self._inner.push(feedback)
 
+    def _activity(self):
+        now = self._clock()
+        # The first token is measured as time-to-first-token, not as a gap.
+        if self._gaps is not None and self.total_events > 0:
+            self._gaps.add(now - self.last_activity)
+        self.total_events += 1
+        self.last_activity = now
+
     def _inspect(self, text: str):
         if self.abort_exception is not None:
             return
@@ -168,8 +372,27 @@ class ReliableLLM(LLM):
       3. **Output cap (optional).** A hard limit on total emitted characters,
          as a last-resort bound on runaway generations.
 
-    Every aborted attempt is retried with exponential backoff, up to
-    ``max_retries`` times.
+    Failed attempts are retried according to a :class:`RetryPolicy`: permanent
+    errors (e.g. invalid requests) are raised at once, rate limit errors wait
+    for the delay hinted by the provider, and the delays between retries are
+    jittered, up to ``max_retries`` times.
+
+    Optionally, the inactivity timeout is **adaptive**: the time-to-first-token
+    and the gaps between chunks of the recent requests are recorded, and each
+    gets its own threshold (a high percentile times a factor, between a floor
+    and ``timeout``), so that a stalled stream is aborted in seconds rather
+    than after the worst-case static timeout.
+
+    Optionally, an attempt aborted after streaming some text is **continued**
+    rather than restarted: the next attempt is asked to continue the salvaged
+    text, and the outputs are stitched together, so that a stall late in a long
+    generation does not pay for the whole generation again.
+
+    Optionally, requests are **hedged** to cut the tail latency: when no token
+    arrives within a percentile of the recent time-to-first-token, a second
+    attempt is started in parallel. The first attempt producing a token wins,
+    and the other one is cancelled. Hedges are capped by a budget (a fraction
+    of the requests), so that they cannot double the spend.
 
     Token activity is observed through the :class:`FeedbackSystem`. An internal
     proxy feedback is always supplied to the wrapped LLM (which, for
@@ -190,6 +413,20 @@ class ReliableLLM(LLM):
         loop_min_repetitions: int = 12,
         loop_max_pattern_length: int = 256,
         max_output_chars: Optional[int] = None,
+        hedge: bool = False,
+        hedge_percentile: float = 0.95,
+        hedge_min_delay: float = 1.0,
+        hedge_budget: float = 0.1,
+        hedge_min_samples: int = 20,
+        adaptive_timeout: bool = False,
+        adaptive_percentile: float = 0.99,
+        adaptive_factor: float = 3.0,
+        adaptive_min_timeout: float = 5.0,
+        adaptive_min_samples: int = 20,
+        latencies: Optional[StreamLatencies] = None,
+        continuation: bool = False,
+        continuation_min_chars: int = 200,
+        retry_policy: Optional[RetryPolicy] = None,
     ):
         """
         Initialize the ReliableLLM.
@@ -208,6 +445,34 @@ class ReliableLLM(LLM):
                 characters) considered by the detector. Defaults to 256.
             max_output_chars (Optional[int]): Hard cap on total emitted
                 characters. ``None`` disables the cap. Defaults to None.
+            hedge (bool): Enable hedged requests. Defaults to False.
+            hedge_percentile (float): Percentile of the recent
+                time-to-first-token after which a hedge is started. Defaults to 0.95.
+            hedge_min_delay (float): Minimum delay in seconds before a hedge is
+                started. Defaults to 1.0.
+            hedge_budget (float): Maximum fraction of the requests that can be
+                hedged. Defaults to 0.1.
+            hedge_min_samples (int): Number of time-to-first-token samples
+                needed before hedging. Defaults to 20.
+            adaptive_timeout (bool): Derive the time-to-first-token and the
+                inter-chunk timeouts from the recent latencies, with ``timeout``
+                as ceiling. Defaults to False.
+            adaptive_percentile (float): Percentile of the recent latencies the
+                adaptive timeouts are based on. Defaults to 0.99.
+            adaptive_factor (float): Multiplier of the percentile. Defaults to 3.0.
+            adaptive_min_timeout (float): Floor of the adaptive timeouts in
+                seconds. Defaults to 5.0.
+            adaptive_min_samples (int): Number of samples needed before a
+                timeout adapts. Defaults to 20.
+            latencies (Optional[StreamLatencies]): Latencies shared with the
+                other ReliableLLMs of the same model. Defaults to new ones.
+            continuation (bool): Continue the text streamed by an attempt aborted
+                on a timeout or an error, instead of restarting. Defaults to False.
+            continuation_min_chars (int): Minimum salvaged characters to continue
+                rather than restart. Defaults to 200.
+            retry_policy (Optional[RetryPolicy]): Decides which errors are
+                retried and after how long. Defaults to a RetryPolicy built from
+                max_retries, retry_delay and backoff_factor.
         """
         self.llm = llm
         self.timeout = timeout
@@ -218,6 +483,41 @@ class ReliableLLM(LLM):
         self.loop_min_repetitions = loop_min_repetitions
         self.loop_max_pattern_length = loop_max_pattern_length
         self.max_output_chars = max_output_chars
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_budget = hedge_budget
+        self.hedge_min_samples = hedge_min_samples
+        self.adaptive_timeout = adaptive_timeout
+        self.adaptive_percentile = adaptive_percentile
+        self.adaptive_factor = adaptive_factor
+        self.adaptive_min_timeout = adaptive_min_timeout
+        self.adaptive_min_samples = adaptive_min_samples
+        self.latencies = latencies if latencies is not None else StreamLatencies()
+        self.continuation = continuation
+        self.continuation_min_chars = continuation_min_chars
+        self.retry_policy = (
+            retry_policy
+            if retry_policy is not None
+            else RetryPolicy(
+                max_retries=max_retries,
+                base_delay=retry_delay,
+                backoff_factor=backoff_factor,
+            )
+        )
+        # Hedges available, earned by every request (up to a small burst)
+        self._hedge_credits = 0.0
+        self.hedged_requests = 0
+
+    @property
+    def max_input_tokens(self) -> Optional[int]:
+        return self.llm.max_input_tokens
+
+    def token_counter(self) -> TokenCounter:
+        return self.llm.token_counter()
+
+    async def warm_up(self):
+        await self.llm.warm_up()
 
     async def generate(
         self,
@@ -230,37 +530,96 @@ class ReliableLLM(LLM):
         Generate a response from the wrapped LLM with inactivity, loop and
         output-size guards plus a retry mechanism.
         """
-        last_exception = None
-        current_delay = self.retry_delay
+        started = time.monotonic()
+        retries = 0
+        delay = None
+        prefix = ""
 
-        for attempt in range(self.max_retries + 1):
+        while True:
+            partial = _Partial(prefix) if self.continuation else None
             try:
-                return await self._generate_guarded(
-                    messages, functions, feedback, temperature
+                output = await self._generate_guarded(
+                    self._continuation_messages(messages, prefix),
+                    functions,
+                    feedback,
+                    temperature,
+                    partial,
                 )
-            except asyncio.TimeoutError:
+                return self._stitch(prefix, output)
+            except asyncio.TimeoutError as e:
                 last_exception = TimeoutError(
-                    f"No token received for {self.timeout}s (inactivity timeout)"
+                    str(e)
+                    or f"No token received for {self.timeout}s (inactivity timeout)"
                 )
-                logger.warning(f"Attempt {attempt + 1} failed: inactivity timeout")
+                logger.warning(f"Attempt {retries + 1} failed: inactivity timeout")
             except (LLMLoopError, LLMOutputLimitError) as e:
                 last_exception = e
-                logger.warning(f"Attempt {attempt + 1} failed: {e}")
+                logger.warning(f"Attempt {retries + 1} failed: {e}")
+                # A degenerate output is not worth continuing
+                partial = None
             except Exception as e:
                 last_exception = e
-                logger.warning(f"Attempt {attempt + 1} failed: {str(e)}")
+                logger.warning(f"Attempt {retries + 1} failed: {str(e)}")
 
-            if attempt < self.max_retries:
-                logger.info(f"Retrying in {current_delay}s...")
-                await asyncio.sleep(current_delay)
-                current_delay *= self.backoff_factor
-            else:
-                logger.error("Max retries reached.")
+            prefix = self._salvage(partial)
 
-        raise last_exception
+            delay = self.retry_policy.next_delay(
+                last_exception, retries, delay, time.monotonic() - started
+            )
+            if delay is None:
+                if self.retry_policy.classify(last_exception) == RetryPolicy.PERMANENT:
+                    logger.error("Permanent error, not retrying.")
+                else:
+                    logger.error("Max retries reached.")
+                raise last_exception
+            logger.info(f"Retrying in {delay:.2f}s...")
+            await asyncio.sleep(delay)
+            retries += 1
+
+    def _salvage(self, partial: Optional[_Partial]) -> str:
+        """
+        Return the prefix the next attempt continues ("" to restart).
+        """
+        if partial is None or partial.function_calls:
+            return ""
+        prefix = partial.prefix + partial.text
+        if len(prefix) < self.continuation_min_chars:
+            return ""
+        logger.info(f"Continuing the {len(prefix)} characters already generated")
+        return prefix
+
+    @staticmethod
+    def _continuation_messages(messages: List[Message], prefix: str) -> List[Message]:
+        if not prefix:
+            return messages
+        return list(messages) + [
+            Message(type="assistant", content=prefix),
+            Message(type="user", content=CONTINUATION_PROMPT),
+        ]
+
+    def _stitch(self, prefix: str, output: LLMOutput) -> LLMOutput:
+        if not prefix:
+            return output
+        # The tokens of the salvaged text are estimated: the aborted attempts
+        # report no usage.
+        salvaged = self.token_counter().count_text(prefix)
+        usage = output.usage.model_copy(
+            update={
+                "candidates_token_count": output.usage.candidates_token_count
+                + salvaged,
+                "total_token_count": output.usage.total_token_count + salvaged,
+            }
+        )
+        return output.model_copy(
+            update={"text": prefix + (output.text or ""), "usage": usage}
+        )
 
     def _build_guard(
-        self, feedback: Optional[FeedbackSystem], clock: Callable[[], float]
+        self,
+        feedback: Optional[FeedbackSystem],
+        clock: Callable[[], float],
+        race: Optional[_HedgeRace] = None,
+        partial: Optional[_Partial] = None,
     ) -> _StreamGuard:
         detector = (
             _LoopDetector(
@@ -270,61 +629,198 @@ class ReliableLLM(LLM):
             if self.loop_detection
             else None
         )
-        return _StreamGuard(
+        guard = _StreamGuard(
             inner=feedback,
             clock=clock,
             detector=detector,
             max_output_chars=self.max_output_chars,
+            race=race,
+            gaps=self.latencies.gaps,
+            record=partial is not None,
+        )
+        if partial is not None:
+            # The output cap applies to the stitched output
+            guard.total_chars = len(partial.prefix)
+        return guard
+
+    def _timeouts(self) -> Tuple[float, float]:
+        """
+        Return the time-to-first-token and the inter-chunk timeouts of a request.
+        """
+        if not self.adaptive_timeout:
+            return self.timeout, self.timeout
+        return (
+            self._adaptive(self.latencies.ttft),
+            self._adaptive(self.latencies.gaps),
         )
 
+    def _adaptive(self, stats: _LatencyStats) -> float:
+        if len(stats) < self.adaptive_min_samples:
+            return self.timeout
+        threshold = stats.percentile(self.adaptive_percentile) * self.adaptive_factor
+        return min(self.timeout, max(self.adaptive_min_timeout, threshold))
+
+    def _hedge_delay(self) -> Optional[float]:
+        """
+        Return the delay after which the current request may be hedged, or
+        ``None`` if it cannot be hedged.
+        """
+        if not self.hedge:
+            return None
+        self._hedge_credits = min(
+            self._hedge_credits + self.hedge_budget, max(1.0, 10 * self.hedge_budget)
+        )
+        ttft = self.latencies.ttft
+        if len(ttft) < self.hedge_min_samples:
+            return None
+        return max(self.hedge_min_delay, ttft.percentile(self.hedge_percentile))
+
+    def _take_hedge_credit(self) -> bool:
+        if self._hedge_credits < 1.0:
+            return False
+        self._hedge_credits -= 1.0
+        self.hedged_requests += 1
+        return True
+
     async def _generate_guarded(
         self,
         messages: List[Message],
         functions: Optional[List[LLMFunction]],
         feedback: Optional[FeedbackSystem],
         temperature: float,
+        partial: Optional[_Partial] = None,
     ) -> LLMOutput:
         """
-        Run a single generation attempt, aborting it on inactivity, a detected
-        repetition loop, or an exceeded output cap.
+        Run a single generation attempt (possibly hedged), aborting it on
+        inactivity, a detected repetition loop, or an exceeded output cap.
+        The output streamed by the attempt is recorded in ``partial``, if given.
         """
         loop = asyncio.get_event_loop()
-        guard = self._build_guard(feedback, loop.time)
+        race = _HedgeRace() if self.hedge else None
+        attempts: List[_Attempt] = []
+        dropped: List[_Attempt] = []
+
+        def start_attempt():
+            guard = self._build_guard(feedback, loop.time, race, partial)
+            attempts.append(
+                _Attempt(
+                    guard,
+                    asyncio.ensure_future(
+                        self.llm.generate(messages, functions, guard, temperature)
+                    ),
+                )
+            )
 
-        gen_task = asyncio.ensure_future(
-            self.llm.generate(messages, functions, guard, temperature)
-        )
-        abort_task = asyncio.ensure_future(guard.abort_event.wait())
+        start_attempt()
+        hedge_delay = self._hedge_delay()
+        hedge_at = loop.time() + hedge_delay if hedge_delay is not None else None
+        ttft_recorded = False
 
         try:
             while True:
-                if gen_task.done():
-                    return gen_task.result()
-
-                idle = loop.time() - guard.last_activity
-                remaining = self.timeout - idle
+                # A loop or output-cap breach takes precedence over a result
+                # that may have completed in the same slice.
+                for attempt in attempts:
+                    if attempt.guard.abort_exception is not None:
+                        raise attempt.guard.abort_exception
+
+                if race is not None and race.winner is not None and len(attempts) > 1:
+                    # The first attempt producing a token won: drop the others.
+                    for attempt in attempts:
+                        if attempt.guard is not race.winner:
+                            attempt.cancel()
+                            dropped.append(attempt)
+                    attempts = [a for a in attempts if a.guard is race.winner]
+
+                if not ttft_recorded:
+                    for attempt in attempts:
+                        if attempt.guard.first_activity is not None:
+                            self.latencies.ttft.add(
+                                attempt.guard.first_activity - attempt.guard.started
+                            )
+                            ttft_recorded = True
+                            break
+
+                for attempt in list(attempts):
+                    if not attempt.task.done():
+                        continue
+                    if attempt.task.cancelled() or attempt.task.exception() is not None:
+                        # A failed attempt is ignored while another one may succeed.
+                        if len(attempts) > 1:
+                            attempts.remove(attempt)
+                            dropped.append(attempt)
+                            continue
+                    return attempt.task.result()
+
+                now = loop.time()
+                # The first token and the following ones have their own timeouts,
+                # which adapt as the latencies (of this stream too) are recorded.
+                ttft_timeout, gap_timeout = self._timeouts()
+                guard = max(
+                    (attempt.guard for attempt in attempts),
+                    key=lambda guard: guard.last_activity,
+                )
+                limit = ttft_timeout if guard.first_activity is None else gap_timeout
+                remaining = guard.last_activity + limit - now
                 if remaining <= 0:
                     # No activity within the timeout window: abort this attempt.
-                    raise asyncio.TimeoutError()
+                    raise asyncio.TimeoutError(
+                        f"No token received for {limit:.1f}s (inactivity timeout)"
+                    )
 
+                if self.adaptive_timeout:
+                    # Re-evaluate regularly: the timeouts may shrink meanwhile.
+                    remaining = min(remaining, self.adaptive_min_timeout)
+
+                if hedge_at is not None and race.winner is None:
+                    if now >= hedge_at:
+                        hedge_at = None
+                        if self._take_hedge_credit():
+                            logger.info("No token received yet, hedging the request")
+                            start_attempt()
+                            continue
+                    else:
+                        remaining = min(remaining, hedge_at - now)
+
+                waiting = set()
+                for attempt in attempts:
+                    waiting.add(attempt.task)
+                    waiting.add(attempt.abort_task)
                 await asyncio.wait(
-                    {gen_task, abort_task},
+                    waiting,
                     timeout=max(remaining, 0),
                     return_when=asyncio.FIRST_COMPLETED,
                 )
-
-                # A loop or output-cap breach takes precedence over a result
-                # that may have completed in the same slice.
-                if guard.abort_exception is not None:
-                    raise guard.abort_exception
-                if gen_task.done():
-                    return gen_task.result()
                 # Otherwise the timeout slice elapsed; re-evaluate idle time.
         finally:
-            abort_task.cancel()
-            if not gen_task.done():
-                gen_task.cancel()
-                try:
-                    await gen_task
-                except (asyncio.CancelledError, Exception):
-                    pass
+            if partial is not None:
+                # Only the attempt that won the race (if any) streamed
+                guard = max(
+                    (attempt.guard for attempt in attempts + dropped),
+                    key=lambda guard: guard.total_chars,
+                )
+                partial.text = "".join(guard.text_parts)
+                partial.function_calls = guard.function_calls
+            for attempt in attempts + dropped:
+                await attempt.close()
+
+
+class _Attempt:
+    """A running generation attempt, with its guard."""
+
+    def __init__(self, guard: _StreamGuard, task: asyncio.Future):
+        self.guard = guard
+        self.task = task
+        self.abort_task = asyncio.ensure_future(guard.abort_event.wait())
+
+    def cancel(self):
+        self.abort_task.cancel()
+        if not self.task.done():
+            self.task.cancel()
+
+    async def close(self):
+        self.cancel()
+        try:
+            await self.task
+        except (asyncio.CancelledError, Exception):
+            pass
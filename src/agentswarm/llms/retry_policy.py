@@ -0,0 +1,176 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+
+from pydantic import ValidationError
+
+from ..utils.exceptions import LLMContextLimitError
+
+# Status codes worth retrying, besides the server errors (5xx)
+_TRANSIENT_STATUS_CODES = {408, 409, 425}
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    # google-genai errors expose .code, httpx and most HTTP clients .status_code
+    for attribute in ("code", "status_code"):
+        code = getattr(error, attribute, None)
+        if isinstance(code, int):
+            return code
+    response = getattr(error, "response", None)
+    code = getattr(response, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def _seconds(value: Any) -> Optional[float]:
+    """
+    Parses a retry delay: a number of seconds, a duration such as "32s", or
+    an HTTP date.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    try:
+        return float(value[:-1] if value.endswith("s") else value)
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    The RetryPolicy decides whether, and after how long, a failed LLM request
+    is retried.
+
+    Errors are sorted into three kinds:
+
+      - **permanent**: the request itself is wrong (e.g. HTTP 400, 401, 403,
+        404, an invalid schema, a prompt over the context limit). Retrying
+        cannot help: the error is raised at once.
+      - **rate limited**: the provider's quota is exceeded (HTTP 429). The
+        retry waits at least the delay hinted by the provider (Retry-After).
+      - **transient**: anything else (timeouts, server errors, connection
+        errors, aborted streams).
+
+    Delays use decorrelated jitter: each delay is drawn between ``base_delay``
+    and three times the previous one (up to ``max_delay``), so that the many
+    requests failing together after a provider blip do not retry in lockstep.
+    ``max_total_time`` caps the time spent on a request, retries included.
+
+    Subclass it and override :meth:`classify` (or :meth:`retry_after`) to
+    support the errors of other providers.
+    """
+
+    TRANSIENT = "transient"
+    RATE_LIMITED = "rate_limited"
+    PERMANENT = "permanent"
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        backoff_factor: float = 2.0,
+        max_total_time: Optional[float] = None,
+        jitter: bool = True,
+    ):
+        """
+        Args:
+            max_retries: Maximum number of retries.
+            base_delay: Initial (and minimum) delay between retries in seconds.
+            max_delay: Maximum delay between retries in seconds, unless the
+                provider hints a longer one.
+            backoff_factor: Multiplier of the delay after each failure, when
+                jitter is disabled.
+            max_total_time: Maximum seconds spent on a request, retries
+                included (None: unbounded).
+            jitter: Use decorrelated jitter rather than a deterministic
+                exponential backoff.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.backoff_factor = backoff_factor
+        self.max_total_time = max_total_time
+        self.jitter = jitter
+
+    def classify(self, error: BaseException) -> str:
+        """
+        Returns the kind of the error: TRANSIENT, RATE_LIMITED or PERMANENT.
+        """
+        if isinstance(
+            error, (LLMContextLimitError, ValidationError, NotImplementedError)
+        ):
+            return self.PERMANENT
+        code = _status_code(error)
+        if code is None:
+            return self.TRANSIENT
+        if code == 429:
+            return self.RATE_LIMITED
+        if 400 <= code < 500 and code not in _TRANSIENT_STATUS_CODES:
+            return self.PERMANENT
+        return self.TRANSIENT
+
+    def retry_after(self, error: BaseException) -> Optional[float]:
+        """
+        Returns the delay hinted by the provider in seconds, if any: a
+        retry_after attribute, a Retry-After header, or the RetryInfo of a
+        Google API error.
+        """
+        delay = _seconds(getattr(error, "retry_after", None))
+        if delay is not None:
+            return delay
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if headers is not None:
+            try:
+                delay = _seconds(headers.get("retry-after"))
+            except Exception:
+                delay = None
+            if delay is not None:
+                return delay
+        details = getattr(error, "details", None)
+        if isinstance(details, dict):
+            for detail in details.get("error", {}).get("details", None) or []:
+                if isinstance(detail, dict) and "retryDelay" in detail:
+                    return _seconds(detail["retryDelay"])
+        return None
+
+    def next_delay(
+        self,
+        error: BaseException,
+        retries: int,
+        previous_delay: Optional[float] = None,
+        elapsed: float = 0.0,
+    ) -> Optional[float]:
+        """
+        Returns the seconds to wait before retrying the request, or None if it
+        must not be retried.
+
+        Args:
+            error: The error of the last attempt.
+            retries: Number of retries already done.
+            previous_delay: The previous delay (None before the first retry).
+            elapsed: Seconds already spent on the request.
+        """
+        kind = self.classify(error)
+        if kind == self.PERMANENT or retries >= self.max_retries:
+            return None
+
+        if self.jitter:
+            upper = max(self.base_delay, (previous_delay or self.base_delay) * 3)
+            delay = min(self.max_delay, random.uniform(self.base_delay, upper))
+        else:
+            delay = min(self.max_delay, self.base_delay * self.backoff_factor**retries)
+
+        hint = self.retry_after(error)
+        if hint is not None:
+            delay = max(delay, hint)
+
+        if self.max_total_time is not None and elapsed + delay > self.max_total_time:
+            return None
+        return delay
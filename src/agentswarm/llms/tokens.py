@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+from ..datamodels.message import Message
+
+if TYPE_CHECKING:
+    from .llm import LLMFunction
+
+
+class TokenCounter(ABC):
+    """
+    The TokenCounter class estimates locally the number of tokens of a prompt,
+    before it is sent to the LLM.
+
+    The count of each message is computed once and memoized with the message,
+    so that counting a growing history costs only the new messages.
+    """
+
+    # Tokens added to every message for the role and the separators
+    message_overhead: int = 0
+    # (function list, count) of the last count_functions() call
+    _functions_count: Tuple[Optional[List[LLMFunction]], int] = (None, 0)
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """
+        Identifies the counting strategy (and its configuration).
+        Counts cached by a counter with a different name are recomputed.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def count_text(self, text: str) -> int:
+        """
+        Returns the estimated number of tokens of the given text.
+        """
+        raise NotImplementedError
+
+    def count_message(self, message: Message) -> int:
+        """
+        Returns the estimated number of tokens of the given message.
+        """
+        count = message._memo("_token_count", self.name)
+        if count is None:
+            count = message._memoize(
+                "_token_count",
+                self.count_text(str(message.content)) + self.message_overhead,
+                self.name,
+            )
+        return count
+
+    def count_messages(self, messages: Sequence[Message]) -> int:
+        """
+        Returns the estimated number of tokens of the given messages.
+        Message log views use the running totals kept by their log.
+        """
+        token_count = getattr(messages, "token_count", None)
+        if token_count is not None:
+            return token_count(self)
+        return sum(self.count_message(message) for message in messages)
+
+    def count_functions(self, functions: Optional[List[LLMFunction]]) -> int:
+        """
+        Returns the estimated number of tokens of the given function declarations.
+        The count of the last list is reused when the very same list is passed
+        again (the ReActAgent sends the same list object at every iteration).
+        """
+        if not functions:
+            return 0
+        last_functions, count = self._functions_count
+        if functions is last_functions:
+            return count
+        count = sum(
+            self.count_text(f"{fn.name} {fn.description} {json.dumps(fn.parameters)}")
+            for fn in functions
+        )
+        self._functions_count = (functions, count)
+        return count
+
+
+class CharTokenCounter(TokenCounter):
+    """
+    Estimates the tokens from the number of characters.
+    It is a fast approximation, good enough to bound the prompt size.
+    """
+
+    def __init__(self, chars_per_token: float = 4.0, message_overhead: int = 4):
+        self.chars_per_token = chars_per_token
+        self.message_overhead = message_overhead
+        self._name = f"chars:{chars_per_token}:{message_overhead}"
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def count_text(self, text: str) -> int:
+        return int(len(text) / self.chars_per_token) + 1
+
+
+DEFAULT_TOKEN_COUNTER = CharTokenCounter()
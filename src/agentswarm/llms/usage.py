@@ -16,3 +16,13 @@ class LLMUsage(BaseModel):
         description="The number of tokens in the candidates", default=0
     )
     total_token_count: int = Field(description="The total number of tokens", default=0)
+    cached_content_token_count: int = Field(
+        description="The number of prompt tokens read from a context cache", default=0
+    )
+
+    @property
+    def uncached_prompt_token_count(self) -> int:
+        """
+        The number of prompt tokens not served by a context cache.
+        """
+        return max(0, self.prompt_token_count - self.cached_content_token_count)
@@ -1,3 +1,3 @@
-from .tracing import Tracing, LocalTracing
+from .tracing import BufferedLocalTracing, LocalTracing, Tracing
 
-__all__ = ["Tracing", "LocalTracing"]
+__all__ = ["Tracing", "LocalTracing", "BufferedLocalTracing"]
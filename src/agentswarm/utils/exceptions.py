@@ -20,3 +20,28 @@ class LLMOutputLimitError(AgentSwarmError):
     """Exception raised when an LLM stream exceeds the maximum allowed output size."""
 
     pass
+
+
+class LLMContextLimitError(AgentSwarmError):
+    """Exception raised when a prompt exceeds the maximum input size of an LLM."""
+
+    pass
+
+
+class LLMUnavailableError(AgentSwarmError):
+    """Exception raised when no LLM backend is available to serve a request."""
+
+    pass
+
+
+class LLMBatchError(AgentSwarmError):
+    """
+    Exception raised when some requests of a batch failed. The outputs of the
+    requests that succeeded are kept in ``outputs`` (None for the failed ones),
+    and the errors in ``errors``, by request index.
+    """
+
+    def __init__(self, message: str, outputs: list, errors: dict):
+        super().__init__(message)
+        self.outputs = outputs
+        self.errors = errors
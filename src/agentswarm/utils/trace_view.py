@@ -812,6 +812,16 @@ HTML_TEMPLATE = """
              }
         }
 
+        // Agent Cancelled
+        if (data.type === 'agent_cancelled') {
+             html += `<div style="margin-bottom:10px; font-weight:bold; color:#ff9800">⏹️ Agent Cancelled: ${data.agent_id}</div>`;
+        }
+
+        // Agent Cache Hit
+        if (data.type === 'agent_cache_hit') {
+             html += `<div style="margin-bottom:10px; font-weight:bold; color:#4caf50">♻️ Cached Result: ${data.agent_id}</div>`;
+        }
+
         // Arguments (if agent)
         if (data.type === 'agent' && data.arguments) {
             html += `<div class="json-block" style="margin-bottom:20px"><div style="color:#888;margin-bottom:5px">// Arguments</div>${formatJson(data.arguments)}</div>`;
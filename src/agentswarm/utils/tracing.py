@@ -1,9 +1,15 @@
 from __future__ import annotations
-from abc import ABC, abstractmethod
-from typing import Any, TYPE_CHECKING
-from datetime import datetime
+
+import atexit
 import json
 import os
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import IO, TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 if TYPE_CHECKING:
     from ..datamodels.context import Context
@@ -27,6 +33,22 @@ class Tracing(ABC):
     def trace_agent_error(self, context: Context, agent_id: str, error: Exception):
         pass
 
+    def trace_agent_cancelled(self, context: Context, agent_id: str):
+        """
+        Called when an agent execution is cancelled before completing, e.g. when a
+        sibling tool returned the final answer of the loop.
+        Optional: the default implementation does nothing.
+        """
+        pass
+
+    def trace_agent_cache_hit(self, context: Context, agent_id: str):
+        """
+        Called when the result of an agent execution is served by the result
+        cache of the context, instead of executing the agent.
+        Optional: the default implementation does nothing.
+        """
+        pass
+
     @abstractmethod
     def to_dict(self) -> dict:
         """
@@ -71,90 +93,70 @@ class LocalTracing(Tracing):
     def __init__(self, trace_path: str = "./traces"):
         self.trace_path = trace_path
 
-    def trace_agent(self, context: Context, agent_id: str, arguments: dict):
+    def _event(self, context: Context, type: str, agent_id: str, **fields) -> dict:
+        trace_data = {
+            "timestamp": datetime.now().isoformat(),
+            "type": type,
+            "step_id": context.step_id,
+            "parent_step_id": context.parent_step_id,
+            "agent_id": agent_id,
+        }
+        trace_data.update(fields)
+        trace_data["messages"] = [message.model_dump() for message in context.messages]
+        trace_data["store"] = _get_store_snapshot(context.store)
+        trace_data["thoughts"] = context.thoughts
+        return trace_data
+
+    def _write(self, context: Context, trace_data: dict):
         os.makedirs(self.trace_path, exist_ok=True)
         with open(os.path.join(self.trace_path, f"{context.trace_id}.json"), "a") as f:
-            trace_data = {
-                "timestamp": datetime.now().isoformat(),
-                "type": "agent",
-                "step_id": context.step_id,
-                "parent_step_id": context.parent_step_id,
-                "agent_id": agent_id,
-                "arguments": arguments,
-                "messages": [message.model_dump() for message in context.messages],
-                "store": _get_store_snapshot(context.store),
-                "thoughts": context.thoughts,
-            }
             f.write(json.dumps(trace_data) + "\n")
 
+    def trace_agent(self, context: Context, agent_id: str, arguments: dict):
+        self._write(
+            context, self._event(context, "agent", agent_id, arguments=arguments)
+        )
+
     def trace_loop_step(self, context: Context, step_name: str):
-        os.makedirs(self.trace_path, exist_ok=True)
-        with open(os.path.join(self.trace_path, f"{context.trace_id}.json"), "a") as f:
-            trace_data = {
-                "timestamp": datetime.now().isoformat(),
-                "type": "loop_step",
-                "step_id": context.step_id,
-                "parent_step_id": context.parent_step_id,
-                "agent_id": step_name,  # Use agent_id field to store the step name for UI compatibility
-                "arguments": {},
-                "messages": [message.model_dump() for message in context.messages],
-                "store": _get_store_snapshot(context.store),
-                "thoughts": context.thoughts,
-            }
-            f.write(json.dumps(trace_data) + "\n")
+        # Use agent_id field to store the step name for UI compatibility
+        self._write(context, self._event(context, "loop_step", step_name, arguments={}))
 
     def trace_agent_result(self, context: Context, agent_id: str, result: Any):
-        os.makedirs(self.trace_path, exist_ok=True)
-        with open(os.path.join(self.trace_path, f"{context.trace_id}.json"), "a") as f:
-
-            serialized_result = None
-            try:
-                if hasattr(result, "model_dump"):
-                    serialized_result = result.model_dump(mode="json")
-                elif hasattr(result, "dict"):
-                    serialized_result = result.dict()
-                elif isinstance(result, list):
-                    serialized_result = []
-                    for item in result:
-                        if hasattr(item, "model_dump"):
-                            serialized_result.append(item.model_dump(mode="json"))
-                        elif hasattr(item, "dict"):
-                            serialized_result.append(item.dict())
-                        else:
-                            serialized_result.append(str(item))
-                else:
-                    serialized_result = str(result)
-            except Exception:
+        serialized_result = None
+        try:
+            if hasattr(result, "model_dump"):
+                serialized_result = result.model_dump(mode="json")
+            elif hasattr(result, "dict"):
+                serialized_result = result.dict()
+            elif isinstance(result, list):
+                serialized_result = []
+                for item in result:
+                    if hasattr(item, "model_dump"):
+                        serialized_result.append(item.model_dump(mode="json"))
+                    elif hasattr(item, "dict"):
+                        serialized_result.append(item.dict())
+                    else:
+                        serialized_result.append(str(item))
+            else:
                 serialized_result = str(result)
+        except Exception:
+            serialized_result = str(result)
 
-            trace_data = {
-                "timestamp": datetime.now().isoformat(),
-                "type": "agent_result",
-                "step_id": context.step_id,
-                "parent_step_id": context.parent_step_id,
-                "agent_id": agent_id,
-                "result": serialized_result,
-                "messages": [message.model_dump() for message in context.messages],
-                "store": _get_store_snapshot(context.store),
-                "thoughts": context.thoughts,
-            }
-            f.write(json.dumps(trace_data) + "\n")
+        self._write(
+            context,
+            self._event(context, "agent_result", agent_id, result=serialized_result),
+        )
 
     def trace_agent_error(self, context: Context, agent_id: str, error: Exception):
-        os.makedirs(self.trace_path, exist_ok=True)
-        with open(os.path.join(self.trace_path, f"{context.trace_id}.json"), "a") as f:
-            trace_data = {
-                "timestamp": datetime.now().isoformat(),
-                "type": "agent_error",
-                "step_id": context.step_id,
-                "parent_step_id": context.parent_step_id,
-                "agent_id": agent_id,
-                "error": str(error),
-                "messages": [message.model_dump() for message in context.messages],
-                "store": _get_store_snapshot(context.store),
-                "thoughts": context.thoughts,
-            }
-            f.write(json.dumps(trace_data) + "\n")
+        self._write(
+            context, self._event(context, "agent_error", agent_id, error=str(error))
+        )
+
+    def trace_agent_cancelled(self, context: Context, agent_id: str):
+        self._write(context, self._event(context, "agent_cancelled", agent_id))
+
+    def trace_agent_cache_hit(self, context: Context, agent_id: str):
+        self._write(context, self._event(context, "agent_cache_hit", agent_id))
 
     def to_dict(self) -> dict:
         from .exceptions import RemoteExecutionNotSupportedError
@@ -170,3 +172,171 @@ class LocalTracing(Tracing):
         raise RemoteExecutionNotSupportedError(
             "LocalTracing cannot be recreated from remote configuration."
         )
+
+
+# Stops the writer thread of a BufferedLocalTracing
+_STOP = object()
+
+
+class BufferedLocalTracing(LocalTracing):
+    """
+    A LocalTracing that writes the events from a background thread, instead of
+    opening, writing and closing the trace file on the event loop at every
+    event.
+
+    The events are serialized by the caller (the context keeps changing) and
+    put in a bounded queue. The writer thread appends them in batches, keeping
+    the files of the recent traces open. When the queue is full, the events are
+    dropped rather than blocking the execution, and counted in dropped_events.
+
+    Call flush() to wait until the queued events are written (e.g. before
+    reading a trace), and close() to stop the writer: it is also called at
+    the exit of the process.
+    """
+
+    def __init__(
+        self,
+        trace_path: str = "./traces",
+        max_queue_size: int = 10000,
+        batch_size: int = 512,
+        fsync_interval: Optional[float] = None,
+        max_open_files: int = 64,
+    ):
+        """
+        Args:
+            trace_path: Directory of the trace files.
+            max_queue_size: Maximum number of events waiting to be written.
+            batch_size: Maximum number of events written at once.
+            fsync_interval: Seconds between the fsyncs of the written files
+                (0: after every batch, None: left to the operating system).
+            max_open_files: Maximum number of trace files kept open.
+        """
+        super().__init__(trace_path)
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.max_open_files = max_open_files
+        self.dropped_events = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._files: OrderedDict[str, IO] = OrderedDict()
+        self._unsynced: set = set()
+        self._last_fsync = time.monotonic()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="agentswarm-tracing", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _write(self, context: Context, trace_data: dict):
+        line = json.dumps(trace_data) + "\n"
+        if self._closed:
+            # Late events (e.g. at shutdown) are written synchronously
+            super()._write(context, trace_data)
+            return
+        try:
+            self._queue.put_nowait((context.trace_id, line))
+        except queue.Full:
+            with self._lock:
+                self.dropped_events += 1
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until the events queued so far are written to the files.
+        Returns False if the timeout expired first.
+        """
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        """
+        Writes the queued events, closes the files and stops the writer thread.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        atexit.unregister(self.close)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            events = [item for item in batch if isinstance(item, tuple)]
+            try:
+                self._write_batch(events)
+            except Exception as e:
+                # A failing disk must not stop the writer
+                print(f"Error writing {len(events)} trace events: {e}")
+
+            stop = False
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+                elif item is _STOP:
+                    stop = True
+            if stop:
+                self._close_files()
+                return
+
+    def _write_batch(self, events: List[Tuple[str, str]]):
+        lines: Dict[str, List[str]] = {}
+        for trace_id, line in events:
+            lines.setdefault(trace_id, []).append(line)
+        for trace_id, trace_lines in lines.items():
+            f = self._file(trace_id)
+            f.write("".join(trace_lines))
+            # Readers (e.g. the trace viewer) see the events of the batch
+            f.flush()
+            self._unsynced.add(trace_id)
+
+        if self.fsync_interval is not None and (
+            time.monotonic() - self._last_fsync >= self.fsync_interval
+        ):
+            self._fsync()
+
+    def _file(self, trace_id: str) -> IO:
+        f = self._files.get(trace_id)
+        if f is not None:
+            self._files.move_to_end(trace_id)
+            return f
+        os.makedirs(self.trace_path, exist_ok=True)
+        f = open(os.path.join(self.trace_path, f"{trace_id}.json"), "a")
+        self._files[trace_id] = f
+        while len(self._files) > self.max_open_files:
+            evicted, evicted_file = self._files.popitem(last=False)
+            self._close_file(evicted, evicted_file)
+        return f
+
+    def _fsync(self):
+        for trace_id in self._unsynced:
+            f = self._files.get(trace_id)
+            if f is not None:
+                os.fsync(f.fileno())
+        self._unsynced.clear()
+        self._last_fsync = time.monotonic()
+
+    def _close_file(self, trace_id: str, f: IO):
+        if self.fsync_interval is not None and trace_id in self._unsynced:
+            f.flush()
+            os.fsync(f.fileno())
+            self._unsynced.discard(trace_id)
+        f.close()
+
+    def _close_files(self):
+        while self._files:
+            trace_id, f = self._files.popitem(last=False)
+            try:
+                self._close_file(trace_id, f)
+            except Exception as e:
+                print(f"Error closing the trace file of {trace_id}: {e}")
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from typing import List
 from pydantic import BaseModel, Field
@@ -91,3 +92,110 @@ async def test_remote_agent_merge():
     result = await agent.execute("u1", context, MockInput(text="test"))
     assert result.value == "Remote Result"
     # Even if remote didn't add anything, merge should have been called
+
+
+@pytest.mark.asyncio
+async def test_transformer_agent_chunks_with_batch():
+    from agentswarm.agents import TransformerAgent
+    from agentswarm.agents.transformer_agent import TransformerAgentInput
+    from agentswarm.llms import LLM, LLMOutput, LLMUsage
+
+    class BatchLLM(LLM):
+        def __init__(self):
+            self.batches = []
+
+        async def generate(
+            self, messages, functions=None, feedback=None, temperature=0.0
+        ):
+            return LLMOutput(
+                text=messages[0].content.upper().strip(),
+                function_calls=[],
+                usage=LLMUsage(model="mock", total_token_count=1),
+            )
+
+        async def generate_batch(
+            self,
+            requests,
+            functions=None,
+            temperature=0.0,
+            max_concurrency=8,
+            slot=None,
+        ):
+            self.batches.append(len(requests))
+            return await super().generate_batch(
+                requests, functions, temperature, max_concurrency, slot
+            )
+
+    llm = BatchLLM()
+    store = LocalStore()
+    store.set("data", "alpha\nbeta\ngamma\n")
+    context = Context(
+        trace_id="t", messages=[], store=store, tracing=None, default_llm=llm
+    )
+
+    result = await TransformerAgent(chunk_chars=12).execute(
+        "user", context, TransformerAgentInput(key="data", cmd="uppercase")
+    )
+
+    assert llm.batches == [2]
+    assert store.get(result.key) == "ALPHA\nBETA\nGAMMA"
+    assert len(context.usage) == 2
+
+    # Short values are transformed with a single request
+    store.set("short", "delta")
+    result = await TransformerAgent(chunk_chars=12).execute(
+        "user", context, TransformerAgentInput(key="short", cmd="uppercase")
+    )
+    assert llm.batches == [2]
+    assert store.get(result.key) == "DELTA"
+
+
+@pytest.mark.asyncio
+async def test_transformer_agent_holds_one_slot_per_chunk():
+    from agentswarm.agents import TransformerAgent
+    from agentswarm.agents.transformer_agent import TransformerAgentInput
+    from agentswarm.datamodels import Scheduler
+    from agentswarm.llms import LLM, LLMOutput, LLMUsage
+
+    scheduler = Scheduler(max_llm_requests=2)
+    peak = 0
+
+    class SlowLLM(LLM):
+        async def generate(
+            self, messages, functions=None, feedback=None, temperature=0.0
+        ):
+            nonlocal peak
+            peak = max(peak, scheduler.in_flight(Scheduler.LLM))
+            await asyncio.sleep(0.01)
+            return LLMOutput(
+                text=messages[0].content.strip(),
+                function_calls=[],
+                usage=LLMUsage(model="mock", total_token_count=1),
+            )
+
+    store = LocalStore()
+    store.set("data", "alpha\nbeta\ngamma\ndelta\n")
+    context = Context(
+        trace_id="t",
+        messages=[],
+        store=store,
+        tracing=None,
+        default_llm=SlowLLM(),
+        scheduler=scheduler,
+    )
+
+    await TransformerAgent(chunk_chars=6, max_concurrent_chunks=4).execute(
+        "user", context, TransformerAgentInput(key="data", cmd="noop")
+    )
+
+    # The chunks are gated by the scheduler, not by a single slot for the batch
+    assert peak == 2
+    assert scheduler.in_flight(Scheduler.LLM) == 0
+
+
+def test_transformer_split():
+    from agentswarm.agents.transformer_agent import _split
+
+    assert _split("aa\nbb\ncc\n", 6) == ["aa\nbb\n", "cc\n"]
+    assert _split("abcdefgh", 3) == ["abc", "def", "gh"]
+    assert "".join(_split("x\n" * 50 + "y" * 30, 7)) == "x\n" * 50 + "y" * 30
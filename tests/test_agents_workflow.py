@@ -170,3 +170,478 @@ async def test_recursive_react_limit():
     # Even if it failed, usage should have been recorded up to the point of failure
     # 2 iterations * (LLM + Producer) = 4 usage entries
     assert len(context.usage) == 4
+
+
+def test_function_calls_are_compiled_once():
+    """Verify that the tool declarations are cached across iterations."""
+    agent = OrchestratorAgent(MockLLM(responses=["done"]))
+
+    first = agent.generate_function_calls("user")
+    second = agent.generate_function_calls("user")
+    assert first is second
+    assert [f.name for f in first] == ["producer", "consumer"]
+
+    # Different users get their own declarations
+    assert agent.generate_function_calls("other-user") is not first
+
+    agent.invalidate_tools("user")
+    assert agent.generate_function_calls("user") is not first
+
+
+@pytest.mark.asyncio
+async def test_dispatch_reuses_iteration_tools():
+    """Verify that function calls are dispatched without rebuilding the agent list."""
+
+    class CountingOrchestrator(OrchestratorAgent):
+        def __init__(self, mock_llm: MockLLM):
+            super().__init__(mock_llm)
+            self.available_agents_calls = 0
+            self.agents = [DataProducerAgent(), DataConsumerAgent()]
+
+        def available_agents(self, user_id: str) -> List[BaseAgent]:
+            self.available_agents_calls += 1
+            return self.agents
+
+    mock_llm = MockLLM(
+        responses=["CALL: producer({})", "CALL: consumer({})", "Finishing now."]
+    )
+    agent = CountingOrchestrator(mock_llm)
+    context = Context(
+        trace_id="t-dispatch", messages=[], store=LocalStore(), tracing=DummyTracing()
+    )
+
+    await agent.execute("user", context)
+
+    # One lookup per iteration, none per dispatched function call
+    assert agent.available_agents_calls == 3
+
+
+@pytest.mark.asyncio
+async def test_dispatch_uses_current_agent_instances():
+    """Verify that cached declarations do not pin stale agent instances."""
+
+    class RecreatingOrchestrator(OrchestratorAgent):
+        def __init__(self, mock_llm: MockLLM):
+            super().__init__(mock_llm)
+            self.created = []
+
+        def available_agents(self, user_id: str) -> List[BaseAgent]:
+            # e.g. MCP agents recreated after a reconnection
+            agent = DataProducerAgent()
+            self.created.append(agent)
+            return [agent]
+
+    executed = []
+    original = DataProducerAgent.execute
+
+    async def tracking_execute(self, user_id, context, input=None):
+        executed.append(self)
+        return await original(self, user_id, context, input)
+
+    mock_llm = MockLLM(
+        responses=["CALL: producer({})", "CALL: producer({})", "Finishing now."]
+    )
+    agent = RecreatingOrchestrator(mock_llm)
+    context = Context(
+        trace_id="t-fresh", messages=[], store=LocalStore(), tracing=DummyTracing()
+    )
+
+    DataProducerAgent.execute = tracking_execute
+    try:
+        await agent.execute("user", context)
+    finally:
+        DataProducerAgent.execute = original
+
+    assert executed == agent.created[:2]
+
+
+@pytest.mark.asyncio
+async def test_baseline_hook_overrides_still_work():
+    """Verify that overrides with the original hook signatures are honoured."""
+
+    class CustomOrchestrator(OrchestratorAgent):
+        def __init__(self, mock_llm: MockLLM):
+            super().__init__(mock_llm)
+            self.handled = []
+            self.executed = []
+
+        def generate_function_calls(self, user_id: str) -> List[LLMFunction]:
+            return [
+                f
+                for f in super().generate_function_calls(user_id)
+                if f.name == "producer"
+            ]
+
+        async def agent_execution(self, user_id, context, function):
+            self.executed.append(function.name)
+            return await super().agent_execution(user_id, context, function)
+
+        async def execute_and_handle_result(
+            self, user_id, iter_context, function_call, context
+        ):
+            self.handled.append(function_call.name)
+            return await super().execute_and_handle_result(
+                user_id, iter_context, function_call, context
+            )
+
+    class RecordingLLM(MockLLM):
+        async def generate(self, messages, functions=None, feedback=None):
+            self.functions = functions
+            return await super().generate(messages, functions, feedback)
+
+    mock_llm = RecordingLLM(responses=["CALL: producer({})", "Finishing now."])
+    agent = CustomOrchestrator(mock_llm)
+    context = Context(
+        trace_id="t-hooks", messages=[], store=LocalStore(), tracing=DummyTracing()
+    )
+
+    result = await agent.execute("user", context)
+
+    assert result[0].content == "Finishing now."
+    assert [f.name for f in mock_llm.functions] == ["producer"]
+    assert agent.handled == ["producer"]
+    assert agent.executed == ["producer"]
+
+
+def test_map_reduce_reuses_sub_agent():
+    from agentswarm.agents import MapReduceAgent
+
+    agent = MapReduceAgent(agents=[DataProducerAgent()])
+    first = agent.available_agents("user")
+    second = agent.available_agents("user")
+    assert first[0] is second[0]
+    assert first[0] is not agent
+
+
+@pytest.mark.asyncio
+async def test_stream_tool_calls_dispatches_before_generation_ends():
+    """Verify that streamed function calls start while the LLM is still generating."""
+    from agentswarm.datamodels.feedback import Feedback
+    from agentswarm.llms.llm import FUNCTION_CALL_FEEDBACK_SOURCE
+
+    events = []
+
+    class StreamingToolLLM(LLM):
+        def __init__(self):
+            self.call_count = 0
+
+        async def generate(
+            self, messages, functions=None, feedback=None, temperature=0.0
+        ):
+            self.call_count += 1
+            usage = LLMUsage(model="mock-stream", total_token_count=1)
+            if self.call_count > 1:
+                return LLMOutput(text="Finishing now.", function_calls=[], usage=usage)
+            call = LLMFunctionExecution(name="producer", arguments={})
+            feedback.push(Feedback(source=FUNCTION_CALL_FEEDBACK_SOURCE, payload=call))
+            await asyncio.sleep(0.05)
+            events.append("generation-end")
+            return LLMOutput(text="", function_calls=[call], usage=usage)
+
+    class RecordingProducer(DataProducerAgent):
+        async def execute(self, user_id, context, input=None) -> StrResponse:
+            events.append("producer")
+            return await super().execute(user_id, context, input)
+
+    class StreamingOrchestrator(OrchestratorAgent):
+        def available_agents(self, user_id: str) -> List[BaseAgent]:
+            return [RecordingProducer()]
+
+    agent = StreamingOrchestrator(StreamingToolLLM())
+    agent.stream_tool_calls = True
+    context = Context(
+        trace_id="t-stream", messages=[], store=LocalStore(), tracing=DummyTracing()
+    )
+
+    result = await agent.execute("user", context)
+
+    assert "Finishing" in result[0].content
+    # The tool ran once, before the end of the generation
+    assert events == ["producer", "generation-end"]
+
+
+@pytest.mark.asyncio
+async def test_completion_cancels_sibling_tools():
+    """Verify that a CompletionResponse cancels the other tools of the iteration."""
+    from agentswarm.datamodels import CompletionResponse
+
+    class TwoToolsLLM(LLM):
+        async def generate(
+            self, messages, functions=None, feedback=None, temperature=0.0
+        ):
+            return LLMOutput(
+                text="",
+                function_calls=[
+                    LLMFunctionExecution(name="slow", arguments={}),
+                    LLMFunctionExecution(name="finisher", arguments={}),
+                ],
+                usage=LLMUsage(model="mock", total_token_count=1),
+            )
+
+    class SlowAgent(BaseAgent[dict, StrResponse]):
+        finished = False
+
+        def id(self) -> str:
+            return "slow"
+
+        def description(self, user_id: str) -> str:
+            return "Slow"
+
+        async def execute(self, user_id, context, input=None) -> StrResponse:
+            await asyncio.sleep(10)
+            SlowAgent.finished = True
+            return StrResponse(value="late")
+
+    class FinisherAgent(BaseAgent[dict, CompletionResponse]):
+        def id(self) -> str:
+            return "finisher"
+
+        def description(self, user_id: str) -> str:
+            return "Finisher"
+
+        async def execute(self, user_id, context, input=None) -> CompletionResponse:
+            return CompletionResponse(value="final answer")
+
+    class CancelTracing(DummyTracing):
+        def __init__(self):
+            self.cancelled = []
+
+        def trace_agent_cancelled(self, context, agent_id):
+            self.cancelled.append(agent_id)
+
+    class CompletingOrchestrator(OrchestratorAgent):
+        def available_agents(self, user_id: str) -> List[BaseAgent]:
+            return [SlowAgent(), FinisherAgent()]
+
+    tracing = CancelTracing()
+    agent = CompletingOrchestrator(TwoToolsLLM())
+    context = Context(
+        trace_id="t-cancel", messages=[], store=LocalStore(), tracing=tracing
+    )
+
+    result = await asyncio.wait_for(agent.execute("user", context), timeout=2)
+
+    assert result[0].type == "completion"
+    assert result[0].content == "final answer"
+    assert not SlowAgent.finished
+    assert tracing.cancelled == ["slow"]
+
+
+@pytest.mark.asyncio
+async def test_deadline_returns_best_effort_answer():
+    """Verify that slow tools are cut at the deadline and a best-effort answer is returned."""
+    import time
+
+    class DeadlineLLM(LLM):
+        def __init__(self):
+            self.prompts = []
+
+        async def generate(
+            self, messages, functions=None, feedback=None, temperature=0.0
+        ):
+            self.prompts.append((list(messages), functions))
+            usage = LLMUsage(model="mock", total_token_count=1)
+            if functions:
+                call = LLMFunctionExecution(name="slow", arguments={})
+                return LLMOutput(text="", function_calls=[call], usage=usage)
+            return LLMOutput(text="partial answer", function_calls=[], usage=usage)
+
+    class SlowAgent(BaseAgent[dict, StrResponse]):
+        def id(self) -> str:
+            return "slow"
+
+        def description(self, user_id: str) -> str:
+            return "Slow"
+
+        async def execute(self, user_id, context, input=None) -> StrResponse:
+            await asyncio.sleep(10)
+            return StrResponse(value="late")
+
+    class DeadlineOrchestrator(OrchestratorAgent):
+        def available_agents(self, user_id: str) -> List[BaseAgent]:
+            return [SlowAgent()]
+
+    llm = DeadlineLLM()
+    agent = DeadlineOrchestrator(llm)
+    agent.deadline_reserve = 0.2
+    context = Context(
+        trace_id="t-deadline",
+        messages=[Message(type="user", content="Start")],
+        store=LocalStore(),
+        tracing=DummyTracing(),
+        deadline=time.monotonic() + 0.4,
+    )
+
+    result = await asyncio.wait_for(agent.execute("user", context), timeout=2)
+
+    assert result == [Message(type="assistant", content="partial answer")]
+    # The best-effort answer is generated without tools, knowing the tool was cut
+    messages, functions = llm.prompts[-1]
+    assert functions is None
+    assert any("slow was cancelled" in str(m.content) for m in messages)
+
+
+@pytest.mark.asyncio
+async def test_execute_stream_yields_events():
+    from agentswarm.agents.react_events import (
+        FinalAnswerEvent,
+        IterationStartEvent,
+        TextDeltaEvent,
+        ToolCallEvent,
+        ToolResultEvent,
+        UsageEvent,
+    )
+    from agentswarm.datamodels.feedback import Feedback
+
+    class StreamingLLM(MockLLM):
+        async def generate(self, messages, functions=None, feedback=None):
+            output = await super().generate(messages, functions)
+            if feedback is not None and not output.function_calls:
+                for word in output.text.split(" "):
+                    feedback.push(Feedback(source="llm", payload=word + " "))
+            return output
+
+    agent = OrchestratorAgent(
+        StreamingLLM(responses=["CALL: producer({})", "All done"])
+    )
+    context = Context(
+        trace_id=str(uuid.uuid4()),
+        messages=[Message(type="user", content="Start")],
+        store=LocalStore(),
+        tracing=DummyTracing(),
+    )
+
+    events = [event async for event in agent.execute_stream("test-user", context)]
+
+    assert [type(event) for event in events] == [
+        IterationStartEvent,
+        UsageEvent,
+        ToolCallEvent,
+        ToolResultEvent,
+        IterationStartEvent,
+        TextDeltaEvent,
+        TextDeltaEvent,
+        UsageEvent,
+        FinalAnswerEvent,
+    ]
+    assert events[2].function_call.name == "producer"
+    assert "producer executed" in events[3].message.content
+    assert "".join(event.text for event in events[5:7]) == "All done "
+    assert events[-1].messages[0].content == "All done"
+
+
+@pytest.mark.asyncio
+async def test_execute_stream_emits_thoughts_from_overridden_hook():
+    """
+    Verify that thoughts are emitted through an execute_and_handle_result()
+    override with the original signature, even when the function call is
+    streamed by a task that does not belong to the execution.
+    """
+    from agentswarm.agents.react_events import ThoughtEvent
+    from agentswarm.datamodels import ThoughtResponse
+    from agentswarm.datamodels.feedback import Feedback
+    from agentswarm.llms.llm import FUNCTION_CALL_FEEDBACK_SOURCE
+
+    class ThinkAgent(BaseAgent[dict, ThoughtResponse]):
+        def id(self) -> str:
+            return "think"
+
+        def description(self, user_id: str) -> str:
+            return "Thinks"
+
+        async def execute(self, user_id, context, input=None) -> ThoughtResponse:
+            return ThoughtResponse(thought="the plan")
+
+    class WorkerLLM(MockLLM):
+        """Streams the function calls from a worker started before the run."""
+
+        def __init__(self, responses):
+            super().__init__(responses)
+            self.requests = asyncio.Queue()
+            self.worker = asyncio.ensure_future(self._work())
+
+        async def _work(self):
+            while True:
+                output, feedback, done = await self.requests.get()
+                for function_call in output.function_calls:
+                    feedback.push(
+                        Feedback(
+                            source=FUNCTION_CALL_FEEDBACK_SOURCE, payload=function_call
+                        )
+                    )
+                done.set_result(output)
+
+        async def generate(self, messages, functions=None, feedback=None):
+            output = await super().generate(messages, functions)
+            done = asyncio.get_event_loop().create_future()
+            self.requests.put_nowait((output, feedback, done))
+            return await done
+
+    class ThinkingOrchestrator(OrchestratorAgent):
+        def available_agents(self, user_id: str) -> List[BaseAgent]:
+            return [ThinkAgent()]
+
+        async def execute_and_handle_result(
+            self, user_id, iter_context, function_call, context
+        ):
+            return await super().execute_and_handle_result(
+                user_id, iter_context, function_call, context
+            )
+
+    llm = WorkerLLM(responses=["CALL: think({})", "All done"])
+    agent = ThinkingOrchestrator(llm)
+    agent.stream_tool_calls = True
+    context = Context(
+        trace_id=str(uuid.uuid4()),
+        messages=[Message(type="user", content="Start")],
+        store=LocalStore(),
+        tracing=DummyTracing(),
+    )
+
+    try:
+        events = [event async for event in agent.execute_stream("test-user", context)]
+    finally:
+        llm.worker.cancel()
+
+    thoughts = [event for event in events if isinstance(event, ThoughtEvent)]
+    assert [event.thought for event in thoughts] == ["the plan"]
+
+
+@pytest.mark.asyncio
+async def test_execute_leaves_messages_comparable():
+    """Verify that the memos of an execution do not change message equality."""
+
+    class LimitedLLM(MockLLM):
+        max_input_tokens = 100000
+
+    agent = OrchestratorAgent(LimitedLLM(responses=["CALL: producer({})", "Done."]))
+    context = Context(
+        trace_id="t-eq",
+        messages=[Message(type="user", content="Start")],
+        store=LocalStore(),
+        tracing=DummyTracing(),
+    )
+
+    await agent.execute("user", context)
+
+    assert context.messages[0] == Message(type="user", content="Start")
+
+
+@pytest.mark.asyncio
+async def test_gather_with_concurrency_is_deprecated():
+    agent = OrchestratorAgent(MockLLM([]))
+    running = 0
+    peak = 0
+
+    async def task(value):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0)
+        running -= 1
+        return value
+
+    with pytest.warns(DeprecationWarning):
+        results = await agent.gather_with_concurrency(2, *(task(i) for i in range(5)))
+    assert results == [0, 1, 2, 3, 4]
+    assert peak == 2
@@ -0,0 +1,173 @@
+import asyncio
+from typing import List
+
+import pytest
+
+from agentswarm.datamodels import Message
+from agentswarm.datamodels.feedback import Feedback, FeedbackSystem
+from agentswarm.llms import LLM, CachedLLM, LLMOutput, LLMUsage
+
+
+class CountingLLM(LLM):
+    model = "mock-model"
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.call_count = 0
+
+    async def generate(self, messages, functions=None, feedback=None, temperature=0.0):
+        self.call_count += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ValueError("boom")
+        return LLMOutput(
+            text=f"answer to {messages[-1].content}",
+            function_calls=[],
+            usage=LLMUsage(model=self.model, total_token_count=100),
+        )
+
+
+class ListFeedback(FeedbackSystem):
+    def __init__(self):
+        self.events: List[Feedback] = []
+
+    def push(self, feedback: Feedback):
+        self.events.append(feedback)
+
+    def subscribe(self, callback):
+        pass
+
+    def to_dict(self):
+        return {}
+
+    @classmethod
+    def recreate(cls, config):
+        return cls()
+
+
+def _messages(content: str) -> List[Message]:
+    return [Message(type="user", content=content)]
+
+
+@pytest.mark.asyncio
+async def test_responses_are_cached():
+    inner = CountingLLM()
+    llm = CachedLLM(inner)
+
+    first = await llm.generate(_messages("a"))
+    feedback = ListFeedback()
+    second = await llm.generate(_messages("a"), feedback=feedback)
+    await llm.generate(_messages("a"), temperature=0.5)
+    await llm.generate(_messages("b"))
+
+    assert inner.call_count == 3
+    assert second.text == first.text
+    # A hit costs no tokens, and is replayed on the feedback system
+    assert first.usage.total_token_count == 100
+    assert second.usage.total_token_count == 0
+    assert [e.payload for e in feedback.events] == ["answer to a"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_coalesced():
+    inner = CountingLLM(delay=0.05)
+    llm = CachedLLM(inner)
+
+    outputs = await asyncio.gather(*(llm.generate(_messages("a")) for _ in range(5)))
+
+    assert inner.call_count == 1
+    assert {o.text for o in outputs} == {"answer to a"}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_request():
+    inner = CountingLLM(delay=0.05)
+    llm = CachedLLM(inner)
+
+    first = asyncio.ensure_future(llm.generate(_messages("a")))
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(llm.generate(_messages("a")))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert (await second).text == "answer to a"
+    assert inner.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_are_not_cached():
+    inner = CountingLLM(fail=True)
+    llm = CachedLLM(inner)
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            await llm.generate(_messages("a"))
+    assert inner.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_persistent_tier(tmp_path):
+    path = str(tmp_path / "cache.db")
+    inner = CountingLLM()
+    await CachedLLM(inner, path=path).generate(_messages("a"))
+
+    # A new instance (e.g. a new process) reads the response back from disk
+    output = await CachedLLM(inner, path=path).generate(_messages("a"))
+    assert output.text == "answer to a"
+    assert inner.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_coalesced_stream_is_fanned_out():
+    class StreamingLLM(CountingLLM):
+        async def generate(
+            self, messages, functions=None, feedback=None, temperature=0.0
+        ):
+            self.call_count += 1
+            for chunk in ["one ", "two ", "three"]:
+                feedback.push(Feedback(source="llm", payload=chunk))
+                await asyncio.sleep(0.02)
+            return LLMOutput(
+                text="one two three",
+                function_calls=[],
+                usage=LLMUsage(model=self.model, total_token_count=100),
+            )
+
+    inner = StreamingLLM()
+    llm = CachedLLM(inner)
+    first_feedback, second_feedback = ListFeedback(), ListFeedback()
+
+    first = asyncio.ensure_future(llm.generate(_messages("a"), feedback=first_feedback))
+    await asyncio.sleep(0.01)
+    second = asyncio.ensure_future(
+        llm.generate(_messages("a"), feedback=second_feedback)
+    )
+    await asyncio.sleep(0.02)
+    # The first caller stops receiving the stream once cancelled
+    first.cancel()
+
+    assert (await second).usage.total_token_count == 0
+    assert inner.call_count == 1
+    # The late caller got the chunks streamed before it joined, then the others
+    assert [e.payload for e in second_feedback.events] == ["one ", "two ", "three"]
+    assert [e.payload for e in first_feedback.events] == ["one ", "two "]
+
+
+@pytest.mark.asyncio
+async def test_request_after_cancellation_starts_a_new_call():
+    inner = CountingLLM(delay=0.05)
+    llm = CachedLLM(inner)
+
+    first = asyncio.ensure_future(llm.generate(_messages("a")))
+    await asyncio.sleep(0)
+    first.cancel()
+    # Let the only caller cancel the shared call, without letting the call
+    # complete its cancellation
+    await asyncio.sleep(0)
+    assert first.cancelled()
+
+    # An identical request arriving meanwhile is not cancelled with it
+    second = await llm.generate(_messages("a"))
+    assert second.text == "answer to a"
+    assert inner.call_count == 2
@@ -0,0 +1,96 @@
+from agentswarm.agents import TokenBudgetCompactor
+from agentswarm.datamodels import Context, LocalStore, Message
+
+
+def _context() -> Context:
+    return Context(trace_id="t1", messages=[], store=LocalStore(), tracing=None)
+
+
+def test_compaction_is_noop_within_budget():
+    messages = [
+        Message(type="system", content="sys"),
+        Message(type="user", content="Agent a executed successfully."),
+        Message(type="user", content="Agent a executed successfully."),
+    ]
+    compactor = TokenBudgetCompactor(max_tokens=1000)
+    # The history is returned as is, without a copy
+    assert compactor.compact(messages, 1, _context()) is messages
+
+
+def test_compaction_pins_dedupes_and_stores_long_results():
+    context = _context()
+    big_result = "x" * 5000
+    messages = [
+        Message(type="system", content="sys"),
+        Message(type="user", content="Agent a executed successfully."),
+        Message(type="user", content=big_result),
+        Message(type="user", content="Agent a executed successfully."),
+        Message(type="user", content="recent"),
+    ]
+    compactor = TokenBudgetCompactor(
+        max_tokens=200, keep_recent=1, max_message_chars=100, preview_chars=10
+    )
+
+    compacted = compactor.compact(messages, 1, context)
+
+    assert compacted[0].content == "sys"
+    assert compacted[-1].content == "recent"
+    assert [m.content for m in compacted].count("Agent a executed successfully.") == 1
+    # The large result was moved to the store, and can be read back
+    collapsed = next(m for m in compacted if "truncated" in str(m.content))
+    key = collapsed.content.split("with key ")[-1].rstrip("]")
+    assert context.store.get(key) == big_result
+
+    # Compacting again reuses the stored content
+    compactor.compact(messages, 1, context)
+    assert len(context.store) == 1
+
+
+def test_compaction_drops_oldest_messages():
+    messages = [Message(type="system", content="sys")] + [
+        Message(type="user", content=f"result {i} " + "y" * 40) for i in range(20)
+    ]
+    compactor = TokenBudgetCompactor(max_tokens=60, keep_recent=2)
+
+    compacted = compactor.compact(messages, 1, _context())
+
+    assert compacted[0].content == "sys"
+    assert "omitted" in compacted[1].content
+    assert compacted[-1].content == messages[-1].content
+    assert len(compacted) < len(messages)
+
+
+def test_compaction_memo_follows_the_content():
+    context = _context()
+    message = Message(type="user", content="x" * 5000)
+    compactor = TokenBudgetCompactor(max_message_chars=100, preview_chars=10)
+
+    first = compactor._collapse(message, context)
+    assert compactor._collapse(message, context) is first
+    assert first.content.startswith("xxxxxxxxxx...")
+
+    # A copy with another content is collapsed from its own content
+    copy = message.model_copy(update={"content": "y" * 5000})
+    assert compactor._collapse(copy, context).content.startswith("yyyyyyyyyy...")
+    # The memos are not copied, and do not take part in the equality
+    assert message.model_copy() == Message(type="user", content="x" * 5000)
+
+    # So is a message whose content was replaced in place
+    message.content = "z" * 5000
+    assert compactor._collapse(message, context).content.startswith("zzzzzzzzzz...")
+    assert len(context.store) == 3
+
+
+def test_compaction_does_not_change_message_equality():
+    messages = [Message(type="system", content="sys")] + [
+        Message(type="user", content=f"result {i} " + "y" * 400) for i in range(5)
+    ]
+    compactor = TokenBudgetCompactor(
+        max_tokens=60, keep_recent=1, max_message_chars=100, preview_chars=10
+    )
+
+    compactor.compact(messages, 1, _context())
+
+    assert messages == [Message(type="system", content="sys")] + [
+        Message(type="user", content=f"result {i} " + "y" * 400) for i in range(5)
+    ]
@@ -118,3 +118,57 @@ def test_context_serialization():
     assert ctx2.messages[0].content == "hello"
     assert len(ctx2.usage) == 1
     assert ctx2.usage[0].total_token_count == 100
+
+
+def test_message_log_snapshots_are_shared_views():
+    """Verify that snapshots are fixed-length views over the same log."""
+    from agentswarm.datamodels import MessageLog
+
+    log = MessageLog([Message(type="system", content="sys")])
+    first = log.snapshot()
+
+    log.extend([Message(type="user", content="a"), Message(type="user", content="b")])
+    second = log.snapshot()
+
+    # Earlier snapshots do not see the appended messages
+    assert len(first) == 1
+    assert [m.content for m in first] == ["sys"]
+    assert [m.content for m in second] == ["sys", "a", "b"]
+    assert second[-1].content == "b"
+    assert [m.content for m in second[1:]] == ["a", "b"]
+    with pytest.raises(IndexError):
+        first[1]
+
+    # The views can be used in place of a list of messages
+    ctx = Context(trace_id="t1", messages=[], store=MockStore(), tracing=None)
+    iter_ctx = ctx.copy_for_iteration("step-1", second)
+    assert iter_ctx.messages is second
+    assert len(iter_ctx.to_dict()["messages"]) == 3
+
+
+def test_context_deadline_propagation():
+    """Verify that the deadline is shared by the copies and sent as a remaining time."""
+    import time
+
+    ctx = Context(
+        trace_id="t1",
+        messages=[],
+        store=MockStore(),
+        tracing=None,
+        deadline=time.monotonic() + 30,
+    )
+    assert ctx.copy_for_execution().deadline == ctx.deadline
+    assert ctx.copy_for_iteration("step-2", []).deadline == ctx.deadline
+    assert 0 < ctx.remaining_time(reserve=10) <= 20
+    assert ctx.bound_timeout(60) <= 30
+    assert ctx.bound_timeout(1) == 1
+
+    data = ctx.to_dict()
+    assert 0 < data["remaining_time"] <= 30
+    ctx2 = Context.from_dict(data)
+    assert 0 < ctx2.remaining_time() <= 30
+
+    no_deadline = Context(trace_id="t2", messages=[], store=MockStore(), tracing=None)
+    assert no_deadline.remaining_time() is None
+    assert no_deadline.bound_timeout(5) == 5
+    assert Context.from_dict(no_deadline.to_dict()).deadline is None
@@ -0,0 +1,201 @@
+import asyncio
+
+import pytest
+
+from agentswarm.datamodels import Feedback, FeedbackSystem, Message
+from agentswarm.llms import LLM, CircuitBreaker, FailoverLLM, LLMOutput, LLMUsage
+from agentswarm.llms.llm import TEXT_FEEDBACK_SOURCE
+from agentswarm.utils.exceptions import LLMUnavailableError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class BackendLLM(LLM):
+    def __init__(self, name: str, fail: bool = False):
+        self.name = name
+        self.fail = fail
+        self.calls = 0
+
+    async def generate(self, messages, functions=None, feedback=None, temperature=0.0):
+        self.calls += 1
+        if self.fail:
+            raise TimeoutError(f"{self.name} timed out")
+        return LLMOutput(
+            text=self.name, function_calls=[], usage=LLMUsage(model=self.name)
+        )
+
+
+def test_circuit_breaker_states():
+    clock = FakeClock()
+    breaker = CircuitBreaker(
+        failure_threshold=0.5, window=4, min_requests=4, open_duration=10, clock=clock
+    )
+
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    # After the open duration, a single probe is allowed
+    clock.now = 10.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+    # A failed probe opens the circuit again
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 20.0
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+@pytest.mark.asyncio
+async def test_failover_skips_unhealthy_backends():
+    primary = BackendLLM("primary", fail=True)
+    secondary = BackendLLM("secondary")
+    llm = FailoverLLM([primary, secondary], min_requests=2, open_duration=60)
+    messages = [Message(type="user", content="hello")]
+
+    for _ in range(3):
+        output = await llm.generate(messages)
+        assert output.text == "secondary"
+
+    # The circuit of the primary opened after two failures: it is skipped
+    assert primary.calls == 2
+    assert llm.breakers[0].state == CircuitBreaker.OPEN
+    assert secondary.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_failover_errors():
+    primary = BackendLLM("primary", fail=True)
+    secondary = BackendLLM("secondary", fail=True)
+    llm = FailoverLLM([primary, secondary], min_requests=1, open_duration=60)
+    messages = [Message(type="user", content="hello")]
+
+    # The error of the last backend is raised
+    with pytest.raises(TimeoutError, match="secondary"):
+        await llm.generate(messages)
+
+    # All the circuits are open: the request fails at once
+    with pytest.raises(LLMUnavailableError):
+        await llm.generate(messages)
+    assert primary.calls == 1 and secondary.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_is_released():
+    class SlowLLM(LLM):
+        async def generate(
+            self, messages, functions=None, feedback=None, temperature=0.0
+        ):
+            await asyncio.sleep(10)
+
+    llm = FailoverLLM([SlowLLM()])
+    breaker = llm.breakers[0]
+    breaker._open()
+    breaker.open_duration = 0
+
+    task = asyncio.ensure_future(llm.generate([Message(type="user", content="hello")]))
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    # The next caller gets the probe
+    assert breaker.allow_request()
+
+
+class ListFeedback(FeedbackSystem):
+    def __init__(self):
+        self.events = []
+
+    def push(self, feedback: Feedback):
+        self.events.append(feedback)
+
+    def subscribe(self, callback):
+        pass
+
+    def to_dict(self):
+        return {}
+
+    @classmethod
+    def recreate(cls, config):
+        return cls()
+
+
+@pytest.mark.asyncio
+async def test_no_failover_after_feedback():
+    class PartialLLM(BackendLLM):
+        async def generate(
+            self, messages, functions=None, feedback=None, temperature=0.0
+        ):
+            self.calls += 1
+            if feedback is not None:
+                feedback.push(Feedback(source=TEXT_FEEDBACK_SOURCE, payload="partial"))
+            raise TimeoutError("stream aborted")
+
+    primary = PartialLLM("primary")
+    secondary = BackendLLM("secondary")
+    llm = FailoverLLM([primary, secondary])
+    feedback = ListFeedback()
+
+    # The partial output was already delivered: the error is raised instead of
+    # duplicating the output with the secondary backend
+    with pytest.raises(TimeoutError, match="stream aborted"):
+        await llm.generate([Message(type="user", content="hello")], feedback=feedback)
+    assert secondary.calls == 0
+    assert [event.payload for event in feedback.events] == ["partial"]
+
+    # Nothing was delivered without a feedback system: the request fails over
+    output = await llm.generate([Message(type="user", content="hello")])
+    assert output.text == "secondary"
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_do_not_fail_over():
+    class BadRequest(Exception):
+        code = 400
+
+    class Unavailable(Exception):
+        code = 503
+
+    class ErrorLLM(BackendLLM):
+        def __init__(self, name, error):
+            super().__init__(name)
+            self.error = error
+
+        async def generate(
+            self, messages, functions=None, feedback=None, temperature=0.0
+        ):
+            self.calls += 1
+            raise self.error
+
+    primary = ErrorLLM("primary", BadRequest("invalid request"))
+    secondary = BackendLLM("secondary")
+    llm = FailoverLLM([primary, secondary], min_requests=1, open_duration=60)
+    messages = [Message(type="user", content="hello")]
+
+    # A permanent error is raised at once and does not count as a failure
+    with pytest.raises(BadRequest):
+        await llm.generate(messages)
+    assert secondary.calls == 0
+    assert llm.breakers[0].state == CircuitBreaker.CLOSED
+
+    # A server error trips the breaker and fails over
+    primary.error = Unavailable("overloaded")
+    output = await llm.generate(messages)
+    assert output.text == "secondary"
+    assert llm.breakers[0].state == CircuitBreaker.OPEN
@@ -0,0 +1,392 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors
+
+from agentswarm.datamodels import Message
+from agentswarm.llms import GeminiLLM, LLMFunction
+
+
+class StubModels:
+    def __init__(self):
+        self.requests = []
+        self.missing_caches = set()
+        self.error = None
+
+    async def generate_content(self, model, config, contents):
+        self.requests.append(
+            SimpleNamespace(model=model, config=config, contents=contents)
+        )
+        if self.error is not None:
+            raise self.error
+        if config.cached_content in self.missing_caches:
+            raise errors.ClientError(
+                404,
+                {
+                    "error": {
+                        "message": f"CachedContent not found: {config.cached_content}"
+                    }
+                },
+            )
+        cached = 8 if config.cached_content else None
+        part = SimpleNamespace(text="ok", function_call=None)
+        return SimpleNamespace(
+            candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))],
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=10,
+                thoughts_token_count=None,
+                tool_use_prompt_token_count=None,
+                candidates_token_count=2,
+                total_token_count=12,
+                cached_content_token_count=cached,
+            ),
+        )
+
+    async def generate_content_stream(self, model, config, contents):
+        response = await self.generate_content(model, config, contents)
+        call = SimpleNamespace(name="tool", args={"x": 1})
+
+        async def chunks():
+            yield SimpleNamespace(
+                candidates=[
+                    SimpleNamespace(
+                        content=SimpleNamespace(
+                            parts=[SimpleNamespace(text="o", function_call=None)]
+                        )
+                    )
+                ],
+                usage_metadata=None,
+            )
+            yield SimpleNamespace(
+                candidates=[
+                    SimpleNamespace(
+                        content=SimpleNamespace(
+                            parts=[
+                                SimpleNamespace(text="k", function_call=None),
+                                SimpleNamespace(text=None, function_call=call),
+                            ]
+                        )
+                    )
+                ],
+                usage_metadata=response.usage_metadata,
+            )
+
+        return chunks()
+
+
+class StubCaches:
+    def __init__(self):
+        self.created = []
+        self.updated = []
+        self.deleted = []
+
+    async def create(self, model, config):
+        await asyncio.sleep(0.01)
+        self.created.append(config)
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    async def update(self, name, config):
+        self.updated.append((name, config.ttl))
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+
+class StubClient:
+    def __init__(self):
+        self.models = StubModels()
+        self.caches = StubCaches()
+        self.aio = SimpleNamespace(models=self.models, caches=self.caches)
+
+
+FUNCTIONS = [
+    LLMFunction(name="tool", description="A tool", parameters={"type": "object"})
+]
+
+
+@pytest.mark.asyncio
+async def test_request_pieces_are_reused():
+    client = StubClient()
+    llm = GeminiLLM(client=client, model="stub")
+    history = [
+        Message(type="system", content="sys"),
+        Message(type="user", content="hello"),
+    ]
+
+    output = await llm.generate(history, functions=FUNCTIONS)
+    assert output.text == "ok"
+    history.append(Message(type="assistant", content="ok"))
+    await llm.generate(history, functions=FUNCTIONS)
+    # An equal (but not identical) function set reuses the same declarations
+    await llm.generate(history, functions=[f.model_copy() for f in FUNCTIONS])
+
+    first, second, third = client.models.requests
+    assert second.config is first.config
+    assert third.config is first.config
+    # Historical messages are converted once
+    assert second.contents[0] is first.contents[0]
+    assert [c.role for c in second.contents] == ["user", "model"]
+    assert first.config.system_instruction == ["sys"]
+
+    await llm.generate(history, functions=FUNCTIONS, temperature=0.5)
+    assert client.models.requests[-1].config is not first.config
+    assert client.models.requests[-1].config.tools[0] is first.config.tools[0]
+
+
+@pytest.mark.asyncio
+async def test_converted_messages_follow_the_content():
+    client = StubClient()
+    llm = GeminiLLM(client=client, model="stub")
+    message = Message(type="user", content="hello")
+
+    await llm.generate([message])
+    converted = client.models.requests[-1].contents[0]
+
+    # A copy with another content, or a replaced content, is converted again
+    await llm.generate([message.model_copy(update={"content": "bye"})])
+    assert client.models.requests[-1].contents[0].parts[0].text == "bye"
+    message.content = "hello again"
+    await llm.generate([message])
+    assert client.models.requests[-1].contents[0].parts[0].text == "hello again"
+    assert client.models.requests[-1].contents[0] is not converted
+
+    # The memoized conversion does not take part in the equality
+    assert message == Message(type="user", content="hello again")
+
+
+@pytest.mark.asyncio
+async def test_context_cache_prefix():
+    client = StubClient()
+    llm = GeminiLLM(
+        client=client, model="stub", context_cache=True, context_cache_min_tokens=1
+    )
+    history = [
+        Message(type="system", content="sys"),
+        Message(type="user", content="hello"),
+    ]
+
+    # Concurrent requests with the same prefix share a single cached content
+    outputs = await asyncio.gather(
+        *(llm.generate(history, functions=FUNCTIONS) for _ in range(3))
+    )
+    assert len(client.caches.created) == 1
+    assert client.caches.created[0].system_instruction == ["sys"]
+    request = client.models.requests[-1]
+    assert request.config.cached_content == "cachedContents/1"
+    assert request.config.tools is None and request.config.system_instruction is None
+    # The cached tokens are broken out in the usage
+    assert outputs[0].usage.cached_content_token_count == 8
+    assert outputs[0].usage.uncached_prompt_token_count == 2
+
+    # The TTL is extended when the cached content is about to expire
+    llm._prefix_cache.refresh_margin = llm._prefix_cache.ttl
+    await llm.generate(history, functions=FUNCTIONS)
+    assert client.caches.updated == [("cachedContents/1", "3600s")]
+    llm._prefix_cache.refresh_margin = 300
+
+    # A cached content missing on the server falls back to the full prompt
+    client.models.missing_caches.add("cachedContents/1")
+    output = await llm.generate(history, functions=FUNCTIONS)
+    assert output.text == "ok"
+    assert client.models.requests[-1].config.cached_content is None
+    assert client.models.requests[-1].config.system_instruction == ["sys"]
+
+    await llm.generate(history, functions=FUNCTIONS)
+    assert client.models.requests[-1].config.cached_content == "cachedContents/2"
+
+    # Other client errors are raised, without a retry nor an invalidation
+    client.models.error = errors.ClientError(
+        400, {"error": {"message": "Request contains an invalid argument."}}
+    )
+    sent = len(client.models.requests)
+    with pytest.raises(errors.ClientError):
+        await llm.generate(history, functions=FUNCTIONS)
+    assert len(client.models.requests) == sent + 1
+    client.models.error = None
+    await llm.generate(history, functions=FUNCTIONS)
+    assert client.models.requests[-1].config.cached_content == "cachedContents/2"
+
+    await llm.clear_context_cache()
+    assert client.caches.deleted == ["cachedContents/2"]
+
+
+@pytest.mark.asyncio
+async def test_context_cache_skips_small_prefixes():
+    client = StubClient()
+    llm = GeminiLLM(client=client, model="stub", context_cache=True)
+
+    await llm.generate([Message(type="system", content="sys")], functions=FUNCTIONS)
+
+    assert client.caches.created == []
+    assert client.models.requests[-1].config.cached_content is None
+
+
+@pytest.mark.asyncio
+async def test_generate_batch_with_batch_api():
+    from google.genai import types
+
+    class StubBatches:
+        def __init__(self, models):
+            self.models = models
+            self.jobs = []
+            self.polls = 0
+
+        async def create(self, model, src):
+            self.jobs.append(src)
+            return SimpleNamespace(
+                name="batches/1", state=types.JobState.JOB_STATE_PENDING
+            )
+
+        async def get(self, name):
+            self.polls += 1
+            # The job is polled without holding a slot
+            assert held == 0
+            responses = [
+                SimpleNamespace(
+                    response=await self.models.generate_content(
+                        "stub", r.config, r.contents
+                    ),
+                    error=None,
+                )
+                for r in self.jobs[-1]
+            ]
+            return SimpleNamespace(
+                name=name,
+                state=types.JobState.JOB_STATE_SUCCEEDED,
+                dest=SimpleNamespace(inlined_responses=responses),
+            )
+
+    held = 0
+    slots = 0
+
+    @asynccontextmanager
+    async def slot():
+        nonlocal held, slots
+        held += 1
+        slots += 1
+        try:
+            yield
+        finally:
+            held -= 1
+
+    client = StubClient()
+    client.vertexai = False
+    client.aio.batches = StubBatches(client.models)
+    llm = GeminiLLM(client=client, model="stub", batch_api=True, batch_poll_interval=0)
+
+    requests = [[Message(type="user", content=f"q{i}")] for i in range(3)]
+    outputs = await llm.generate_batch(requests, slot=slot)
+
+    assert [o.text for o in outputs] == ["ok"] * 3
+    assert len(client.aio.batches.jobs) == 1
+    assert len(client.aio.batches.jobs[0]) == 3
+    # A single slot, to submit the job
+    assert slots == 1
+
+    # Without the batch API, the requests are sent concurrently
+    llm.batch_api = False
+    sent = len(client.models.requests)
+    await llm.generate_batch(requests)
+    assert len(client.models.requests) == sent + 3
+    assert len(client.aio.batches.jobs) == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_batch_partial_success():
+    from google.genai import types
+
+    from agentswarm.utils.exceptions import LLMBatchError
+
+    client = StubClient()
+    client.vertexai = False
+    response = await client.models.generate_content(
+        "stub", SimpleNamespace(cached_content=None), []
+    )
+    # A response without usage metadata is still converted
+    response.usage_metadata = None
+
+    class StubBatches:
+        async def create(self, model, src):
+            return SimpleNamespace(
+                name="batches/1",
+                state=types.JobState.JOB_STATE_PARTIALLY_SUCCEEDED,
+                dest=SimpleNamespace(
+                    inlined_responses=[
+                        SimpleNamespace(response=response, error=None),
+                        SimpleNamespace(response=None, error="quota exceeded"),
+                    ]
+                ),
+            )
+
+    client.aio.batches = StubBatches()
+    llm = GeminiLLM(client=client, model="stub", batch_api=True)
+
+    requests = [[Message(type="user", content=f"q{i}")] for i in range(3)]
+    with pytest.raises(LLMBatchError) as error:
+        await llm.generate_batch(requests)
+
+    outputs = error.value.outputs
+    assert outputs[0].text == "ok"
+    assert outputs[0].usage.total_token_count == 0
+    assert outputs[1:] == [None, None]
+    assert sorted(error.value.errors) == [1, 2]
+    assert "quota exceeded" in str(error.value.errors[1])
+
+
+@pytest.mark.asyncio
+async def test_stream_deltas():
+    from agentswarm.datamodels import LocalFeedbackSystem
+    from agentswarm.llms import FunctionCallDelta, TextDelta, UsageDelta
+
+    client = StubClient()
+    llm = GeminiLLM(client=client, model="stub")
+    history = [Message(type="user", content="hello")]
+
+    deltas = [delta async for delta in llm.stream(history)]
+    assert deltas[:2] == [TextDelta("o"), TextDelta("k")]
+    assert deltas[2].function_call.arguments == {"x": 1}
+    assert isinstance(deltas[2], FunctionCallDelta)
+    assert isinstance(deltas[3], UsageDelta) and deltas[3].usage.total_token_count == 12
+
+    # With a feedback system, generate() streams
+    received = []
+    feedback = LocalFeedbackSystem()
+    feedback.subscribe(lambda f: received.append(f.payload))
+    output = await llm.generate(history, feedback=feedback)
+    assert output.text == "ok"
+    assert received[:2] == ["o", "k"]
+    assert output.function_calls[0].name == "tool"
+
+
+@pytest.mark.asyncio
+async def test_context_cache_state_is_bounded():
+    client = StubClient()
+    llm = GeminiLLM(
+        client=client, model="stub", context_cache=True, context_cache_min_tokens=1
+    )
+    prefix_cache = llm._prefix_cache
+    prefix_cache.max_entries = 2
+
+    for i in range(4):
+        await llm.generate(
+            [
+                Message(type="system", content=f"sys {i}"),
+                Message(type="user", content="hi"),
+            ]
+        )
+
+    # Only the most recent prefixes are tracked, and no lock is left behind
+    assert [key[0] for key in prefix_cache._entries] == [("sys 2",), ("sys 3",)]
+    assert prefix_cache._locks == {}
+
+    prefix_cache.min_tokens = 10**6
+    for i in range(4):
+        await llm.generate(
+            [
+                Message(type="system", content=f"small {i}"),
+                Message(type="user", content="hi"),
+            ]
+        )
+    assert len(prefix_cache._too_small) == 2
@@ -0,0 +1,53 @@
+import pytest
+
+from agentswarm.llms import LLM, GeminiLLM, LLMProvider
+
+
+def test_gemini_llms_are_shared():
+    provider = LLMProvider()
+
+    llm = provider.gemini(model="model-a", api_key="key-1")
+    assert isinstance(llm, GeminiLLM)
+    assert provider.gemini(model="model-a", api_key="key-1") is llm
+
+    # Same credentials share the client, not the LLM
+    other_model = provider.gemini(model="model-b", api_key="key-1")
+    assert other_model is not llm
+    assert other_model.client is llm.client
+
+    other_key = provider.gemini(model="model-a", api_key="key-2")
+    assert other_key.client is not llm.client
+
+    other_options = provider.gemini(
+        model="model-a", api_key="key-1", max_input_tokens=10
+    )
+    assert other_options is not llm
+    assert other_options.max_input_tokens == 10
+
+
+def test_gemini_requires_credentials(monkeypatch):
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+    with pytest.raises(ValueError):
+        LLMProvider().gemini()
+
+
+@pytest.mark.asyncio
+async def test_warm_up():
+    class WarmLLM(LLM):
+        def __init__(self, fail: bool = False):
+            self.fail = fail
+            self.warmed_up = False
+
+        async def warm_up(self):
+            if self.fail:
+                raise RuntimeError("unreachable")
+            self.warmed_up = True
+
+    provider = LLMProvider()
+    llm = provider.get("warm", WarmLLM)
+    assert provider.get("warm", WarmLLM) is llm
+    provider.get("failing", lambda: WarmLLM(fail=True))
+
+    # Failures are logged, not raised
+    await provider.warm_up()
+    assert llm.warmed_up
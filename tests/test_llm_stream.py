@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from agentswarm.datamodels import LocalFeedbackSystem, Message
+from agentswarm.datamodels.feedback import Feedback
+from agentswarm.llms import (
+    LLM,
+    FunctionCallDelta,
+    LLMFunctionExecution,
+    LLMOutput,
+    LLMUsage,
+    TextDelta,
+    UsageDelta,
+)
+
+CALL = LLMFunctionExecution(name="tool", arguments={"x": 1})
+
+
+class GenerateOnlyLLM(LLM):
+    def __init__(self, streamed: bool):
+        self.streamed = streamed
+
+    async def generate(self, messages, functions=None, feedback=None, temperature=0.0):
+        if self.streamed and feedback is not None:
+            for chunk in ["Hel", "lo"]:
+                feedback.push(Feedback(source="llm", payload=chunk))
+                await asyncio.sleep(0)
+            feedback.push(Feedback(source="llm_function_call", payload=CALL))
+        return LLMOutput(
+            text="Hello",
+            function_calls=[CALL],
+            usage=LLMUsage(model="mock", total_token_count=3),
+        )
+
+
+class StreamOnlyLLM(LLM):
+    def __init__(self):
+        self.closed = False
+
+    async def stream(self, messages, functions=None, temperature=0.0):
+        try:
+            for chunk in ["Hel", "lo"]:
+                yield TextDelta(chunk)
+                await asyncio.sleep(0)
+            yield FunctionCallDelta(CALL)
+            yield UsageDelta(LLMUsage(model="mock", total_token_count=3))
+        finally:
+            self.closed = True
+
+
+async def collect(llm: LLM):
+    return [delta async for delta in llm.stream([Message(type="user", content="hi")])]
+
+
+@pytest.mark.asyncio
+async def test_generate_only_llms_stream_through_feedback():
+    expected = [
+        TextDelta("Hel"),
+        TextDelta("lo"),
+        FunctionCallDelta(CALL),
+        UsageDelta(LLMUsage(model="mock", total_token_count=3)),
+    ]
+    assert await collect(GenerateOnlyLLM(streamed=True)) == expected
+
+    # The output that was not streamed is yielded at the end
+    deltas = await collect(GenerateOnlyLLM(streamed=False))
+    assert deltas == [TextDelta("Hello")] + expected[2:]
+
+
+@pytest.mark.asyncio
+async def test_generate_is_built_on_stream():
+    llm = StreamOnlyLLM()
+    received = []
+    feedback = LocalFeedbackSystem()
+    feedback.subscribe(lambda f: received.append((f.source, f.payload)))
+
+    output = await llm.generate([Message(type="user", content="hi")], feedback=feedback)
+
+    assert output.text == "Hello"
+    assert output.function_calls == [CALL]
+    assert output.usage.total_token_count == 3
+    assert received == [("llm", "Hel"), ("llm", "lo"), ("llm_function_call", CALL)]
+
+
+@pytest.mark.asyncio
+async def test_stopping_the_iteration_closes_the_stream():
+    llm = StreamOnlyLLM()
+    stream = llm.stream([Message(type="user", content="hi")])
+    assert await stream.__anext__() == TextDelta("Hel")
+    await stream.aclose()
+    assert llm.closed
+
+    with pytest.raises(NotImplementedError):
+        await LLM().generate([])
+
+
+class SlowLLM(LLM):
+    def __init__(self):
+        self.finished = []
+
+    async def generate(self, messages, functions=None, feedback=None, temperature=0.0):
+        try:
+            if messages[-1].content == "fail":
+                raise ValueError("boom")
+            if feedback is not None:
+                feedback.push(Feedback(source="llm", payload="Hel"))
+            await asyncio.sleep(10)
+        finally:
+            self.finished.append(messages[-1].content)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_generations_are_awaited():
+    llm = SlowLLM()
+
+    # Closing the bridged stream waits for the generation to wind down
+    stream = llm.stream([Message(type="user", content="hi")])
+    assert await stream.__anext__() == TextDelta("Hel")
+    await stream.aclose()
+    assert llm.finished == ["hi"]
+
+    # So does a failing batch, for the requests it cancels
+    with pytest.raises(ValueError):
+        await llm.generate_batch(
+            [[Message(type="user", content=c)] for c in ["a", "fail", "b"]]
+        )
+    assert sorted(llm.finished) == ["a", "b", "fail", "hi"]
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from agentswarm.datamodels import Message
+from agentswarm.llms import LLM, LLMOutput, LLMUsage, RateLimitedLLM, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class UsageLLM(LLM):
+    def __init__(self, total_tokens: int = 10):
+        self.total_tokens = total_tokens
+        self.calls = []
+
+    async def generate(self, messages, functions=None, feedback=None, temperature=0.0):
+        self.calls.append(messages[0].content)
+        return LLMOutput(
+            text="ok",
+            function_calls=[],
+            usage=LLMUsage(model="mock", total_token_count=self.total_tokens),
+        )
+
+
+def test_budgets_refill_over_time():
+    clock = FakeClock()
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600, clock=clock)
+
+    assert limiter.wait_time(600) == 0
+    limiter.requests.consume(60)
+    # One request per second is refilled
+    assert limiter.wait_time(1) == pytest.approx(1.0)
+    clock.now = 1.0
+    assert limiter.wait_time(1) == 0
+
+    # Requests larger than the budget only wait for a full bucket
+    limiter.tokens.consume(600)
+    assert limiter.wait_time(10_000) == pytest.approx(60.0)
+
+    # The actual usage repays the difference with the estimate
+    clock.now = 61.0
+    limiter.reconcile(estimated=100, actual=400)
+    assert limiter.tokens.level == pytest.approx(300)
+    limiter.reconcile(estimated=400, actual=100)
+    assert limiter.tokens.level == pytest.approx(600)
+
+
+@pytest.mark.asyncio
+async def test_callers_wait_in_fifo_order():
+    inner = UsageLLM()
+    # 6000 tokens per minute: 100 tokens per second
+    llm = RateLimitedLLM(inner, tokens_per_minute=6000)
+    llm.limiter.tokens.consume(6000)
+
+    big = asyncio.ensure_future(
+        llm.generate([Message(type="user", content="big " * 40)])
+    )
+    await asyncio.sleep(0)
+    small = asyncio.ensure_future(llm.generate([Message(type="user", content="small")]))
+
+    # The big request is not overtaken, even if the small one would fit earlier
+    await asyncio.wait_for(asyncio.gather(big, small), timeout=2)
+    assert [call.split()[0] for call in inner.calls] == ["big", "small"]
+
+
+@pytest.mark.asyncio
+async def test_provider_rate_limit_drains_the_budget():
+    class QuotaError(Exception):
+        code = 429
+
+    class FailingLLM(LLM):
+        async def generate(
+            self, messages, functions=None, feedback=None, temperature=0.0
+        ):
+            raise QuotaError("quota exceeded")
+
+    llm = RateLimitedLLM(FailingLLM(), requests_per_minute=100)
+    with pytest.raises(QuotaError):
+        await llm.generate([Message(type="user", content="hello")])
+    assert llm.limiter.requests.level < 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_errors_are_classified():
+    class StatusError(Exception):
+        def __init__(self, status_code):
+            super().__init__(f"status {status_code}")
+            self.status_code = status_code
+
+    class FailingLLM(LLM):
+        def __init__(self, error):
+            self.error = error
+
+        async def generate(
+            self, messages, functions=None, feedback=None, temperature=0.0
+        ):
+            raise self.error
+
+    # Other errors leave the budget untouched
+    llm = RateLimitedLLM(FailingLLM(StatusError(400)), requests_per_minute=100)
+    with pytest.raises(StatusError):
+        await llm.generate([Message(type="user", content="hello")])
+    assert llm.limiter.requests.level > 90
+
+    # The status code of any HTTP client is recognized
+    llm = RateLimitedLLM(FailingLLM(StatusError(429)), requests_per_minute=100)
+    with pytest.raises(StatusError):
+        await llm.generate([Message(type="user", content="hello")])
+    assert llm.limiter.requests.level < 1
@@ -209,6 +209,38 @@ async def test_no_false_positive_on_varied_stream():
     assert output.text == "Success"
 
 
+def test_loop_detector_finds_the_shortest_unit():
+    import random
+
+    from agentswarm.llms.reliable_llm import _LoopDetector
+
+    def reference(s, min_repetitions, max_pattern_length):
+        # Brute force: the shortest unit repeated at the end of the window
+        s = s[-max_pattern_length * (min_repetitions + 1) :]
+        for p in range(1, min(max_pattern_length, len(s) // min_repetitions) + 1):
+            if s[-p:] * min_repetitions == s[len(s) - p * min_repetitions :]:
+                return s[-p:]
+        return None
+
+    rng = random.Random(0)
+    for _ in range(200):
+        min_repetitions = rng.randint(2, 20)
+        # Short and long units are searched with different probes
+        max_pattern_length = rng.choice([rng.randint(1, 12), rng.randint(40, 80)])
+        unit_length = min(max_pattern_length // 2 + 1, 40)
+        detector = _LoopDetector(min_repetitions, max_pattern_length, check_every=1)
+        stream = ""
+        for _ in range(100):
+            # Small alphabets and repeated units produce many near-loops
+            unit = "".join(rng.choice("ab") for _ in range(rng.randint(1, unit_length)))
+            chunk = unit * rng.randint(1, 8)
+            stream += chunk
+            detector.feed(chunk)
+            assert detector.detect() == reference(
+                stream, min_repetitions, max_pattern_length
+            )
+
+
 @pytest.mark.asyncio
 async def test_output_cap_aborts():
     class ChattyLLM(LLM):
@@ -226,3 +258,212 @@ async def test_output_cap_aborts():
     )
     with pytest.raises(LLMOutputLimitError):
         await reliable.generate([])
+
+
+# --- Hedging ---
+
+
+class SlowStartLLM(LLM):
+    """Streams a token after the given delays, one per call."""
+
+    def __init__(self, delays: List[float]):
+        self.delays = delays
+        self.call_count = 0
+        self.cancelled = 0
+
+    async def generate(self, messages, functions=None, feedback=None, temperature=0.0):
+        delay = self.delays[min(self.call_count, len(self.delays) - 1)]
+        self.call_count += 1
+        text = f"attempt-{self.call_count}"
+        try:
+            await asyncio.sleep(delay)
+            if feedback is not None:
+                feedback.push(Feedback(source="llm", payload=text))
+            await asyncio.sleep(0.01)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return LLMOutput(
+            text=text,
+            function_calls=[],
+            usage=LLMUsage(model="mock", total_token_count=1),
+        )
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_over_slow_first_token():
+    from agentswarm.datamodels import LocalFeedbackSystem
+
+    mock = SlowStartLLM([0.5, 0.0])
+    reliable = ReliableLLM(
+        mock,
+        timeout=5,
+        hedge=True,
+        hedge_min_delay=0.05,
+        hedge_budget=1.0,
+        hedge_min_samples=3,
+    )
+    for _ in range(3):
+        reliable.latencies.ttft.add(0.01)
+    reliable._hedge_credits = 1.0
+
+    received = []
+    feedback = LocalFeedbackSystem()
+    feedback.subscribe(lambda f: received.append(f.payload))
+
+    output = await asyncio.wait_for(reliable.generate([], feedback=feedback), timeout=1)
+
+    assert output.text == "attempt-2"
+    assert mock.call_count == 2
+    assert mock.cancelled == 1
+    assert reliable.hedged_requests == 1
+    # Only the winner's stream is forwarded
+    assert received == ["attempt-2"]
+
+
+@pytest.mark.asyncio
+async def test_hedges_are_capped_by_budget():
+    mock = SlowStartLLM([0.1])
+    reliable = ReliableLLM(
+        mock,
+        timeout=5,
+        hedge=True,
+        hedge_min_delay=0.01,
+        hedge_budget=0.0,
+        hedge_min_samples=1,
+    )
+    reliable.latencies.ttft.add(0.01)
+
+    output = await reliable.generate([])
+
+    assert output.text == "attempt-1"
+    assert mock.call_count == 1
+    assert reliable.hedged_requests == 0
+
+
+# --- Adaptive timeouts ---
+
+
+class StallingLLM(LLM):
+    """Streams chunks every 10ms, then stalls after the given number of chunks."""
+
+    def __init__(self, chunks: int, stall: float = 10.0):
+        self.chunks = chunks
+        self.stall = stall
+
+    async def generate(self, messages, functions=None, feedback=None, temperature=0.0):
+        for i in range(self.chunks):
+            await asyncio.sleep(0.01)
+            if feedback:
+                feedback.push(Feedback(source="llm", payload=f"chunk{i} "))
+        await asyncio.sleep(self.stall)
+        return _success_output()
+
+
+def test_adaptive_timeouts_derive_from_latencies():
+    reliable = ReliableLLM(
+        MockLLM(),
+        timeout=30,
+        adaptive_timeout=True,
+        adaptive_factor=2.0,
+        adaptive_min_timeout=1.0,
+        adaptive_min_samples=10,
+    )
+    # Not enough samples: the static timeout applies
+    assert reliable._timeouts() == (30, 30)
+
+    for _ in range(10):
+        reliable.latencies.ttft.add(4.0)
+        reliable.latencies.gaps.add(0.1)
+    # p99 x factor, between the floor and the static timeout
+    assert reliable._timeouts() == (8.0, 1.0)
+
+    reliable.latencies.ttft.add(100.0)
+    assert reliable._timeouts()[0] == 30
+
+
+@pytest.mark.asyncio
+async def test_adaptive_timeout_aborts_stalled_stream():
+    reliable = ReliableLLM(
+        StallingLLM(chunks=30),
+        timeout=30,
+        max_retries=0,
+        adaptive_timeout=True,
+        adaptive_min_timeout=0.2,
+        adaptive_min_samples=10,
+    )
+    with pytest.raises(TimeoutError, match="inactivity timeout"):
+        await asyncio.wait_for(reliable.generate([]), timeout=2)
+    # The gaps of the stream itself were learned
+    assert len(reliable.latencies.gaps) == 29
+
+
+# --- Continuation ---
+
+
+class InterruptedLLM(LLM):
+    """Streams a long prefix then stalls, and completes the continuation."""
+
+    def __init__(self):
+        self.prompts = []
+
+    async def generate(self, messages, functions=None, feedback=None, temperature=0.0):
+        self.prompts.append(messages)
+        if len(self.prompts) == 1:
+            for i in range(30):
+                feedback.push(Feedback(source="llm", payload=f"line {i:02d}\n"))
+            await asyncio.sleep(10)
+        feedback.push(Feedback(source="llm", payload="the end"))
+        return LLMOutput(
+            text="the end",
+            function_calls=[],
+            usage=LLMUsage(
+                model="mock", candidates_token_count=2, total_token_count=12
+            ),
+        )
+
+
+@pytest.mark.asyncio
+async def test_continuation_salvages_partial_output():
+    from agentswarm.datamodels import LocalFeedbackSystem
+    from agentswarm.llms.reliable_llm import CONTINUATION_PROMPT
+
+    mock = InterruptedLLM()
+    reliable = ReliableLLM(
+        mock, timeout=0.2, max_retries=1, retry_delay=0.01, continuation=True
+    )
+    received = []
+    feedback = LocalFeedbackSystem()
+    feedback.subscribe(lambda f: received.append(f.payload))
+
+    messages = [Message(type="user", content="Write a report")]
+    output = await reliable.generate(messages, feedback=feedback)
+
+    prefix = "".join(f"line {i:02d}\n" for i in range(30))
+    assert output.text == prefix + "the end"
+    # The retry continued the salvaged text
+    assert [m.type for m in mock.prompts[1]] == ["user", "assistant", "user"]
+    assert mock.prompts[1][1].content == prefix
+    assert mock.prompts[1][2].content == CONTINUATION_PROMPT
+    # The stream was not restarted
+    assert "".join(received) == output.text
+    # The salvaged tokens are added to the usage
+    salvaged = reliable.token_counter().count_text(prefix)
+    assert output.usage.candidates_token_count == 2 + salvaged
+    assert output.usage.total_token_count == 12 + salvaged
+
+
+@pytest.mark.asyncio
+async def test_short_partial_output_restarts():
+    mock = InterruptedLLM()
+    reliable = ReliableLLM(
+        mock,
+        timeout=0.2,
+        max_retries=1,
+        retry_delay=0.01,
+        continuation=True,
+        continuation_min_chars=1000,
+    )
+    output = await reliable.generate([Message(type="user", content="Write a report")])
+    assert output.text == "the end"
+    assert len(mock.prompts[1]) == 1
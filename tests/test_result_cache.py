@@ -0,0 +1,150 @@
+import time
+from typing import List
+
+import pytest
+from test_agents_workflow import DummyTracing, MockLLM, OrchestratorAgent
+
+from agentswarm.agents import BaseAgent
+from agentswarm.datamodels import (
+    CachePolicy,
+    Context,
+    DiskResultCache,
+    LocalStore,
+    MemoryResultCache,
+    Message,
+    StrResponse,
+)
+from agentswarm.llms import LLMFunctionExecution, LLMOutput, LLMUsage
+
+
+def test_cache_policy_key_is_canonical():
+    policy = CachePolicy()
+    assert policy.key("a", {"x": 1, "y": 2}, "u", "t1") == policy.key(
+        "a", {"y": 2, "x": 1}, "u", "t2"
+    )
+    assert policy.key("a", {"x": 1}, "u", "t") != policy.key("a", {"x": 1}, "v", "t")
+    assert policy.key("a", {"x": 1}, "u", "t") != policy.key("b", {"x": 1}, "u", "t")
+
+    shared = CachePolicy(per_user=False, per_trace=True)
+    assert shared.key("a", {}, "u", "t") == shared.key("a", {}, "v", "t")
+    assert shared.key("a", {}, "u", "t1") != shared.key("a", {}, "u", "t2")
+
+
+def test_memory_result_cache_ttl_and_lru():
+    cache = MemoryResultCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == (True, 1)
+    cache.set("c", 3)
+    # "b" is the least recently used entry
+    assert cache.get("b") == (False, None)
+    assert len(cache) == 2
+
+    cache.set("d", 4, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("d") == (False, None)
+
+
+def test_disk_result_cache(tmp_path):
+    cache = DiskResultCache(str(tmp_path), max_entries=2)
+    cache.set("model", StrResponse(value="hello"))
+    cache.set("list", [StrResponse(value="a"), {"b": 1}])
+    assert cache.get("model") == (True, StrResponse(value="hello"))
+    assert cache.get("list") == (True, [StrResponse(value="a"), {"b": 1}])
+
+    # Entries survive the instance
+    other = DiskResultCache(str(tmp_path), max_entries=2)
+    assert other.get("model") == (True, StrResponse(value="hello"))
+
+    other.set("expired", "x", ttl=-1)
+    assert other.get("expired") == (False, None)
+    assert len(other._entries()) <= 2
+
+    other.clear()
+    assert other.get("model") == (False, None)
+
+
+def test_disk_result_cache_tracks_its_size(tmp_path, monkeypatch):
+    import os
+
+    cache = DiskResultCache(str(tmp_path), max_entries=10)
+    listings = 0
+    listdir = os.listdir
+
+    def counting_listdir(path):
+        nonlocal listings
+        listings += 1
+        return listdir(path)
+
+    monkeypatch.setattr(os, "listdir", counting_listdir)
+    for i in range(10):
+        cache.set(f"k{i}", i)
+    # The directory is only listed to count the entries once
+    assert listings == 1
+    cache.set("k0", "overwritten")
+    assert listings == 1
+
+    # Going over the limit evicts down to 90% of it, least recently used first
+    os.utime(tmp_path / "k0.json", (0, 0))
+    os.utime(tmp_path / "k1.json", (1, 1))
+    cache.set("k10", 10)
+    assert listings == 2
+    assert len(cache._entries()) == 9
+    assert cache.get("k0") == (False, None)
+    assert cache.get("k1") == (False, None)
+    assert cache.get("k10") == (True, 10)
+
+
+@pytest.mark.asyncio
+async def test_disk_result_cache_async(tmp_path):
+    cache = DiskResultCache(str(tmp_path))
+    await cache.aset("model", StrResponse(value="hello"))
+    assert await cache.aget("model") == (True, StrResponse(value="hello"))
+    assert await cache.aget("missing") == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_cached_agent_is_executed_once():
+    class CountingAgent(BaseAgent[dict, StrResponse]):
+        executions = 0
+
+        def id(self) -> str:
+            return "counting"
+
+        def description(self, user_id: str) -> str:
+            return "Counts"
+
+        def cache_policy(self, user_id: str):
+            return CachePolicy(ttl=60)
+
+        async def execute(self, user_id, context, input=None) -> StrResponse:
+            CountingAgent.executions += 1
+            return StrResponse(value="counted")
+
+    class CacheTracing(DummyTracing):
+        def __init__(self):
+            self.hits = []
+
+        def trace_agent_cache_hit(self, context, agent_id):
+            self.hits.append(agent_id)
+
+    class CachingOrchestrator(OrchestratorAgent):
+        def available_agents(self, user_id: str) -> List[BaseAgent]:
+            return [CountingAgent()]
+
+    agent = CachingOrchestrator(
+        MockLLM(responses=["CALL: counting({})", "CALL: counting({})", "Done."])
+    )
+    tracing = CacheTracing()
+    context = Context(
+        trace_id="t-cache",
+        messages=[Message(type="user", content="Start")],
+        store=LocalStore(),
+        tracing=tracing,
+        result_cache=MemoryResultCache(),
+    )
+
+    await agent.execute("user", context)
+
+    assert CountingAgent.executions == 1
+    assert tracing.hits == ["counting"]
@@ -0,0 +1,96 @@
+import pytest
+from google.genai import errors
+
+from agentswarm.llms import LLM, ReliableLLM, RetryPolicy
+from agentswarm.utils.exceptions import LLMContextLimitError
+
+
+class StatusError(Exception):
+    def __init__(self, code: int, retry_after=None):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+        if retry_after is not None:
+            self.retry_after = retry_after
+
+
+def test_errors_are_classified():
+    policy = RetryPolicy()
+    assert policy.classify(StatusError(400)) == RetryPolicy.PERMANENT
+    assert policy.classify(StatusError(404)) == RetryPolicy.PERMANENT
+    assert policy.classify(LLMContextLimitError("too long")) == RetryPolicy.PERMANENT
+    assert policy.classify(StatusError(429)) == RetryPolicy.RATE_LIMITED
+    assert policy.classify(StatusError(503)) == RetryPolicy.TRANSIENT
+    assert policy.classify(StatusError(408)) == RetryPolicy.TRANSIENT
+    assert policy.classify(TimeoutError()) == RetryPolicy.TRANSIENT
+    assert policy.classify(ConnectionError()) == RetryPolicy.TRANSIENT
+
+
+def test_retry_after_hints():
+    policy = RetryPolicy()
+    assert policy.retry_after(StatusError(429, retry_after=12)) == 12
+
+    google_error = errors.ClientError(
+        429,
+        {
+            "error": {
+                "code": 429,
+                "status": "RESOURCE_EXHAUSTED",
+                "details": [
+                    {
+                        "@type": "type.googleapis.com/google.rpc.RetryInfo",
+                        "retryDelay": "32s",
+                    }
+                ],
+            }
+        },
+    )
+    assert policy.classify(google_error) == RetryPolicy.RATE_LIMITED
+    assert policy.retry_after(google_error) == 32
+
+    # The hint overrides a shorter backoff
+    assert policy.next_delay(google_error, retries=0) >= 32
+    assert policy.retry_after(StatusError(503)) is None
+
+
+def test_delays_are_jittered_and_capped():
+    policy = RetryPolicy(
+        max_retries=10, base_delay=1.0, max_delay=10.0, max_total_time=30
+    )
+    delays = []
+    delay = None
+    for retries in range(5):
+        delay = policy.next_delay(StatusError(503), retries, delay)
+        assert 1.0 <= delay <= 10.0
+        delays.append(delay)
+    assert len(set(delays)) > 1
+
+    # No retries for permanent errors, nor past the retries or the time budget
+    assert policy.next_delay(StatusError(400), retries=0) is None
+    assert policy.next_delay(StatusError(503), retries=10) is None
+    assert policy.next_delay(StatusError(503), retries=0, elapsed=29.5) is None
+
+    fixed = RetryPolicy(base_delay=1.0, backoff_factor=2.0, jitter=False)
+    assert [fixed.next_delay(StatusError(503), retries) for retries in range(3)] == [
+        1,
+        2,
+        4,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_are_not_retried():
+    class InvalidRequestLLM(LLM):
+        def __init__(self):
+            self.call_count = 0
+
+        async def generate(
+            self, messages, functions=None, feedback=None, temperature=0.0
+        ):
+            self.call_count += 1
+            raise StatusError(400)
+
+    mock = InvalidRequestLLM()
+    reliable = ReliableLLM(mock, max_retries=3, retry_delay=0.01)
+    with pytest.raises(StatusError):
+        await reliable.generate([])
+    assert mock.call_count == 1
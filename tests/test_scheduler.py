@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from agentswarm.datamodels import Context, LocalStore, Scheduler
+
+
+@pytest.mark.asyncio
+async def test_scheduler_serves_waiters_by_priority():
+    scheduler = Scheduler(max_llm_requests=1)
+    order = []
+    release = asyncio.Event()
+
+    async def holder():
+        async with scheduler.slot(Scheduler.LLM):
+            await release.wait()
+
+    async def waiter(priority):
+        async with scheduler.slot(Scheduler.LLM, priority=priority):
+            order.append(priority)
+
+    holder_task = asyncio.ensure_future(holder())
+    await asyncio.sleep(0)
+    waiters = [asyncio.ensure_future(waiter(p)) for p in (3, 1, 2)]
+    await asyncio.sleep(0)
+    assert scheduler.in_flight(Scheduler.LLM) == 1
+    assert scheduler.waiting(Scheduler.LLM) == 3
+
+    release.set()
+    await asyncio.gather(holder_task, *waiters)
+    # Parents (lower depth) are served before the leaves
+    assert order == [1, 2, 3]
+    assert scheduler.in_flight(Scheduler.LLM) == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_cancelled_waiter_does_not_leak_slot():
+    scheduler = Scheduler(max_llm_requests=1)
+
+    async with scheduler.slot(Scheduler.LLM):
+        task = asyncio.ensure_future(scheduler.slot(Scheduler.LLM).__aenter__())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    assert scheduler.in_flight(Scheduler.LLM) == 0
+    async with scheduler.slot(Scheduler.LLM):
+        assert scheduler.in_flight(Scheduler.LLM) == 1
+
+
+@pytest.mark.asyncio
+async def test_context_shares_scheduler_and_tracks_depth():
+    scheduler = Scheduler(max_llm_requests=2)
+    root = Context(
+        trace_id="t1",
+        messages=[],
+        store=LocalStore(),
+        tracing=None,
+        scheduler=scheduler,
+    )
+    child = root.copy_for_execution()
+    iteration = child.copy_for_iteration("step", [])
+
+    assert child.scheduler is scheduler and iteration.scheduler is scheduler
+    assert (root.depth, child.depth, iteration.depth) == (0, 1, 1)
+
+    async with iteration.slot(Scheduler.LLM):
+        assert scheduler.in_flight(Scheduler.LLM) == 1
+
+    # Without a scheduler, slots are not gated
+    async with Context(
+        trace_id="t2", messages=[], store=LocalStore(), tracing=None
+    ).slot(Scheduler.LLM):
+        pass
@@ -0,0 +1,102 @@
+import pytest
+
+from agentswarm.datamodels import Context, LocalStore, Message, MessageLog
+from agentswarm.llms import LLM, CharTokenCounter, LLMFunction
+from agentswarm.utils.exceptions import LLMContextLimitError
+
+
+class CountingCounter(CharTokenCounter):
+    def __init__(self):
+        super().__init__(chars_per_token=1, message_overhead=0)
+        self.calls = 0
+
+    def count_text(self, text: str) -> int:
+        self.calls += 1
+        return len(text)
+
+
+def test_message_count_is_cached():
+    counter = CountingCounter()
+    message = Message(type="user", content="hello")
+
+    assert counter.count_message(message) == 5
+    assert counter.count_message(message) == 5
+    assert counter.calls == 1
+
+    # A counter with a different configuration recomputes the count
+    assert (
+        CharTokenCounter(chars_per_token=1, message_overhead=2).count_message(message)
+        == 8
+    )
+
+
+def test_message_log_running_totals():
+    counter = CountingCounter()
+    log = MessageLog([Message(type="system", content="abc")])
+    first = log.snapshot()
+    log.extend([Message(type="user", content="de"), Message(type="user", content="f")])
+    second = log.snapshot()
+
+    assert counter.count_messages(second) == 6
+    assert counter.count_messages(first) == 3
+    log.append(Message(type="user", content="gh"))
+    assert counter.count_messages(log.snapshot()) == 8
+    # Every message was counted only once
+    assert counter.calls == 4
+
+    context = Context(trace_id="t1", messages=second, store=LocalStore(), tracing=None)
+    assert context.token_count(counter) == 6
+
+
+def test_check_prompt_size():
+    class LimitedLLM(LLM):
+        max_input_tokens = 10
+
+        def token_counter(self):
+            return CharTokenCounter(chars_per_token=1, message_overhead=0)
+
+    llm = LimitedLLM()
+    assert llm.check_prompt_size([Message(type="user", content="small")]) == 6
+    # Without a limit, nothing is counted
+    assert LLM().check_prompt_size([Message(type="user", content="small")]) is None
+    with pytest.raises(LLMContextLimitError):
+        llm.check_prompt_size([Message(type="user", content="x" * 20)])
+    with pytest.raises(LLMContextLimitError):
+        llm.check_prompt_size(
+            [Message(type="user", content="small")],
+            [LLMFunction(name="tool", description="a tool", parameters={})],
+        )
+
+
+def test_message_count_follows_the_content():
+    counter = CountingCounter()
+    message = Message(type="user", content="hello")
+    assert counter.count_message(message) == 5
+
+    # A copy with another content is counted from its own content
+    assert counter.count_message(message.model_copy(update={"content": "hi"})) == 2
+    assert counter.count_message(message) == 5
+    assert counter.calls == 2
+
+    message.content = "hello world"
+    assert counter.count_message(message) == 11
+
+
+def test_counting_does_not_change_message_equality():
+    message = Message(type="user", content="Start")
+    CharTokenCounter().count_message(message)
+    assert message == Message(type="user", content="Start")
+    assert message.model_dump() == {"type": "user", "content": "Start"}
+
+
+def test_function_count_is_cached_per_list():
+    counter = CountingCounter()
+    functions = [LLMFunction(name="tool", description="a tool", parameters={})]
+
+    first = counter.count_functions(functions)
+    assert counter.count_functions(functions) == first
+    assert counter.calls == 1
+
+    # Another list is counted again
+    assert counter.count_functions(list(functions)) == first
+    assert counter.calls == 2
@@ -0,0 +1,64 @@
+import json
+import threading
+
+from agentswarm.datamodels import Context, LocalStore, Message
+from agentswarm.utils import BufferedLocalTracing
+
+
+def make_context(trace_id: str, tracing) -> Context:
+    return Context(
+        trace_id=trace_id,
+        messages=[Message(type="user", content="hello")],
+        store=LocalStore(),
+        tracing=tracing,
+    )
+
+
+def read_events(path) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_buffered_tracing_writes_in_background(tmp_path):
+    tracing = BufferedLocalTracing(str(tmp_path), fsync_interval=0, max_open_files=1)
+    first = make_context("first", tracing)
+    second = make_context("second", tracing)
+
+    tracing.trace_agent(first, "agent", {"x": 1})
+    tracing.trace_agent(second, "agent", {"x": 2})
+    tracing.trace_agent_result(first, "agent", "done")
+    assert tracing.flush(timeout=5)
+
+    events = read_events(tmp_path / "first.json")
+    assert [event["type"] for event in events] == ["agent", "agent_result"]
+    assert events[0]["arguments"] == {"x": 1}
+    assert read_events(tmp_path / "second.json")[0]["arguments"] == {"x": 2}
+    # The least recently used file was closed
+    assert len(tracing._files) == 1
+
+    tracing.close()
+    assert not tracing._thread.is_alive()
+    assert tracing._files == {}
+    # Events traced after close are written synchronously
+    tracing.trace_agent_cancelled(first, "agent")
+    assert read_events(tmp_path / "first.json")[-1]["type"] == "agent_cancelled"
+
+
+def test_buffered_tracing_drops_events_when_saturated(tmp_path):
+    release = threading.Event()
+
+    class SlowTracing(BufferedLocalTracing):
+        def _write_batch(self, events):
+            release.wait(5)
+            super()._write_batch(events)
+
+    tracing = SlowTracing(str(tmp_path), max_queue_size=2)
+    context = make_context("trace", tracing)
+    for i in range(10):
+        tracing.trace_agent(context, "agent", {"i": i})
+
+    assert tracing.dropped_events > 0
+    release.set()
+    tracing.close()
+    written = len(read_events(tmp_path / "trace.json"))
+    assert written + tracing.dropped_events == 10